@@ -1,6 +1,12 @@
 /** @type {import('next').NextConfig} */
 const nextConfig = {
   trailingSlash: true,
+  experimental: {
+    // The products API reads the static list shards from disk
+    outputFileTracingIncludes: {
+      '/api/products': ['./public/catalog/**/*'],
+    },
+  },
   images: {
     unoptimized: true,
     remotePatterns: [
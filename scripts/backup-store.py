@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Keep products.json backups in the deduplicated store under backup/catalog.
+
+  snapshot                 store the current products.json
+  import FILE...           store existing products-backup-*.json copies
+  list                     list the stored snapshots
+  restore NAME --output F  write a snapshot back out, byte-identical to the original
+  diff OLD NEW             list the product ids added, removed and changed
+
+Snapshots share every record they have in common, so keeping a backup per
+sync costs only the records that sync changed instead of a full catalog copy.
+
+An imported backup is dated by the stamp in its name, either milliseconds
+(products-backup-1750328004702.json) or YYYYMMDD-HHMMSS
+(products-backup-before-suncheon-removal-20250630-165613.json). A backup
+without one is stored undated, since its mtime only says when it was checked
+out or copied; undated snapshots are listed after the dated ones.
+"""
+import argparse
+import os
+import re
+import time
+from datetime import datetime
+
+from catalog.backups import STORE_DIR, BackupStore
+from catalog.products_io import PRODUCTS_PATH
+
+def snapshot_time(path):
+    """Take the timestamp from a backup's name, or None when it has no stamp"""
+    name = os.path.basename(path)
+    match = re.search(r'(?<!\d)\d{13}(?!\d)', name)
+    if match:
+        return int(match.group())
+    match = re.search(r'(?<!\d)\d{8}-\d{6}(?!\d)', name)
+    if match:
+        return int(datetime.strptime(match.group(), '%Y%m%d-%H%M%S').timestamp() * 1000)
+    return None
+
+def import_order(path):
+    """Dated backups oldest first, then the undated ones"""
+    created = snapshot_time(path)
+    return (created is None, created or 0, path)
+
+def snapshot_name(path):
+    """Name a snapshot after its source file"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name if name != 'products' else f"products-{int(time.time() * 1000)}"
+
+def format_time(created):
+    if created is None:
+        return 'undated'
+    return datetime.fromtimestamp(created / 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+def add_snapshot(store, path, name, created):
+    name = name or snapshot_name(path)
+    total, new_records = store.add(name, path, created)
+    print(f"Stored {name}: {total} products, {new_records} new records")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--store', default=STORE_DIR, help='backup store directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    snapshot = commands.add_parser('snapshot', help='store the current catalog')
+    snapshot.add_argument('--products', default=PRODUCTS_PATH, help='catalog file to store')
+    snapshot.add_argument('--name', help='snapshot name (default: products-<timestamp>)')
+
+    import_cmd = commands.add_parser('import', help='store existing backup files')
+    import_cmd.add_argument('files', nargs='+')
+
+    commands.add_parser('list', help='list snapshots')
+
+    restore = commands.add_parser('restore', help='write a snapshot back out')
+    restore.add_argument('name')
+    restore.add_argument('--output', required=True, help='file to write')
+
+    diff = commands.add_parser('diff', help='compare two snapshots')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    diff.add_argument('--verbose', action='store_true', help='print every id')
+
+    args = parser.parse_args()
+    store = BackupStore(args.store)
+
+    if args.command == 'snapshot':
+        add_snapshot(store, args.products, args.name, int(time.time() * 1000))
+
+    elif args.command == 'import':
+        # Import oldest first so each snapshot's pack holds what that backup changed
+        for path in sorted(args.files, key=import_order):
+            add_snapshot(store, path, None, snapshot_time(path))
+
+    elif args.command == 'list':
+        for info in store.list_snapshots():
+            print(f"{info['name']:<60} {format_time(info['created']):<19} {info['count']:>8} products")
+
+    elif args.command == 'restore':
+        count = store.restore(args.name, args.output)
+        print(f"Restored {args.name}: {count} products -> {args.output}")
+
+    elif args.command == 'diff':
+        changes = store.diff(args.old, args.new)
+        for kind in ('added', 'removed', 'changed'):
+            print(f"{kind}: {len(changes[kind])}")
+            if args.verbose:
+                for product_id in changes[kind]:
+                    print(f"  {product_id}")
+
+if __name__ == "__main__":
+    main()
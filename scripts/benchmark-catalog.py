@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Benchmark the catalog maintenance scripts on synthetic catalogs.
+
+For each catalog size a synthetic catalog is generated from the distributions
+in products.json, category-mapping.json and tag-mapping.json. Each script's
+work is then measured in a fresh process, so peak RSS belongs to that script
+alone: load, classify (the script's own stages), hierarchy annotation and
+dump, with phases a script does not perform left out. Every measurement is
+repeated (--repeat) and the fastest repetition kept, since noise only ever
+adds time. Results are appended to scripts/output/benchmark-results.jsonl and
+compared with the previous run of the same script and size, so a slowdown
+shows up before the nightly run misses its window; a difference is only
+reported when it is both over 20% and over 50 ms, so fast scripts on small
+catalogs do not fail on scheduling jitter.
+
+  benchmark-catalog.py --sizes 10000,100000
+  benchmark-catalog.py --sizes 1000 --repeat 5
+  benchmark-catalog.py --scripts reclassify-misc-products,run-category-pipeline
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from catalog.pipeline import StageResult, apply_stages
+from catalog.products_io import ProductWriter, iter_products, load_products
+from catalog.stages import DEFAULT_STAGES, annotate_hierarchy
+from catalog.synthetic import CatalogModel, write_synthetic_catalog
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', 'benchmark-results.jsonl')
+
+# Each script's classify stages and whether it annotates the hierarchy and
+# writes the catalog
+SCRIPTS = {
+    'check-category-issues': ([], False, False),
+    'fix-agricultural-categories': (['fix-agricultural'], False, True),
+    'fix-missing-categories': (['fix-missing'], False, True),
+    'move-rice-products': (['move-rice'], False, True),
+    'reclassify-jeonche-products': (['reclassify-jeonche'], False, True),
+    'reclassify-popular-products': (['reclassify-popular'], False, True),
+    'reclassify-misc-products': (['reclassify-misc'], False, True),
+    'hierarchical-categories': ([], True, True),
+    'run-category-pipeline': ([name for name in DEFAULT_STAGES if name != 'hierarchy'], True, True),
+}
+
+REGRESSION_THRESHOLD = 1.2
+# Slowdowns smaller than this are noise whatever the ratio
+REGRESSION_FLOOR_SECONDS = 0.05
+DEFAULT_REPEAT = 3
+
+def measure(script, catalog_path):
+    """Time each phase of one script over a catalog, in this process"""
+    stage_names, annotates, writes = SCRIPTS[script]
+    clock = time.perf_counter
+    phases = {}
+
+    started = clock()
+    products = load_products(catalog_path)
+    phases['load'] = clock() - started
+
+    if stage_names:
+        started = clock()
+        apply_stages(stage_names, products, [StageResult(name) for name in stage_names])
+        phases['classify'] = clock() - started
+
+    if annotates:
+        started = clock()
+        for product in products:
+            annotate_hierarchy(product)
+        phases['hierarchy'] = clock() - started
+
+    if writes:
+        fd, output_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            started = clock()
+            with ProductWriter(output_path) as writer:
+                for product in products:
+                    writer.write(product)
+            phases['dump'] = clock() - started
+        finally:
+            os.remove(output_path)
+
+    total = sum(phases.values())
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    return {
+        'script': script,
+        'products': len(products),
+        'phases': {name: round(seconds, 4) for name, seconds in phases.items()},
+        'seconds': round(total, 4),
+        'productsPerSecond': round(len(products) / total) if total else None,
+        'peakRssKb': peak_rss,
+    }
+
+def measure_in_subprocess(script, catalog_path):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure', script, '--catalog', catalog_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+def measure_repeated(script, catalog_path, repeat):
+    """The fastest of several measurements, with every repetition's time and the highest peak RSS"""
+    results = [measure_in_subprocess(script, catalog_path) for _ in range(repeat)]
+    best = min(results, key=lambda result: result['seconds'])
+    return {
+        **best,
+        'repeats': [result['seconds'] for result in results],
+        'peakRssKb': max(result['peakRssKb'] for result in results),
+    }
+
+def is_regression(seconds, before):
+    """Whether a time is slower than a previous one by more than both the ratio and the floor"""
+    return seconds > before * REGRESSION_THRESHOLD and seconds - before > REGRESSION_FLOOR_SECONDS
+
+def previous_results(path):
+    """Latest recorded result per (script, size)"""
+    latest = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    latest[(result['script'], result['size'])] = result
+    return latest
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000', help='comma-separated catalog sizes')
+    parser.add_argument('--scripts', help='comma-separated script names (default: all)')
+    parser.add_argument('--seed', type=int, default=0, help='synthetic catalog seed')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='measurements per script, fastest kept')
+    parser.add_argument('--results', default=RESULTS_PATH, help='results file to append to')
+    parser.add_argument('--keep-catalogs', help='directory to keep the generated catalogs in')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--catalog', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.catalog)))
+        return
+
+    scripts = args.scripts.split(',') if args.scripts else list(SCRIPTS)
+    unknown = [script for script in scripts if script not in SCRIPTS]
+    if unknown:
+        parser.error(f"unknown script(s): {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+
+    previous = previous_results(args.results)
+    run = {'date': datetime.now().isoformat(timespec='seconds'), 'revision': git_revision(), 'seed': args.seed}
+    model = CatalogModel.from_sources()
+    regressions = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        catalog_dir = args.keep_catalogs or temp_dir
+        os.makedirs(catalog_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+
+        for size in sizes:
+            catalog_path = os.path.join(catalog_dir, f"synthetic-{size}-{args.seed}.json")
+            started = time.perf_counter()
+            write_synthetic_catalog(catalog_path, size, args.seed, model)
+            print(f"\nGenerated {size:,} products in {time.perf_counter() - started:.1f}s "
+                  f"({os.path.getsize(catalog_path) / 1e6:.1f} MB)")
+            print(f"  {'script':<28} {'load':>7} {'classify':>9} {'hierarchy':>10} {'dump':>7} "
+                  f"{'products/s':>11} {'peak MB':>8}")
+
+            for script in scripts:
+                result = {**run, 'size': size, **measure_repeated(script, catalog_path, args.repeat)}
+                with open(args.results, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+                phases = result['phases']
+                cells = [f"{phases[name]:.2f}" if name in phases else '-' for name in ('load', 'classify', 'hierarchy', 'dump')]
+                line = (f"  {script:<28} {cells[0]:>7} {cells[1]:>9} {cells[2]:>10} {cells[3]:>7} "
+                        f"{result['productsPerSecond']:>11,} {result['peakRssKb'] / 1024:>8.0f}")
+
+                before = previous.get((script, size))
+                if before and before['seconds'] and is_regression(result['seconds'], before['seconds']):
+                    line += f"  SLOWER x{result['seconds'] / before['seconds']:.2f} (was {before['revision']})"
+                    regressions.append((script, size))
+                print(line)
+
+    print(f"\nResults appended to {args.results}")
+    if regressions:
+        print(f"{len(regressions)} result(s) more than {REGRESSION_THRESHOLD - 1:.0%} and "
+              f"{REGRESSION_FLOOR_SECONDS * 1000:.0f} ms slower than the previous run")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
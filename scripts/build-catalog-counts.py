@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""Write the per-region and per-category product totals the home page map shows.
+
+  build-catalog-counts.py                 write src/data/catalog-counts.json
+
+Run it after hierarchical-categories.py so the categoryMajor fields are
+current, whenever products.json changes, and commit the result.
+"""
+import argparse
+import time
+
+from catalog.counts import COUNTS_PATH, catalog_counts
+from catalog.products_io import PRODUCTS_PATH, write_json
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to count')
+    parser.add_argument('--counts', default=COUNTS_PATH, help='counts file for the app')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = catalog_counts(args.products)
+    write_json(counts, args.counts)
+    print(f"Counted {counts['total']} products in {time.perf_counter() - started:.2f}s")
+    print(f"  {len(counts['regions'])} regions, {len(counts['categories'])} category majors")
+    print(f"Counts written to {args.counts}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Write paginated, precompressed product list shards for static serving.
+
+  build-catalog-shards.py                 write public/catalog
+  build-catalog-shards.py --page-size 100
+
+`npm run build` runs this before `next build` (the prebuild script), so every
+deploy ships shards of the catalog it deploys; run it by hand only to serve
+shards from `next dev`. Lists are written per category level, flat category,
+mall and region, each page as .json, .json.gz and, with the brotli package
+installed, .json.br. public/catalog/manifest.json names every list's shard
+key and page count and the digest of the products.json it was built from.
+"""
+import argparse
+import time
+
+from catalog.products_io import PRODUCTS_PATH
+from catalog.shards import COMPRESSORS, PAGE_SIZE, SHARDS_DIR, build_shards
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to shard')
+    parser.add_argument('--output', default=SHARDS_DIR, help='directory to write the shards to')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='products per page')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest, writer = build_shards(args.products, args.output, args.page_size)
+
+    lists = (
+        sum(1 + len(mid['minors']) for major in manifest['categories'].values() for mid in major['mids'].values())
+        + len(manifest['categories']) + len(manifest['flatCategories'])
+        + len(manifest['malls']) + len(manifest['regions'])
+    )
+    print(f"Sharded {manifest['total']} products into {lists} lists in {time.perf_counter() - started:.2f}s")
+    print(
+        f"  {len(manifest['categories'])} majors, {len(manifest['flatCategories'])} categories, "
+        f"{len(manifest['malls'])} malls, {len(manifest['regions'])} regions"
+    )
+    print(f"  pages: {writer.changed} written, {writer.unchanged} unchanged, {writer.removed} stale files removed")
+    sizes = ', '.join(f"{suffix} {size / 1e6:.1f} MB" for suffix, size in writer.bytes.items())
+    print(f"  {sizes}")
+    if len(COMPRESSORS) == 1:
+        print("  brotli is not installed; only gzip copies were written")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Build the compact columnar catalog from products.json, or read one column of it.
+
+  build-columnar-catalog.py                       write src/data/products.cols
+  build-columnar-catalog.py --column categoryMajor  count the values of one column
+
+Only the requested column is paged in from the memory-mapped file. Every
+script reading through catalog.products_io accepts the .cols file in place of
+products.json as input. Scripts that rewrite the catalog only write JSON, so
+they refuse a .cols file unless they run with --dry-run; rerun this after they
+update products.json.
+"""
+import argparse
+import os
+import time
+from collections import Counter
+
+from catalog.columnar import FLAG_FIELDS, MISSING_PRICE, STRING_COLUMNS, ColumnarCatalog, write_columnar
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, iter_products
+
+COLUMNS_PATH = os.path.join(DATA_DIR, 'products.cols')
+
+def print_column(path, name, limit):
+    """Print the value distribution of one column"""
+    started = time.perf_counter()
+    with ColumnarCatalog(path) as catalog:
+        if name in STRING_COLUMNS:
+            counts = Counter(catalog.strings(name))
+        elif name in FLAG_FIELDS:
+            counts = Counter(catalog.flags(name))
+        elif name == 'price':
+            prices = [price for price in catalog.prices() if price != MISSING_PRICE]
+            print(f"price: {len(prices)} of {catalog.count} products priced")
+            if prices:
+                print(f"  min {min(prices):,}  max {max(prices):,}  mean {sum(prices) / len(prices):,.0f}")
+            print(f"Read in {(time.perf_counter() - started) * 1000:.1f} ms")
+            return
+        elif name == 'clickCount':
+            counts = Counter(catalog.click_counts())
+        else:
+            raise SystemExit(f"Unknown column: {name}")
+
+    print(f"{name}: {len(counts)} distinct values")
+    for value, count in counts.most_common(limit):
+        print(f"  {count:>7}  {value}")
+    print(f"Read in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to convert')
+    parser.add_argument('--output', default=COLUMNS_PATH, help='columnar file to write or read')
+    parser.add_argument('--column', help='print the value counts of one column instead of building')
+    parser.add_argument('--limit', type=int, default=20, help='values to print with --column')
+    args = parser.parse_args()
+
+    if args.column:
+        print_column(args.output, args.column, args.limit)
+        return
+
+    count = write_columnar(iter_products(args.products), args.output)
+    before = os.path.getsize(args.products)
+    after = os.path.getsize(args.output)
+    print(f"Wrote {count} products to {args.output}")
+    print(f"  {before:,} bytes -> {after:,} bytes ({after / before:.0%})")
+
+if __name__ == "__main__":
+    main()
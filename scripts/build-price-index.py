@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Build the presorted price and unit-price indexes the product API sorts with.
+
+  build-price-index.py              write src/data/price-index.json
+
+run-category-pipeline.py and mall-shards.py merge rebuild the index after they
+rewrite products.json, as they do the search index; run this after any other
+edit to the catalog and commit the result. Unit prices are parsed from the
+product names here, so the catalog does not need the opt-in unit-price stage
+of run-category-pipeline.py. For the whole catalog and each category, the
+index lists product positions by price and, per pack unit (kg, L, 개), by unit
+price, so /api/products?sort=unitPrice&unit=kg returns the cheapest per kg
+first without parsing any product. The index records the sha1 of the
+products.json it was built from. Until it is rebuilt, the API sees that it no
+longer matches and sorts the products itself, parsing the pack sizes from the
+names with the same rules (src/lib/unit-price.ts).
+"""
+import argparse
+import os
+import time
+
+from catalog.products_io import PRODUCTS_PATH
+from catalog.unit_price import ALL, PRICE_INDEX_PATH, build_price_index, write_price_index
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to index')
+    parser.add_argument('--output', default=PRICE_INDEX_PATH, help='index file to write')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build_price_index(args.products)
+    write_price_index(index, args.output)
+    print(f"Indexed {index['count']} products in {time.perf_counter() - started:.2f}s")
+    print(f"  by price: {len(index['byPrice'].get(ALL, []))} products in {len(index['byPrice']) - 1} categories")
+    for pack_unit, lists in index['byUnitPrice'].items():
+        print(f"  by price per {pack_unit}: {len(lists.get(ALL, []))} products in {len(lists) - 1} categories")
+    print(f"  {os.path.getsize(args.output):,} bytes written to {args.output}")
+
+if __name__ == "__main__":
+    main()
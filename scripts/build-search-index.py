@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Build the inverted search index the product search API reads.
+
+  build-search-index.py             write src/data/search-index.json
+  build-search-index.py --check     also compare indexed and full-scan results
+
+run-category-pipeline.py and mall-shards.py merge rebuild the index after they
+rewrite products.json; run this after any other edit to the catalog. The index
+records the sha1 of the products.json it was built from, and until it is
+rebuilt /api/products sees that it no longer matches and scans every product.
+"""
+import argparse
+import os
+import random
+import time
+
+from catalog.products_io import PRODUCTS_PATH, load_products
+from catalog.search_index import (
+    INDEXED_RUN, SEARCH_INDEX_PATH, build_search_index, search, searchable_texts, write_search_index,
+)
+
+def sample_queries(products, count, seed=0):
+    """Words and word fragments taken from product names and tags"""
+    rng = random.Random(seed)
+    words = [word for product in products for text in searchable_texts(product) for word in INDEXED_RUN.findall(text.lower())]
+    queries = set()
+    while words and len(queries) < count:
+        word = rng.choice(words)
+        start = rng.randrange(len(word))
+        queries.add(word[start:start + rng.randint(1, 4)])
+    return sorted(queries)
+
+def check(index, products, count):
+    """Compare indexed search with a full scan; return the mismatched queries"""
+    mismatches = []
+    indexed_time = scan_time = 0
+    for query in sample_queries(products, count):
+        started = time.perf_counter()
+        found = search(index, products, query)
+        indexed_time += time.perf_counter() - started
+        started = time.perf_counter()
+        expected = [
+            position for position, product in enumerate(products)
+            if any(query in text.lower() for text in searchable_texts(product))
+        ]
+        scan_time += time.perf_counter() - started
+        if found != expected:
+            mismatches.append(query)
+    print(f"Checked {count} queries: indexed {indexed_time * 1000 / count:.2f} ms, "
+          f"scan {scan_time * 1000 / count:.2f} ms per query")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to index')
+    parser.add_argument('--output', default=SEARCH_INDEX_PATH, help='index file to write')
+    parser.add_argument('--check', type=int, nargs='?', const=200, metavar='QUERIES',
+                        help='verify the index against a full scan on sample queries')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build_search_index(args.products)
+    write_search_index(index, args.output)
+    print(f"Indexed {index['count']} products in {time.perf_counter() - started:.2f}s")
+    print(f"  {len(index['grams'])} grams, {len(index['tags'])} tags, "
+          f"{len(index['categories'])} categories, {len(index['malls'])} malls")
+    print(f"  {os.path.getsize(args.output):,} bytes written to {args.output}")
+
+    if args.check:
+        mismatches = check(index, load_products(args.products), args.check)
+        if mismatches:
+            raise SystemExit(f"Index disagrees with a full scan for: {', '.join(mismatches[:10])}")
+
+if __name__ == "__main__":
+    main()
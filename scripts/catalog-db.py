@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Mirror products.json into an SQLite database for indexed queries and fix-ups.
+
+  sync [--force]             update src/data/catalog.db from products.json (changed rows only)
+  export [--force]           rewrite products.json from the database
+  status                     product count, last sync/export, unexported changes
+  find [--mall M] [--category C] [--major/--mid/--minor L] [--region R] [--no-tags] [--text T]
+                             list matching products (--ids for ids only, --count to count)
+  query SQL [PARAM ...]      run SQL against the products table and print the rows
+  pipeline [--stages ...] [--export]
+                             run the category fix-ups as SQL updates of the affected rows
+
+The products table has one row per record in catalog order: the record as
+JSON in ``record``, plus the indexed columns id, mall_id, category,
+category_major, category_mid, category_minor and region, and name,
+description and tags. products_fts is a trigram full-text index over the
+last three, e.g.
+
+  catalog-db.py query "SELECT id, name FROM products WHERE pos IN
+      (SELECT rowid FROM products_fts WHERE products_fts MATCH '사과즙')"
+
+pipeline gives the same records as run-category-pipeline.py; --export writes
+them to products.json straight away, otherwise run export when done.
+"""
+import argparse
+import json
+import sys
+import time
+
+from catalog.catalog_db import CATALOG_DB_PATH, CatalogConflictError, CatalogDB
+from catalog.manifest import MANIFEST_PATH, ClassificationManifest
+from catalog.products_io import PRODUCTS_PATH
+from catalog.sql_stages import run_sql_stages
+
+def export(db, products_path, force=False):
+    started = time.perf_counter()
+    try:
+        count = db.export(products_path, force=force)
+    except CatalogConflictError as exc:
+        sys.exit(f"Not exported: {exc}")
+    print(f"Exported {count} products to {products_path} in {time.perf_counter() - started:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=CATALOG_DB_PATH, help='database file')
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog file it mirrors')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sync_cmd = commands.add_parser('sync', help='update the database from products.json')
+    sync_cmd.add_argument('--force', action='store_true', help='discard unexported changes in the database')
+
+    export_cmd = commands.add_parser('export', help='write products.json from the database')
+    export_cmd.add_argument('--force', action='store_true', help='overwrite products.json even if it was edited')
+
+    commands.add_parser('status', help='show the state of the database')
+
+    find_cmd = commands.add_parser('find', help='list products by indexed fields')
+    find_cmd.add_argument('--mall', help='mall id')
+    find_cmd.add_argument('--category', help='flat category')
+    find_cmd.add_argument('--major', help='categoryMajor')
+    find_cmd.add_argument('--mid', help='categoryMid')
+    find_cmd.add_argument('--minor', help='categoryMinor')
+    find_cmd.add_argument('--region', help='region')
+    find_cmd.add_argument('--no-tags', action='store_true', help='only products with null, missing or empty tags')
+    find_cmd.add_argument('--text', help='text in the name, description or tags')
+    find_cmd.add_argument('--limit', type=int, help='at most this many products')
+    find_cmd.add_argument('--ids', action='store_true', help='print ids only')
+    find_cmd.add_argument('--count', action='store_true', help='print the number of matches only')
+
+    query_cmd = commands.add_parser('query', help='run SQL')
+    query_cmd.add_argument('sql')
+    query_cmd.add_argument('params', nargs='*')
+
+    pipeline_cmd = commands.add_parser('pipeline', help='run the category fix-ups in the database')
+    pipeline_cmd.add_argument('--stages', help='comma-separated stage names (default: all but unit-price)')
+    pipeline_cmd.add_argument('--no-manifest', action='store_true', help='classify every candidate from scratch')
+    pipeline_cmd.add_argument('--export', action='store_true', help='export products.json afterwards')
+
+    args = parser.parse_args()
+
+    with CatalogDB(args.db) as db:
+        if args.command == 'sync':
+            started = time.perf_counter()
+            try:
+                result = db.sync(args.products, force=args.force)
+            except CatalogConflictError as exc:
+                sys.exit(f"Not synced: {exc}")
+            if result.skipped:
+                print(f"{args.db} is up to date with {args.products} ({result.total} products)")
+            else:
+                print(f"Synced {result.total} products into {args.db} in {time.perf_counter() - started:.2f}s: "
+                      f"{result.inserted} inserted, {result.updated} updated, {result.deleted} deleted")
+
+        elif args.command == 'export':
+            export(db, args.products, args.force)
+
+        elif args.command == 'status':
+            print(f"{args.db}: {db.count()} products")
+            print(f"  last sync   {db.get_meta('syncedAt') or 'never'}")
+            print(f"  last export {db.get_meta('exportedAt') or 'never'}")
+            print(f"  {'unexported changes' if db.dirty else 'no unexported changes'}")
+
+        elif args.command == 'find':
+            matches = db.find(
+                mall_id=args.mall, category=args.category, major=args.major, mid=args.mid, minor=args.minor,
+                region=args.region, no_tags=args.no_tags, text=args.text, limit=args.limit,
+            )
+            if args.count:
+                print(sum(1 for _ in matches))
+            for product in () if args.count else matches:
+                print(product.get('id') if args.ids else json.dumps(product, ensure_ascii=False))
+
+        elif args.command == 'query':
+            columns, rows = db.query(args.sql, args.params)
+            if columns:
+                print('\t'.join(columns))
+            for row in rows:
+                print('\t'.join('' if value is None else str(value) for value in row))
+            if db.dirty:
+                print(f"\n{args.db} has unexported changes; run export to write products.json", file=sys.stderr)
+
+        elif args.command == 'pipeline':
+            stage_names = args.stages.split(',') if args.stages else None
+            manifest = None if args.no_manifest else ClassificationManifest(MANIFEST_PATH)
+            started = time.perf_counter()
+            try:
+                results = run_sql_stages(db, stage_names, manifest)
+            except ValueError as exc:
+                parser.error(str(exc))
+            print(f"Ran {len(results)} stages over {db.count()} products in {time.perf_counter() - started:.2f}s")
+            print(f"  {'stage':<20} {'changes':>8}")
+            for name, changes, _ in results:
+                print(f"  {name:<20} {changes:>8}")
+            if args.export:
+                export(db, args.products)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared helpers for the Python catalog maintenance scripts in scripts/."""
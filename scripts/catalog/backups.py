@@ -0,0 +1,163 @@
+"""Deduplicated backup store for products.json snapshots.
+
+Each record of a snapshot is serialized exactly as it appears in the catalog
+and stored once, addressed by the hash of that text. Taking a snapshot only
+appends the records that no earlier snapshot contained, in one gzip pack per
+snapshot, plus a small index of (id, record hash) pairs in catalog order.
+Because consecutive catalogs share almost all of their records, the store is
+a fraction of the size of the full copies it replaces. Restoring a snapshot
+reassembles the original file byte for byte.
+
+Layout under the store root::
+
+    packs/<snapshot>.jsonl.gz      new records, one "<hash>\\t<record text>" per line
+    snapshots/<snapshot>.json.gz   {"name", "created", "source", "records": [[id, hash], ...]}
+
+``created`` is in milliseconds, or null for a backup whose time is unknown.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from catalog.products_io import atomic_open, encode_record, iter_products, save_products
+
+STORE_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'backup', 'catalog'))
+
+
+def record_hash(text):
+    """Content address of a serialized record"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def snapshot_keys(records):
+    """Key each (id, hash) pair by id, numbering repeated ids in order"""
+    seen = {}
+    keyed = {}
+    for product_id, digest in records:
+        occurrence = seen.get(product_id, 0)
+        seen[product_id] = occurrence + 1
+        keyed[(product_id, occurrence)] = digest
+    return keyed
+
+
+class BackupStore:
+    """Content-addressed store of catalog snapshots"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.packs_dir = os.path.join(root, 'packs')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+        self._hashes = None
+
+    def _snapshot_path(self, name):
+        return os.path.join(self.snapshots_dir, f"{name}.json.gz")
+
+    def _pack_path(self, name):
+        return os.path.join(self.packs_dir, f"{name}.jsonl.gz")
+
+    def _iter_pack(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                digest, text = line.rstrip('\n').split('\t', 1)
+                yield digest, json.loads(text)
+
+    def known_hashes(self):
+        """Set of every record hash already in the store"""
+        if self._hashes is None:
+            self._hashes = set()
+            for digest, _ in self.iter_records():
+                self._hashes.add(digest)
+        return self._hashes
+
+    def iter_records(self):
+        """Yield (hash, record) for every record in the store"""
+        if os.path.isdir(self.packs_dir):
+            for filename in sorted(os.listdir(self.packs_dir)):
+                yield from self._iter_pack(os.path.join(self.packs_dir, filename))
+
+    def snapshot(self, name):
+        """Load a snapshot's index"""
+        path = self._snapshot_path(name)
+        if not os.path.exists(path):
+            raise KeyError(f"No snapshot named '{name}'")
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def list_snapshots(self):
+        """Return snapshot indexes (without records), oldest first and the undated ones last"""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        snapshots = []
+        for filename in os.listdir(self.snapshots_dir):
+            if filename.endswith('.json.gz'):
+                info = self.snapshot(filename[:-len('.json.gz')])
+                info['count'] = len(info.pop('records'))
+                snapshots.append(info)
+        return sorted(snapshots, key=lambda info: (info['created'] is None, info['created'] or 0, info['name']))
+
+    def add(self, name, path, created):
+        """Snapshot the catalog file at path, taken at created (None if unknown); return (records, new records)"""
+        if os.path.exists(self._snapshot_path(name)):
+            raise ValueError(f"Snapshot '{name}' already exists")
+        os.makedirs(self.packs_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+        known = self.known_hashes()
+        records = []
+        new_records = 0
+        pack_path = self._pack_path(name)
+        with atomic_open(pack_path, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as pack:
+            for product in iter_products(path):
+                text = encode_record(product)
+                digest = record_hash(text)
+                product_id = product.get('id') if isinstance(product, dict) else None
+                records.append([product_id, digest])
+                if digest not in known:
+                    known.add(digest)
+                    new_records += 1
+                    # Compact JSON keeps each record on one line
+                    pack.write(f"{digest}\t{json.dumps(product, ensure_ascii=False)}\n")
+        if not new_records:
+            os.remove(pack_path)
+
+        index = {
+            'name': name,
+            'created': created,
+            'source': os.path.basename(path),
+            'records': records,
+        }
+        with atomic_open(self._snapshot_path(name), 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        return len(records), new_records
+
+    def records(self, name):
+        """Yield the records of a snapshot in catalog order"""
+        order = [digest for _, digest in self.snapshot(name)['records']]
+        needed = set(order)
+        found = {}
+        for filename in sorted(os.listdir(self.packs_dir)):
+            for digest, product in self._iter_pack(os.path.join(self.packs_dir, filename)):
+                if digest in needed:
+                    found[digest] = product
+            if len(found) == len(needed):
+                break
+        missing = needed - found.keys()
+        if missing:
+            raise ValueError(f"Snapshot '{name}' references {len(missing)} records missing from the store")
+        for digest in order:
+            yield found[digest]
+
+    def restore(self, name, output_path):
+        """Write a snapshot back out as a catalog file; return the record count"""
+        return save_products(self.records(name), output_path)
+
+    def diff(self, old_name, new_name):
+        """Return the ids added, removed and changed between two snapshots"""
+        old = snapshot_keys(self.snapshot(old_name)['records'])
+        new = snapshot_keys(self.snapshot(new_name)['records'])
+        return {
+            'added': [key[0] for key in new if key not in old],
+            'removed': [key[0] for key in old if key not in new],
+            'changed': [key[0] for key in new if key in old and old[key] != new[key]],
+        }
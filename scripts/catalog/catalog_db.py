@@ -0,0 +1,281 @@
+"""SQLite working copy of the catalog, for indexed queries and fix-ups.
+
+products.json is the catalog the site deploys, but answering "products of
+mall X in category Y with no tags" from it means parsing every record.
+``CatalogDB`` mirrors it into an SQLite database, one row per record in
+catalog order:
+
+* ``record`` holds the product as compact JSON and is the only stored
+  column; id, mall_id, category, the category levels, region, name,
+  description and tags are generated from it, so they can never disagree
+  with the record. mall_id resolves mall.mallId, then mallId, as the app
+  does;
+* id, mall_id, category, (category_major, category_mid, category_minor) and
+  region are indexed;
+* ``products_fts`` is an FTS5 trigram index over name, description and tags,
+  kept up to date by triggers; it only reindexes a row whose text changed,
+  so category updates never touch it.
+
+``sync`` brings the database up to date with products.json, rewriting only
+the rows whose record changed, and ``export`` writes products.json back from
+it, formatted as before. Edits made through ``query`` or
+``catalog.sql_stages`` mark the database as having unexported changes;
+``sync`` refuses to overwrite those, and ``export`` refuses to overwrite a
+products.json that was edited since the last sync, unless forced. Filling an
+empty database skips the per-row index and FTS upkeep and builds both once
+at the end, which halves the time of a first sync.
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, ProductWriter, iter_products
+from catalog.search_index import file_digest
+
+CATALOG_DB_PATH = os.path.join(DATA_DIR, 'catalog.db')
+SCHEMA_VERSION = 1
+# Trigram FTS needs three characters to use its index
+MIN_FTS_QUERY = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+CREATE TABLE IF NOT EXISTS products (
+    pos INTEGER PRIMARY KEY,
+    record TEXT NOT NULL,
+    id TEXT GENERATED ALWAYS AS (json_extract(record, '$.id')) VIRTUAL,
+    mall_id TEXT GENERATED ALWAYS AS (coalesce(
+        nullif(CASE json_type(record, '$.mall') WHEN 'object' THEN json_extract(record, '$.mall.mallId') END, ''),
+        json_extract(record, '$.mallId')
+    )) VIRTUAL,
+    category TEXT GENERATED ALWAYS AS (json_extract(record, '$.category')) VIRTUAL,
+    category_major TEXT GENERATED ALWAYS AS (json_extract(record, '$.categoryMajor')) VIRTUAL,
+    category_mid TEXT GENERATED ALWAYS AS (json_extract(record, '$.categoryMid')) VIRTUAL,
+    category_minor TEXT GENERATED ALWAYS AS (json_extract(record, '$.categoryMinor')) VIRTUAL,
+    region TEXT GENERATED ALWAYS AS (json_extract(record, '$.region')) VIRTUAL,
+    name TEXT GENERATED ALWAYS AS (json_extract(record, '$.name')) VIRTUAL,
+    description TEXT GENERATED ALWAYS AS (json_extract(record, '$.description')) VIRTUAL,
+    tags TEXT GENERATED ALWAYS AS (json_extract(record, '$.tags')) VIRTUAL
+);
+
+CREATE INDEX IF NOT EXISTS products_id ON products (id);
+CREATE INDEX IF NOT EXISTS products_mall ON products (mall_id);
+CREATE INDEX IF NOT EXISTS products_category ON products (category);
+CREATE INDEX IF NOT EXISTS products_levels ON products (category_major, category_mid, category_minor);
+CREATE INDEX IF NOT EXISTS products_region ON products (region);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, description, tags, content='products', content_rowid='pos', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, description, tags) VALUES (new.pos, new.name, new.description, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, tags)
+    VALUES ('delete', old.pos, old.name, old.description, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF record ON products
+WHEN old.name IS NOT new.name OR old.description IS NOT new.description OR old.tags IS NOT new.tags BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, tags)
+    VALUES ('delete', old.pos, old.name, old.description, old.tags);
+    INSERT INTO products_fts (rowid, name, description, tags) VALUES (new.pos, new.name, new.description, new.tags);
+END;
+"""
+
+
+# Index and FTS upkeep dropped while an empty database is filled
+BULK_DROPS = (
+    'DROP TRIGGER products_fts_insert',
+    'DROP INDEX products_id',
+    'DROP INDEX products_mall',
+    'DROP INDEX products_category',
+    'DROP INDEX products_levels',
+    'DROP INDEX products_region',
+)
+
+
+class CatalogConflictError(Exception):
+    """The database and products.json both changed since they were last in step"""
+
+
+def compact_record(product):
+    return json.dumps(product, ensure_ascii=False, separators=(',', ':'))
+
+
+def utc_timestamp():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+
+
+class SyncResult:
+    def __init__(self):
+        self.total = 0
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.skipped = False
+
+
+class CatalogDB:
+    """The catalog database; use as a context manager to close it"""
+
+    def __init__(self, path=CATALOG_DB_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute("INSERT OR IGNORE INTO meta VALUES ('dirty', '0')")
+            self.connection.execute("INSERT OR IGNORE INTO meta VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO meta VALUES (?, ?)', [(key, value) for key, value in values.items()]
+        )
+
+    @property
+    def dirty(self):
+        """Whether the database has changes not yet exported to products.json"""
+        return self.get_meta('dirty') == '1'
+
+    def mark_dirty(self):
+        with self.connection:
+            self._set_meta(dirty='1')
+
+    def count(self):
+        return self.connection.execute('SELECT count(*) FROM products').fetchone()[0]
+
+    def sync(self, products_path=PRODUCTS_PATH, force=False):
+        """Bring the rows up to date with products_path, rewriting only the records that changed.
+
+        Raises ``CatalogConflictError`` if the database has unexported
+        changes and products_path changed too, unless ``force``.
+        """
+        result = SyncResult()
+        digest = file_digest(products_path)
+        if digest == self.get_meta('source'):
+            result.skipped = True
+            result.total = self.count()
+            return result
+        if self.dirty and not force:
+            raise CatalogConflictError(
+                f"{self.path} has changes not exported to {products_path}, which changed as well; "
+                f"export first, or sync with force to discard them"
+            )
+
+        existing = dict(self.connection.execute('SELECT pos, record FROM products'))
+        bulk = not existing
+        inserts = []
+        updates = []
+        for pos, product in enumerate(iter_products(products_path)):
+            text = compact_record(product)
+            current = existing.get(pos)
+            if current is None:
+                inserts.append((pos, text))
+            elif current != text:
+                updates.append((text, pos))
+            result.total += 1
+
+        with self.connection:
+            if bulk:
+                for statement in BULK_DROPS:
+                    self.connection.execute(statement)
+            self.connection.executemany('INSERT INTO products (pos, record) VALUES (?, ?)', inserts)
+            self.connection.executemany('UPDATE products SET record = ? WHERE pos = ?', updates)
+            result.deleted = self.connection.execute('DELETE FROM products WHERE pos >= ?', (result.total,)).rowcount
+            if bulk:
+                self.connection.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+            self._set_meta(source=digest, dirty='0', syncedAt=utc_timestamp())
+        if bulk:
+            # Recreates the indexes and the trigger
+            self.connection.executescript(SCHEMA)
+        result.inserted = len(inserts)
+        result.updated = len(updates)
+        return result
+
+    def records(self):
+        """Every product, decoded, in catalog order"""
+        for (text,) in self.connection.execute('SELECT record FROM products ORDER BY pos'):
+            yield json.loads(text)
+
+    def export(self, products_path=PRODUCTS_PATH, force=False):
+        """Write products_path from the database; returns the number of products.
+
+        Raises ``CatalogConflictError`` if products_path was modified since
+        the last sync or export, unless ``force``.
+        """
+        source = self.get_meta('source')
+        if source is None:
+            raise CatalogConflictError(f"{self.path} is empty; sync it from {products_path} first")
+        if os.path.exists(products_path) and file_digest(products_path) != source and not force:
+            raise CatalogConflictError(
+                f"{products_path} was modified after the last sync; sync to keep those changes, "
+                f"or export with force to overwrite them"
+            )
+        with ProductWriter(products_path) as writer:
+            for product in self.records():
+                writer.write(product)
+        with self.connection:
+            self._set_meta(source=file_digest(products_path), dirty='0', exportedAt=utc_timestamp())
+        return writer.count
+
+    def find(self, mall_id=None, category=None, major=None, mid=None, minor=None, region=None,
+             no_tags=False, text=None, limit=None):
+        """Products matching every given filter, in catalog order.
+
+        ``text`` is searched in name, description and tags: through the
+        trigram index when it has at least three characters, otherwise by
+        scanning those columns.
+        """
+        clauses = []
+        params = []
+        for column, value in (
+            ('mall_id', mall_id), ('category', category), ('category_major', major),
+            ('category_mid', mid), ('category_minor', minor), ('region', region),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if no_tags:
+            clauses.append("(tags IS NULL OR tags = '[]')")
+        if text:
+            if len(text) >= MIN_FTS_QUERY:
+                clauses.append('pos IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)')
+                params.append('"' + text.replace('"', '""') + '"')
+            else:
+                clauses.append('(instr(lower(name), ?) OR instr(lower(description), ?) OR instr(lower(tags), ?))')
+                params.extend([text.lower()] * 3)
+        sql = 'SELECT record FROM products'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY pos'
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        for (record,) in self.connection.execute(sql, params):
+            yield json.loads(record)
+
+    def query(self, sql, params=()):
+        """Run any SQL; returns (column names, rows)"""
+        before = self.connection.total_changes
+        with self.connection:
+            cursor = self.connection.execute(sql, params)
+            rows = cursor.fetchall()
+        if self.connection.total_changes != before:
+            self.mark_dirty()
+        return [column[0] for column in cursor.description or ()], rows
@@ -0,0 +1,470 @@
+"""Keyword classifier shared by the category fix-up scripts.
+
+A rule table maps a category to its keywords. The table is compiled once into
+an Aho-Corasick automaton, so each text field of a product is scanned a single
+time and every category is scored from that one scan.
+
+Substring matching lets single-syllable keywords such as 어, 조, 게, 배, 감
+and 김 match inside almost any Korean word (넣어, 건조, 부드럽게, 택배, 식감,
+튀김). In ``token`` matching mode the text is first split into words and
+each word into the nouns of a curated lexicon (``NounLexicon``), and a
+single-syllable keyword only matches a syllable that stands as a noun of its
+own: 김 in 김부각 and 곱창김, 배 in 배즙 and 나주배, but not in 튀김,
+새우튀김, 포기김치 or 택배. The keyword syllables of each word are looked up
+in a hashed set; longer keywords still match inside words (사과 in 사과즙),
+but never across them.
+"""
+import hashlib
+import json
+import re
+import time
+
+MATCHING_MODES = ('substring', 'token')
+
+HANGUL_WORD = re.compile(r'[가-힣]+')
+
+
+class NounLexicon:
+    """The nouns ``token`` matching splits Korean words into.
+
+    ``nouns`` maps a noun to the keyword syllables it stands for: 장어 to
+    ['어'], 튀김 to [], so no keyword inside it counts. ``particles`` are
+    stripped from the end of a word unless a noun ends there (곱창김을 and
+    쌀로, but not 감말랭이). A syllable in
+    ``bound`` is as often a suffix as a noun at the end of a word (부드럽게,
+    넣어, 식감, 택배), so there it only counts next to a known noun. ``cases``
+    map sample words to the keyword syllables they must yield, checked by
+    ``check`` when the rules are compiled.
+    """
+
+    def __init__(self, nouns=None, particles=(), bound=(), cases=None):
+        self.nouns = {noun: tuple(heads) for noun, heads in (nouns or {}).items()}
+        self.particles = sorted(particles, key=len, reverse=True)
+        self.bound = frozenset(bound)
+        self.cases = dict(cases or {})
+        fingerprint = json.dumps(
+            [sorted(self.nouns.items()), self.particles, sorted(self.bound)], ensure_ascii=False
+        )
+        self.version = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:8]
+
+    def check(self, singles):
+        """[(word, expected, actual)] of the cases that fail with these keyword syllables"""
+        splitter = WordSplitter(self, singles)
+        failures = []
+        for word, expected in self.cases.items():
+            actual = sorted(splitter.heads(word))
+            if actual != sorted(expected):
+                failures.append((word, sorted(expected), actual))
+        return failures
+
+
+class WordSplitter:
+    """Split Hangul words into lexicon nouns and keyword syllables, with a cache per word.
+
+    A word is segmented to cover as many syllables as possible with known
+    pieces (lexicon nouns and the keyword syllables), then with as few pieces
+    as possible. A noun contributes its listed syllables. A keyword syllable
+    counts when it is the whole word, when a known piece is next to it, or
+    when it ends the word and is not in the lexicon's ``bound`` set: Korean
+    compounds put the head noun last (오대쌀, 딸기잼), and an unknown stem
+    followed by a keyword syllable at the start (김평곤, 감미인) is a name.
+    """
+
+    def __init__(self, lexicon, singles):
+        self.lexicon = lexicon
+        self.singles = frozenset(singles)
+        self.longest = max(map(len, lexicon.nouns), default=1)
+        self._heads = {}
+
+    def segment(self, word):
+        """[(piece, known)] covering word, known pieces as long as the lexicon allows"""
+        nouns = self.lexicon.nouns
+        singles = self.singles
+        # best[i]: (syllables covered by known pieces, -pieces) of word[:i]
+        best = [(0, 0)] + [None] * len(word)
+        back = [None] * (len(word) + 1)
+        for start in range(len(word)):
+            covered, pieces = best[start]
+            end = start + 1
+            if best[end] is None or (covered, pieces - 1) > best[end]:
+                best[end] = (covered, pieces - 1)
+                back[end] = (start, False)
+            for end in range(start + 1, min(len(word), start + self.longest) + 1):
+                piece = word[start:end]
+                if piece in nouns or piece in singles:
+                    score = (covered + end - start, pieces - 1)
+                    if best[end] is None or score > best[end]:
+                        best[end] = score
+                        back[end] = (start, True)
+        segments = []
+        end = len(word)
+        while end:
+            start, known = back[end]
+            segments.append((word[start:end], known))
+            end = start
+        segments.reverse()
+        return segments
+
+    def heads(self, word):
+        """The keyword syllables a Hangul word stands for"""
+        heads = self._heads.get(word)
+        if heads is None:
+            heads = self._heads[word] = self._split(word)
+        return heads
+
+    def _split(self, word):
+        segments = self.segment(word)
+        if segments[-1][0] not in self.lexicon.nouns:
+            # A trailing particle is dropped unless a noun ends with it
+            for particle in self.lexicon.particles:
+                if word.endswith(particle) and len(word) > len(particle):
+                    segments = self.segment(word[:-len(particle)])
+                    break
+        last = len(segments) - 1
+        heads = set()
+        for index, (piece, known) in enumerate(segments):
+            if not known:
+                continue
+            if piece in self.lexicon.nouns:
+                heads.update(self.lexicon.nouns[piece])
+            elif (
+                last == 0
+                or (index > 0 and segments[index - 1][1])
+                or (index < last and segments[index + 1][1])
+                or (index == last and piece not in self.lexicon.bound)
+            ):
+                heads.add(piece)
+        return frozenset(heads & self.singles)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton that reports which keywords occur in a text.
+
+    With ``only``, just the keywords at those indexes are searched for; the
+    indexes reported still refer to the full list.
+    """
+
+    def __init__(self, keywords, only=None):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for index, keyword in enumerate(self.keywords):
+            if only is not None and index not in only:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] = self._out[state] + (index,)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, text):
+        """Return the set of keyword indexes found anywhere in text"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        found = set()
+        state = 0
+        for char in text:
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state or 0
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class TokenMatcher:
+    """Find keywords with single syllables matched as nouns of their own.
+
+    Keywords of two or more syllables are found by an automaton of their own
+    and contain no spaces, so they always match within one word. Each word
+    of the text is then split once (``WordSplitter``), and the keyword
+    syllables it stands for are looked up in a hashed set of the
+    single-syllable keywords.
+    """
+
+    def __init__(self, keywords, lexicon):
+        self.keywords = list(keywords)
+        self._singles = {
+            keyword: index for index, keyword in enumerate(self.keywords)
+            if len(keyword) == 1 and HANGUL_WORD.fullmatch(keyword)
+        }
+        singles = set(self._singles.values())
+        self._automaton = KeywordAutomaton(
+            self.keywords, only={index for index in range(len(self.keywords)) if index not in singles},
+        )
+        self.splitter = WordSplitter(lexicon, self._singles)
+
+    def find(self, text):
+        """Return the set of keyword indexes found in text"""
+        found = self._automaton.find(text)
+        if self._singles:
+            heads = set()
+            for word in HANGUL_WORD.findall(text):
+                heads.update(self.splitter.heads(word))
+            found.update(self._singles[head] for head in heads)
+        return found
+
+
+class KeywordClassifier:
+    """Score products against a category -> keywords rule table.
+
+    In weighted mode each keyword scores 2 when found in the name, otherwise
+    1.5 in the description, otherwise 1 in the tags. Without weighting a
+    keyword scores 1 when found in any of them. The best category wins (ties go
+    to the category listed first) if its score exceeds ``threshold``.
+
+    ``matching`` is ``substring`` (keywords match anywhere) or ``token``
+    (single-syllable keywords only match as nouns of their own in the words
+    of ``lexicon``, a ``NounLexicon``; see ``TokenMatcher``).
+
+    ``version`` fingerprints the rules and settings, so cached results can be
+    invalidated when either changes. Setting ``manifest`` to a
+    ``ClassificationManifest`` makes ``classify`` reuse its cached results,
+    and setting ``profile`` to a ``catalog.profiling.RuleProfile`` records
+    the keywords, winner and time of every ``compute``.
+    """
+
+    def __init__(self, rules, weighted=True, threshold=0, default='기타', name='classifier',
+                 matching='substring', lexicon=None):
+        self.name = name
+        self.categories = list(rules)
+        self.weighted = weighted
+        self.threshold = threshold
+        self.default = default
+        self.manifest = None
+        self.profile = None
+
+        # Category order breaks ties in ``decide``, so it is part of the version
+        fingerprint = json.dumps([list(rules.items()), weighted, threshold, default], ensure_ascii=False)
+        self.rules_version = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]
+
+        # A keyword listed under several categories (or twice under one)
+        # is scanned once and credited to each of its entries.
+        keyword_index = {}
+        self._targets = []
+        for category_index, category in enumerate(self.categories):
+            for keyword in rules[category]:
+                keyword = keyword.lower()
+                if keyword not in keyword_index:
+                    keyword_index[keyword] = len(self._targets)
+                    self._targets.append([])
+                self._targets[keyword_index[keyword]].append(category_index)
+
+        self.automaton = KeywordAutomaton(keyword_index)
+        self.lexicon = lexicon if lexicon is not None else NounLexicon()
+        self.token_matcher = TokenMatcher(self.automaton.keywords, self.lexicon)
+        self.matching = matching
+
+    @property
+    def matching(self):
+        return self._matching
+
+    @matching.setter
+    def matching(self, mode):
+        if mode not in MATCHING_MODES:
+            raise ValueError(f"Unknown matching mode '{mode}', expected one of {', '.join(MATCHING_MODES)}")
+        self._matching = mode
+
+    @property
+    def version(self):
+        """Rules version, tagged with the matching mode and lexicon unless substring matching is used"""
+        if self._matching == 'substring':
+            return self.rules_version
+        return f"{self.rules_version}-{self._matching}-{self.lexicon.version}"
+
+    def fields(self, product):
+        """Return the lowercased name, description and joined tag text"""
+        name = (product.get('name') or '').lower()
+        description = (product.get('description') or '').lower()
+        tags = ' '.join(tag.lower() for tag in product.get('tags') or [])
+        return name, description, tags
+
+    def matches(self, product):
+        """Return {keyword index: weight} of the keywords found in product"""
+        name, description, tags = self.fields(product)
+        find = self.automaton.find if self._matching == 'substring' else self.token_matcher.find
+
+        if self.weighted:
+            weights = {}
+            for keyword in find(tags):
+                weights[keyword] = 1
+            for keyword in find(description):
+                weights[keyword] = 1.5
+            for keyword in find(name):
+                weights[keyword] = 2
+        else:
+            # Keywords never contain spaces, so one scan of the joined text
+            # finds exactly the keywords present in any single field (and the
+            # space keeps the last word of one field from running into the next).
+            weights = dict.fromkeys(find(f"{name} {description} {tags}"), 1)
+        return weights
+
+    def tally(self, weights):
+        """Return {category: score} of matched keywords, for every category above zero"""
+        totals = [0] * len(self.categories)
+        for keyword, weight in weights.items():
+            for category_index in self._targets[keyword]:
+                totals[category_index] += weight
+
+        return {
+            category: total
+            for category, total in zip(self.categories, totals)
+            if total > 0
+        }
+
+    def scores(self, product):
+        """Return {category: score} for every category that scored above zero"""
+        return self.tally(self.matches(product))
+
+    def decide(self, scores):
+        """Return the best scoring category, or the default if none is strong enough"""
+        best_category = None
+        best_score = 0
+        for category, score in scores.items():
+            if score > best_score:
+                best_category, best_score = category, score
+
+        if best_category is not None and best_score > self.threshold:
+            return best_category
+        return self.default
+
+    def classify(self, product):
+        """Return the best scoring category, or the default if none is strong enough"""
+        if self.manifest is not None:
+            return self.manifest.classify(self, product)
+        return self.compute(product)
+
+    def compute(self, product):
+        """Classify product without consulting the manifest"""
+        if self.profile is not None:
+            return self._compute_profiled(product)
+        return self.decide(self.tally(self.matches(product)))
+
+    def _compute_profiled(self, product):
+        started = time.perf_counter()
+        weights = self.matches(product)
+        category = self.decide(self.tally(weights))
+        elapsed = time.perf_counter() - started
+        self.profile.record(
+            self.name, elapsed, [self.automaton.keywords[index] for index in weights],
+            category, self._winning(weights, category),
+        )
+        return category
+
+    def _winning(self, weights, category):
+        if category not in self.categories:
+            return []
+        category_index = self.categories.index(category)
+        keywords = self.automaton.keywords
+        return [keywords[index] for index in weights if category_index in self._targets[index]]
+
+    def winning_keywords(self, product, category):
+        """Keywords found in product that count towards category"""
+        return self._winning(self.matches(product), category)
+
+
+class MappingClassifier:
+    """Python port of classifyProduct in src/lib/product-classifier.ts.
+
+    ``mapping`` is category-mapping.json: category id -> subcategories, each
+    with a keyword list. A subcategory's confidence is the share of its
+    keywords found in the lowercased "name description" text, plus 0.3 if
+    any of them occurs in the name, capped at 1. The first subcategory with
+    the highest confidence wins if that confidence exceeds 0.1.
+
+    As with ``KeywordClassifier``, a ``profile`` records every classification.
+    """
+
+    def __init__(self, mapping, name='mapping'):
+        self.name = name
+        self.profile = None
+        # Subcategory order breaks ties in ``_best``, so it is part of the version
+        fingerprint = json.dumps(mapping, ensure_ascii=False)
+        self.version = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]
+
+        keyword_index = {}
+        # (category id, subcategory id, keyword indexes with repeats, keyword count)
+        self.subcategories = []
+        for category_id, category in mapping.items():
+            for subcategory_id, subcategory in category['subcategories'].items():
+                indexes = []
+                for keyword in subcategory['keywords']:
+                    indexes.append(keyword_index.setdefault(keyword.lower(), len(keyword_index)))
+                self.subcategories.append((category_id, subcategory_id, indexes, len(indexes)))
+        self.automaton = KeywordAutomaton(keyword_index)
+        # An empty keyword is contained in every text, as with String.includes
+        self._empty = keyword_index.get('')
+
+    def _find(self, text):
+        found = self.automaton.find(text)
+        if self._empty is not None:
+            found.add(self._empty)
+        return found
+
+    def classify(self, product):
+        """Return {'mainCategory', 'subcategory', 'confidence'} or None"""
+        if self.profile is not None:
+            return self._classify_profiled(product)
+        return self._best(product)[0]
+
+    def _classify_profiled(self, product):
+        started = time.perf_counter()
+        best_match, indexes, search_found = self._best(product)
+        elapsed = time.perf_counter() - started
+        keywords = self.automaton.keywords
+        if best_match:
+            label = f"{best_match['mainCategory']}/{best_match['subcategory']}"
+            winning = [keywords[index] for index in dict.fromkeys(indexes) if index in search_found]
+        else:
+            label, winning = None, []
+        self.profile.record(self.name, elapsed, [keywords[index] for index in search_found], label, winning)
+        return best_match
+
+    def _best(self, product):
+        """The best match (or None), its keyword indexes and the keyword indexes found"""
+        name = product.get('name') or ''
+        search_found = self._find(f"{name} {product.get('description') or ''}".lower())
+        name_found = self._find(name.lower())
+
+        best_match = None
+        best_indexes = ()
+        highest_confidence = 0
+        for category_id, subcategory_id, indexes, total in self.subcategories:
+            match_count = sum(1 for index in indexes if index in search_found)
+            if match_count:
+                boost = 0.3 if any(index in name_found for index in indexes) else 0
+                confidence = min(match_count / total + boost, 1)
+                if confidence > highest_confidence:
+                    highest_confidence = confidence
+                    best_match = {
+                        'mainCategory': category_id,
+                        'subcategory': subcategory_id,
+                        'confidence': confidence,
+                    }
+                    best_indexes = indexes
+        if highest_confidence > 0.1:
+            return best_match, best_indexes, search_found
+        return None, (), search_found
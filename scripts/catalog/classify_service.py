@@ -0,0 +1,283 @@
+"""A resident classification service for the sync path.
+
+``ProductSyncService.syncMall`` used to classify each scraped product with
+classifyProduct in TypeScript, and the Python fix-ups only caught up when
+their scripts next ran, as cold processes that reload the rules and reparse
+the catalog. ``ClassificationService`` keeps the compiled rule set and the
+category hierarchy loaded and classifies a batch of products the way the
+scrape-then-pipeline path does:
+
+* the category-mapping.json classifier (the port of classifyProduct) sets the
+  mapping category and tag, as syncMall does;
+* every category stage then runs over the product, ending with the
+  hierarchy. A category the stages cannot place in the hierarchy, such as a
+  mapping id or a scraper's placeholder, is treated as missing, so the
+  product is classified from scratch by the fix-missing rules.
+
+The service answers over HTTP, on a localhost port or a Unix socket:
+
+  POST /classify  {"products": [...]} -> {"results": [...]}, one result per
+                  product with category, categoryMajor/Mid/Minor/Original,
+                  tags and the mapping classification; 400 for a body
+                  that is not a batch of products, 500 when a stage fails
+  GET /metrics    request, product and error counts, throughput and
+                  batch latency percentiles
+  GET /health     the rule set fingerprint the service was started with
+
+The rules are loaded once, at start; restart the service after a rules change.
+"""
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from catalog.hierarchy import HIERARCHY_INDEX
+from catalog.rules import MAPPING_CLASSIFIER, RULE_SET
+from catalog.scraping import apply_classification
+from catalog.stages import DEFAULT_STAGES, STAGES
+
+DEFAULT_PORT = 8765
+MAX_BATCH = 5000
+LATENCY_WINDOW = 1024
+# Fields of a product the classifiers read, and the ones a result reports
+INPUT_FIELDS = ('name', 'description', 'tags', 'category')
+TEXT_FIELDS = ('name', 'description', 'category')
+RESULT_FIELDS = ('category', 'categoryMajor', 'categoryMid', 'categoryMinor', 'categoryOriginal', 'tags')
+
+
+class BatchError(ValueError):
+    """A request body that is not a batch of products"""
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def check_product(index, product):
+    """Raise BatchError unless the input fields of a product have the types the stages expect"""
+    for field in TEXT_FIELDS:
+        if product.get(field) is not None and not isinstance(product[field], str):
+            raise BatchError(f"product {index}: {field} must be a string")
+    tags = product.get('tags')
+    if tags is not None and not (isinstance(tags, list) and all(isinstance(tag, str) for tag in tags)):
+        raise BatchError(f"product {index}: tags must be a list of strings")
+
+
+class ServiceMetrics:
+    """Counters and a window of recent batch latencies, safe to update from handler threads"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.products = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, products, seconds):
+        with self.lock:
+            self.requests += 1
+            self.products += products
+            self.busy_seconds += seconds
+            self.latencies.append(seconds)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            uptime = time.time() - self.started
+            ordered = sorted(self.latencies)
+            return {
+                'uptimeSeconds': round(uptime, 1),
+                'requests': self.requests,
+                'products': self.products,
+                'errors': self.errors,
+                'productsPerSecond': round(self.products / self.busy_seconds, 1) if self.busy_seconds else 0,
+                'requestsPerMinute': round(self.requests / uptime * 60, 2) if uptime else 0,
+                'meanBatchSize': round(self.products / self.requests, 1) if self.requests else 0,
+                'latencyMs': {
+                    'window': len(ordered),
+                    'p50': round(percentile(ordered, 0.5) * 1000, 3),
+                    'p90': round(percentile(ordered, 0.9) * 1000, 3),
+                    'p99': round(percentile(ordered, 0.99) * 1000, 3),
+                    'max': round((ordered[-1] if ordered else 0.0) * 1000, 3),
+                },
+            }
+
+
+class ClassificationService:
+    """Classify batches of products with the rules loaded at start"""
+
+    def __init__(self, stage_names=None, max_batch=MAX_BATCH):
+        self.stages = [STAGES[name] for name in (DEFAULT_STAGES if stage_names is None else stage_names)]
+        self.max_batch = max_batch
+        self.fingerprint = RULE_SET.fingerprint
+        self.metrics = ServiceMetrics()
+
+    def _run_stages(self, record):
+        for apply in self.stages:
+            apply(record)
+
+    def classify(self, product):
+        """The classified fields of one product; the product itself is left as is"""
+        record = {field: product[field] for field in INPUT_FIELDS if field in product}
+        record['tags'] = list(record.get('tags') or [])
+        classification = apply_classification(record, MAPPING_CLASSIFIER)
+
+        unplaced = dict(record, tags=list(record['tags']))
+        self._run_stages(record)
+        if record.get('category') not in HIERARCHY_INDEX and 'category' in unplaced:
+            # The stages could not place the category; classify from scratch
+            del unplaced['category']
+            record = unplaced
+            self._run_stages(record)
+
+        result = {field: record.get(field) for field in RESULT_FIELDS}
+        result['classification'] = classification
+        return result
+
+    def classify_batch(self, products):
+        """Results for a list of products, in order, recorded in the metrics"""
+        if not isinstance(products, list) or not all(isinstance(product, dict) for product in products):
+            raise BatchError('expected {"products": [ {...}, ... ]}')
+        if len(products) > self.max_batch:
+            raise BatchError(f"batch of {len(products)} products exceeds the limit of {self.max_batch}")
+        for index, product in enumerate(products):
+            check_product(index, product)
+        started = time.perf_counter()
+        results = [self.classify(product) for product in products]
+        self.metrics.record(len(products), time.perf_counter() - started)
+        return results
+
+    def health(self):
+        return {'status': 'ok', 'pid': os.getpid(), 'rules': self.fingerprint, 'stages': len(self.stages)}
+
+
+class ClassificationHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/metrics':
+            self._send(200, service.metrics.snapshot())
+        elif self.path == '/health':
+            self._send(200, service.health())
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        service = self.server.service
+        # Read the body even when refusing it, so the connection stays usable
+        data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path != '/classify':
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            body = json.loads(data or b'{}')
+            results = service.classify_batch(body.get('products') if isinstance(body, dict) else None)
+        except (BatchError, UnicodeDecodeError, json.JSONDecodeError) as exc:
+            # Malformed JSON or UTF-8, or not a batch of products
+            service.metrics.record_error()
+            self._send(400, {'error': str(exc)})
+            return
+        except Exception as exc:
+            # A failing stage; answer rather than drop the connection
+            service.metrics.record_error()
+            self._send(500, {'error': f"{type(exc).__name__}: {exc}"})
+            return
+        self._send(200, {'results': results})
+
+    def _send(self, status, document):
+        body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ClassificationServer(ThreadingHTTPServer):
+    """The service on a localhost TCP port"""
+
+    daemon_threads = True
+
+    def __init__(self, service, host='127.0.0.1', port=DEFAULT_PORT):
+        super().__init__((host, port), ClassificationHandler)
+        self.service = service
+
+
+class UnixClassificationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """The service on a Unix socket; a stale socket file is replaced"""
+
+    daemon_threads = True
+
+    def __init__(self, service, path):
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, ClassificationHandler)
+        self.service = service
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServiceClient:
+    """A keep-alive connection to a running service, on a port or a Unix socket"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, timeout=30):
+        if socket_path:
+            self.connection = UnixHTTPConnection(socket_path, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, document=None):
+        body = json.dumps(document, ensure_ascii=False).encode('utf-8') if document is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        data = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path}: HTTP {response.status}: {data.get('error')}")
+        return data
+
+    def classify(self, products):
+        return self.request('POST', '/classify', {'products': products})['results']
+
+    def metrics(self):
+        return self.request('GET', '/metrics')
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,278 @@
+"""Compact columnar build of the catalog that can be memory-mapped.
+
+products.json repeats every key and every mall and category string for each
+record. The columnar file stores instead:
+
+* one interned dictionary per string column (category levels, mall fields and
+  region) and a ``uint32`` code per record, ``NULL_CODE`` when absent;
+* fixed-width numeric columns: ``price`` (``int64``; string prices such as
+  "30,000원" hold their numeric value), ``clickCount`` (``int32``) and
+  ``flags`` (``uint16``, a present bit and a value bit per boolean field);
+* each record's key order as a code into a small table of shapes;
+* everything else, and any value a column cannot hold exactly, as compact
+  JSON per record in a ``rest`` blob.
+
+Layout: the magic, a format version and a JSON header length, the header
+(record count, shapes, dictionaries and the offset of each column), then the
+8-byte aligned little-endian column arrays. ``ColumnarCatalog`` maps the file
+and reads a single column without touching the others, and can rebuild every
+record exactly as it was in products.json.
+"""
+import json
+import mmap
+import re
+import struct
+import sys
+from array import array
+
+from catalog.products_io import atomic_open
+
+MAGIC = b'PCOL'
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct('<4sII')
+
+STRING_COLUMNS = (
+    'category', 'categoryMajor', 'categoryMid', 'categoryMinor', 'categoryOriginal',
+    'mallId', 'mallName', 'mallUrl', 'region',
+)
+FLAG_FIELDS = ('isNew', 'isFeatured', 'featured', 'inStock', 'isAvailable', 'isFood')
+
+NULL_CODE = 0xFFFFFFFF
+MISSING_PRICE = -2 ** 63
+MISSING_COUNT = -2 ** 31
+
+PRICE_NUMBER = re.compile(r'\d[\d,]*')
+COLUMN_FIELDS = frozenset(STRING_COLUMNS) | frozenset(FLAG_FIELDS) | {'price', 'clickCount'}
+
+
+def is_columnar(path):
+    """True if path holds a columnar catalog rather than a JSON array"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def parse_price(value):
+    """Numeric value of an int or "30,000원"-style price, None if there is none"""
+    if type(value) is int:
+        return value
+    if isinstance(value, str):
+        match = PRICE_NUMBER.search(value)
+        if match:
+            return int(match.group().replace(',', ''))
+    return None
+
+
+def write_columnar(products, path):
+    """Write an iterable of records as a columnar catalog; return the count"""
+    shapes = {}
+    dictionaries = {name: {} for name in STRING_COLUMNS}
+    columns = {name: array('I') for name in STRING_COLUMNS}
+    columns.update({
+        'shape': array('I'),
+        'price': array('q'),
+        'clickCount': array('i'),
+        'flags': array('H'),
+        'restOffsets': array('Q', [0]),
+    })
+    rest_blob = bytearray()
+
+    for product in products:
+        rest = {}
+        columns['shape'].append(shapes.setdefault(tuple(product), len(shapes)))
+
+        for name in STRING_COLUMNS:
+            value = product.get(name)
+            if isinstance(value, str):
+                columns[name].append(dictionaries[name].setdefault(value, len(dictionaries[name])))
+            else:
+                columns[name].append(NULL_CODE)
+                if name in product:
+                    rest[name] = value
+
+        price = product.get('price')
+        number = parse_price(price)
+        # Prices past the int64 range stay in rest, like out-of-range counts
+        stored = number is not None and MISSING_PRICE < number < 2 ** 63
+        columns['price'].append(number if stored else MISSING_PRICE)
+        if 'price' in product and (type(price) is not int or not stored):
+            rest['price'] = price
+
+        count = product.get('clickCount')
+        if type(count) is int and MISSING_COUNT < count < 2 ** 31:
+            columns['clickCount'].append(count)
+        else:
+            columns['clickCount'].append(MISSING_COUNT)
+            if 'clickCount' in product:
+                rest['clickCount'] = count
+
+        flags = 0
+        for bit, name in enumerate(FLAG_FIELDS):
+            value = product.get(name)
+            if type(value) is bool:
+                flags |= (1 << (2 * bit)) | (value << (2 * bit + 1))
+            elif name in product:
+                rest[name] = value
+        columns['flags'].append(flags)
+
+        for key, value in product.items():
+            if key not in COLUMN_FIELDS:
+                rest[key] = value
+        if rest:
+            rest_blob += json.dumps(rest, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        columns['restOffsets'].append(len(rest_blob))
+
+    columns['rest'] = array('B', rest_blob)
+    total = len(columns['shape'])
+
+    if sys.byteorder != 'little':
+        for data in columns.values():
+            data.byteswap()
+
+    # Lay the columns out after the header, each aligned to 8 bytes
+    def build_header(start):
+        layout = {}
+        offset = start
+        for name, data in columns.items():
+            offset = (offset + 7) & ~7
+            layout[name] = {'type': data.typecode, 'offset': offset, 'length': len(data)}
+            offset += len(data) * data.itemsize
+        header = {
+            'count': total,
+            'shapes': [list(shape) for shape in sorted(shapes, key=shapes.get)],
+            'dictionaries': {name: list(values) for name, values in dictionaries.items()},
+            'columns': layout,
+        }
+        return json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    # Column offsets depend on the header length, so settle it first
+    header = build_header(0)
+    while True:
+        start = (PREAMBLE.size + len(header) + 7) & ~7
+        settled = build_header(start)
+        if len(settled) == len(header):
+            header = settled
+            break
+        header = settled
+
+    with atomic_open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        position = PREAMBLE.size + len(header)
+        for data in columns.values():
+            padding = -position % 8
+            f.write(b'\0' * padding)
+            f.write(data.tobytes())
+            position += padding + len(data) * data.itemsize
+    return total
+
+
+class ColumnarCatalog:
+    """Read-only, memory-mapped view of a columnar catalog.
+
+    ``codes``, ``prices``, ``click_counts`` and ``flags`` return arrays backed
+    by the mapping, so reading one column only pages in that column.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a columnar catalog")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has columnar format {version}, expected {FORMAT_VERSION}")
+        header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + header_length].decode('utf-8'))
+        self.count = header['count']
+        self.shapes = [tuple(shape) for shape in header['shapes']]
+        self.dictionaries = header['dictionaries']
+        self._layout = header['columns']
+        self._buffer = memoryview(self._map)
+        self._views = {}
+
+    def _column(self, name):
+        if name not in self._views:
+            spec = self._layout[name]
+            if sys.byteorder == 'little':
+                size = array(spec['type']).itemsize
+                data = self._buffer[spec['offset']:spec['offset'] + spec['length'] * size].cast(spec['type'])
+            else:
+                data = array(spec['type'])
+                size = data.itemsize
+                data.frombytes(self._map[spec['offset']:spec['offset'] + spec['length'] * size])
+                data.byteswap()
+            self._views[name] = data
+        return self._views[name]
+
+    def codes(self, name):
+        """Dictionary codes of a string column, ``NULL_CODE`` where absent"""
+        if name not in STRING_COLUMNS:
+            raise KeyError(f"'{name}' is not a string column")
+        return self._column(name)
+
+    def strings(self, name):
+        """Values of a string column, None where absent or not a string"""
+        values = self.dictionaries[name]
+        return [None if code == NULL_CODE else values[code] for code in self.codes(name)]
+
+    def prices(self):
+        """Numeric prices, ``MISSING_PRICE`` where there is none"""
+        return self._column('price')
+
+    def click_counts(self):
+        """Click counts, ``MISSING_COUNT`` where absent"""
+        return self._column('clickCount')
+
+    def flags(self, name):
+        """Values of a boolean field, None where absent or not a bool"""
+        bit = 2 * FLAG_FIELDS.index(name)
+        return [bool(flags >> (bit + 1) & 1) if flags >> bit & 1 else None for flags in self._column('flags')]
+
+    def rest(self, index):
+        """The fields of one record that are not held in columns"""
+        offsets = self._column('restOffsets')
+        start, end = offsets[index], offsets[index + 1]
+        return json.loads(bytes(self._column('rest')[start:end]).decode('utf-8')) if end > start else {}
+
+    def record(self, index):
+        """Rebuild one record exactly as it was written"""
+        rest = self.rest(index)
+
+        record = {}
+        for key in self.shapes[self._column('shape')[index]]:
+            if key in rest:
+                record[key] = rest[key]
+            elif key in STRING_COLUMNS:
+                record[key] = self.dictionaries[key][self._column(key)[index]]
+            elif key == 'price':
+                record[key] = self._column('price')[index]
+            elif key == 'clickCount':
+                record[key] = self._column('clickCount')[index]
+            else:
+                bit = 2 * FLAG_FIELDS.index(key) + 1
+                record[key] = bool(self._column('flags')[index] >> bit & 1)
+        return record
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.record(index)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """Release the mapping"""
+        for view in self._views.values():
+            if isinstance(view, memoryview):
+                view.release()
+        self._views = {}
+        self._buffer.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,146 @@
+"""Compile the keyword rule files into a cached, versioned matcher bundle.
+
+The rule data lives in src/data, next to the app that also reads it:
+
+* classification-rules.json - the keyword tables and settings of the Python
+  fix-up classifiers (misc, missing, jeonche, popular);
+* category-mapping.json - the category -> subcategory keyword model used by
+  src/lib/product-classifier.ts;
+* tag-mapping.json - which categories a product tag points to;
+* noun-lexicon.json - the nouns ``token`` matching splits words into, with
+  sample words whose keyword syllables are checked on every compile.
+
+``load_rule_set`` returns the compiled classifiers. Building the automatons
+happens once; the result is pickled to scripts/output/compiled-rules.pickle
+under a fingerprint of the rule files, the code that builds the classifiers
+and the Python version, and later runs unpickle it as long as the fingerprint
+still matches.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+from catalog import classifier
+from catalog.classifier import HANGUL_WORD, KeywordClassifier, MappingClassifier, NounLexicon
+from catalog.products_io import DATA_DIR, atomic_open
+
+RULES_PATH = os.path.join(DATA_DIR, 'classification-rules.json')
+CATEGORY_MAPPING_PATH = os.path.join(DATA_DIR, 'category-mapping.json')
+TAG_MAPPING_PATH = os.path.join(DATA_DIR, 'tag-mapping.json')
+LEXICON_PATH = os.path.join(DATA_DIR, 'noun-lexicon.json')
+SOURCE_PATHS = (RULES_PATH, CATEGORY_MAPPING_PATH, TAG_MAPPING_PATH, LEXICON_PATH)
+
+COMPILED_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', 'output', 'compiled-rules.pickle')
+)
+COMPILER_VERSION = 1
+
+
+class LexiconError(ValueError):
+    """A case of noun-lexicon.json does not split into the keyword syllables it lists"""
+
+
+class RuleSet:
+    """The compiled classifiers and tag lookup built from the rule files"""
+
+    def __init__(self, classifiers, mapping, tag_categories, fingerprint):
+        self.classifiers = classifiers
+        self.mapping = mapping
+        self.tag_categories = tag_categories
+        self.fingerprint = fingerprint
+
+    def tag_votes(self, product):
+        """Category ids that the product's tags point to, in tag order"""
+        votes = []
+        for tag in product.get('tags') or []:
+            for category_id in self.tag_categories.get(tag, ()):
+                if category_id not in votes:
+                    votes.append(category_id)
+        return votes
+
+
+def source_fingerprint(paths=SOURCE_PATHS):
+    """Hash of the rule files, the classifier and compiler code and the Python version"""
+    digest = hashlib.sha1(f"{COMPILER_VERSION}:{sys.version_info[:2]}".encode('utf-8'))
+    for path in (*paths, classifier.__file__, __file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def compile_rule_set(paths=SOURCE_PATHS):
+    """Build every classifier from the rule files"""
+    rules_path, category_mapping_path, tag_mapping_path, lexicon_path = paths
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        rule_tables = json.load(f)
+    with open(category_mapping_path, 'r', encoding='utf-8') as f:
+        category_mapping = json.load(f)
+    with open(tag_mapping_path, 'r', encoding='utf-8') as f:
+        tag_mapping = json.load(f)
+    lexicon = load_lexicon(lexicon_path, rule_tables)
+
+    classifiers = {
+        name: KeywordClassifier(
+            table['rules'],
+            weighted=table['weighted'],
+            threshold=table['threshold'],
+            default=table['default'],
+            name=name,
+            matching=table.get('matching', 'substring'),
+            lexicon=lexicon,
+        )
+        for name, table in rule_tables.items()
+    }
+    return RuleSet(
+        classifiers,
+        MappingClassifier(category_mapping),
+        tag_mapping.get('tagToCategoryMapping', {}),
+        source_fingerprint(paths),
+    )
+
+
+def load_lexicon(path, rule_tables):
+    """The noun lexicon, once its cases hold for the single-syllable keywords of the tables"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    lexicon = NounLexicon(data['nouns'], data['particles'], data['bound'], data['cases'])
+    singles = {
+        keyword.lower()
+        for table in rule_tables.values() for keywords in table['rules'].values() for keyword in keywords
+        if len(keyword) == 1 and HANGUL_WORD.fullmatch(keyword)
+    }
+    failures = lexicon.check(singles)
+    if failures:
+        raise LexiconError('; '.join(
+            f"{word} gives {actual or 'nothing'}, expected {expected or 'nothing'}"
+            for word, expected, actual in failures
+        ))
+    return lexicon
+
+
+def load_rule_set(paths=SOURCE_PATHS, compiled_path=COMPILED_PATH):
+    """Return the cached rule set, recompiling it if any source changed"""
+    fingerprint = source_fingerprint(paths)
+    if compiled_path and os.path.exists(compiled_path):
+        try:
+            with open(compiled_path, 'rb') as f:
+                cached_fingerprint, rule_set = pickle.load(f)
+            if cached_fingerprint == fingerprint:
+                return rule_set
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+            # A stale or damaged cache is rebuilt below
+            pass
+
+    rule_set = compile_rule_set(paths)
+    if compiled_path:
+        save_rule_set(rule_set, compiled_path)
+    return rule_set
+
+
+def save_rule_set(rule_set, compiled_path=COMPILED_PATH):
+    """Write a compiled rule set to the cache"""
+    os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+    with atomic_open(compiled_path, 'wb') as f:
+        pickle.dump((rule_set.fingerprint, rule_set), f, protocol=pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,100 @@
+"""Precomputed product totals per region and category for the site.
+
+``catalog_counts`` counts the listed products of the catalog per region id
+and per categoryMajor in one pass, so the home page map can show them
+without loading products.json.
+
+Products record their region inconsistently ('전남', '강원도 삼척시', or
+nothing), so regions are resolved to the ids of regions.json from the
+product's region or else its mall's.
+"""
+import json
+import os
+
+from catalog.products_io import DATA_DIR, iter_products
+from catalog.report import MISSING, hierarchy_path, mall_name
+from catalog.search_index import product_mall_id
+
+COUNTS_PATH = os.path.join(DATA_DIR, 'catalog-counts.json')
+REGIONS_PATH = os.path.join(DATA_DIR, 'regions.json')
+MALLS_PATH = os.path.join(DATA_DIR, 'malls.json')
+
+UNKNOWN_REGION = 'unknown'
+
+# Official province and city names that products use instead of the short
+# names in regions.json
+REGION_FULL_NAMES = {
+    '서울특별시': '서울', '부산광역시': '부산', '대구광역시': '대구', '인천광역시': '인천',
+    '광주광역시': '광주', '대전광역시': '대전', '울산광역시': '울산', '세종특별자치시': '세종',
+    '경기도': '경기', '강원도': '강원', '강원특별자치도': '강원', '충청북도': '충북', '충청남도': '충남',
+    '전라북도': '전북', '전북특별자치도': '전북', '전라남도': '전남', '경상북도': '경북',
+    '경상남도': '경남', '제주도': '제주', '제주특별자치도': '제주',
+}
+
+
+class RegionResolver:
+    """Map product and mall region strings to regions.json ids"""
+
+    def __init__(self, regions, malls):
+        self.names = {region['id']: region['name_ko'] for region in regions}
+        self.ids = {region['name_ko']: region['id'] for region in regions}
+        self.mall_regions = {}
+        for mall in malls:
+            region_id = self.region_id(mall.get('region'))
+            if region_id:
+                name = mall.get('name') or ''
+                self.mall_regions[mall.get('id')] = region_id
+                self.mall_regions[name] = region_id
+                # Products name '장흥몰 (산들해랑장흥몰)' just '장흥몰'
+                self.mall_regions.setdefault(name.split('(')[0].strip(), region_id)
+
+    @classmethod
+    def from_sources(cls, regions_path=REGIONS_PATH, malls_path=MALLS_PATH):
+        with open(regions_path, 'r', encoding='utf-8') as f:
+            regions = json.load(f)
+        with open(malls_path, 'r', encoding='utf-8') as f:
+            malls = json.load(f)
+        return cls(regions, malls)
+
+    def region_id(self, value):
+        """Region id of a region string, None if it names no known region"""
+        if not isinstance(value, str) or not value.strip():
+            return None
+        province = value.split()[0]
+        return self.ids.get(REGION_FULL_NAMES.get(province, province))
+
+    def resolve(self, product):
+        region_id = self.region_id(product.get('region'))
+        if region_id is None:
+            region_id = self.mall_regions.get(product_mall_id(product)) or self.mall_regions.get(mall_name(product))
+        return region_id or UNKNOWN_REGION
+
+
+def product_hierarchy(product):
+    """(major, mid, minor) of a product, as annotated or as it would be"""
+    path = (product.get('categoryMajor'), product.get('categoryMid'), product.get('categoryMinor'))
+    if all(isinstance(part, str) for part in path):
+        return path
+    return hierarchy_path(product.get('category', MISSING))
+
+
+def catalog_counts(products_path, resolver=None):
+    """Product counts per region id and category major, for pages that only need totals"""
+    resolver = resolver or RegionResolver.from_sources()
+    total = 0
+    regions = {}
+    categories = {}
+    for product in iter_products(products_path):
+        # The products API never lists commented-out products
+        if product.get('_commented'):
+            continue
+        total += 1
+        region_id = resolver.resolve(product)
+        regions[region_id] = regions.get(region_id, 0) + 1
+        major = product_hierarchy(product)[0]
+        categories[major] = categories.get(major, 0) + 1
+    return {
+        'total': total,
+        'regions': {region_id: count for region_id, count in sorted(regions.items()) if region_id != UNKNOWN_REGION},
+        'categories': dict(sorted(categories.items())),
+    }
@@ -0,0 +1,253 @@
+"""Near-duplicate product clusters via MinHash and locality-sensitive hashing.
+
+The same product often appears under several malls, or once per pack size
+('콩익는 분토막장 900g' and '콩익는 분토막장 2kg'). ``find_clusters`` groups
+such records without comparing every pair of products:
+
+* names are normalized (NFKC, lowercase, quantities such as 900g, 10봉 or
+  2세트 and punctuation removed) and cut into character 3-grams with the
+  spaces taken out, since spacing in Korean names varies; words of a
+  description that says more than the name are added as shingles of their
+  own;
+* each product's shingle set gets a MinHash signature of ``NUM_HASHES``
+  values, and the signature is cut into ``BANDS`` bands. Products sharing
+  any band land in the same LSH bucket and become candidates, which with
+  ``ROWS`` rows per band happens to most pairs above a Jaccard similarity of
+  about 0.5 and to few below 0.3;
+* a candidate is compared to the first product of its bucket by exact
+  Jaccard similarity of their shingle sets, and joined to its cluster when
+  that reaches the threshold.
+
+Bucketing and verification are linear in the number of products. Cluster ids
+are derived from the smallest product id in the cluster, so they stay the same
+from run to run as long as that product does.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import datetime
+
+from catalog.manifest import content_hash
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, atomic_open, iter_products
+from catalog.search_index import file_digest, product_mall_id
+
+CLUSTERS_PATH = os.path.join(DATA_DIR, 'duplicate-clusters.json')
+CLUSTERS_VERSION = 1
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+THRESHOLD = 0.7
+SHINGLE_SIZE = 3
+
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240617)
+HASH_PARAMS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(MERSENNE_PRIME)) for _ in range(NUM_HASHES)]
+
+QUANTITY = re.compile(
+    r'\d+(?:[.,]\d+)*\s*'
+    r'(?:kg|mg|ml|cc|g|l|리터|키로|근|되|말|개입|개|팩|봉지|봉|박스|box|입|구|미|마리|병|포|장|ea|매|통|세트|set|인분|년산|p)'
+)
+WORD = re.compile(r'[가-힣a-z0-9]+')
+NUMBER = re.compile(r'\d+')
+# Multiplication signs left between removed quantities (200gx10봉)
+STRAY = frozenset({'x'})
+# Fewer shingles than this say too little to match on ('공급사 :')
+MIN_SHINGLES = 3
+
+
+def normalize(text):
+    """Words of text with quantities, punctuation and case removed"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = QUANTITY.sub(' ', text)
+    return [word for word in WORD.findall(text) if word not in STRAY]
+
+
+def features(product):
+    """Shingle set of a product's name and, if it adds anything, its description,
+    and the numbers left in its name once quantities are removed"""
+    name = product.get('name') if isinstance(product.get('name'), str) else ''
+    words = normalize(name)
+    compact = ''.join(words)
+    shingles = {compact[i:i + SHINGLE_SIZE] for i in range(max(1, len(compact) - SHINGLE_SIZE + 1))} if compact else set()
+
+    description = product.get('description')
+    if isinstance(description, str) and description.strip() and description not in name and name not in description:
+        shingles.update('#' + word for word in normalize(description) if len(word) > 1)
+    # '고창마켓 상품 30' and '... 상품 31' are different products, and so are
+    # a '1+' and a '1++' grade
+    return shingles, frozenset(NUMBER.findall(compact))
+
+
+def shingle_hashes(shingle):
+    """The NUM_HASHES hash values of one shingle"""
+    x = zlib.crc32(shingle.encode('utf-8'))
+    return tuple((a * x + b) % MERSENNE_PRIME for a, b in HASH_PARAMS)
+
+
+def minhash(shingle_set, cache):
+    """MinHash signature: the minimum of each hash function over the shingles.
+
+    Names share most of their shingles with other names, so each shingle's
+    hash values are computed once and kept in ``cache``.
+    """
+    rows = []
+    for shingle in shingle_set:
+        hashes = cache.get(shingle)
+        if hashes is None:
+            hashes = cache[shingle] = shingle_hashes(shingle)
+        rows.append(hashes)
+    return list(map(min, zip(*rows)))
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def cluster_id(product_ids):
+    return 'dup-' + hashlib.sha1(min(product_ids).encode('utf-8')).hexdigest()[:10]
+
+
+def find_clusters(products, threshold=THRESHOLD):
+    """Clusters of near-duplicate products, as lists of positions in products.
+
+    Returns the clusters with more than one product and the number of
+    candidate pairs that were verified.
+    """
+    product_features = [features(product) for product in products]
+    groups = UnionFind(len(products))
+    buckets = defaultdict(list)
+    cache = {}
+    for position, (shingle_set, _) in enumerate(product_features):
+        if len(shingle_set) < MIN_SHINGLES:
+            continue
+        signature = minhash(shingle_set, cache)
+        for band in range(BANDS):
+            buckets[(band, *signature[band * ROWS:(band + 1) * ROWS])].append(position)
+
+    compared = 0
+    for members in buckets.values():
+        first = members[0]
+        for position in members[1:]:
+            if groups.find(position) == groups.find(first):
+                continue
+            compared += 1
+            first_shingles, first_numbers = product_features[first]
+            shingle_set, numbers = product_features[position]
+            if numbers == first_numbers and jaccard(first_shingles, shingle_set) >= threshold:
+                groups.union(first, position)
+
+    clusters = defaultdict(list)
+    for position in range(len(products)):
+        clusters[groups.find(position)].append(position)
+    return [members for members in clusters.values() if len(members) > 1], compared
+
+
+def build_clusters(products_path=PRODUCTS_PATH, threshold=THRESHOLD):
+    """The duplicate-clusters.json document for a catalog file"""
+    products = [product for product in iter_products(products_path) if isinstance(product.get('id'), str)]
+    clusters, compared = find_clusters(products, threshold)
+
+    cluster_entries = {}
+    product_entries = {}
+    for members in sorted(clusters, key=lambda members: members[0]):
+        ids = list(dict.fromkeys(products[position]['id'] for position in members))
+        if len(ids) < 2:
+            # The same record listed twice is not a near-duplicate
+            continue
+        key = cluster_id(ids)
+        representative = products[min(members, key=lambda position: products[position]['id'])]
+        cluster_entries[key] = {
+            'ids': ids,
+            'malls': len({product_mall_id(products[position]) for position in members}),
+            # What the classifiers read of the product the cluster is named after
+            'representative': {field: representative.get(field) for field in ('name', 'description', 'tags')},
+        }
+        for position in members:
+            # The content hash lets the classifier tell that a product still
+            # reads as it did when it was clustered
+            product_entries[products[position]['id']] = [key, content_hash(products[position])]
+
+    return {
+        'version': CLUSTERS_VERSION,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'source': file_digest(products_path),
+        'threshold': threshold,
+        'count': len(products),
+        'compared': compared,
+        'clusters': cluster_entries,
+        'products': product_entries,
+    }
+
+
+def write_clusters(document, path=CLUSTERS_PATH):
+    with atomic_open(path) as f:
+        json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+
+
+class ClusterMap:
+    """Product ids to clusters, for classifying each cluster once.
+
+    ``lookup`` gives a product's cluster and the cluster's representative,
+    but only while the product's content hash is still the one it was
+    clustered with, so a product edited since then is classified on its own.
+    """
+
+    def __init__(self, products=None, representatives=None):
+        # {product id: (cluster id, content hash when clustered)}
+        self.products = products or {}
+        self.representatives = representatives or {}
+
+    @classmethod
+    def load(cls, path=CLUSTERS_PATH):
+        """The clusters of a duplicate-clusters.json file; empty if there is none"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        if document.get('version') != CLUSTERS_VERSION:
+            return cls()
+        return cls(
+            {product_id: tuple(entry) for product_id, entry in document['products'].items()},
+            {key: cluster['representative'] for key, cluster in document['clusters'].items()},
+        )
+
+    def lookup(self, product_id, digest):
+        """(cluster id, representative record), or None"""
+        entry = self.products.get(product_id)
+        if entry is None or entry[1] != digest:
+            return None
+        return entry[0], self.representatives[entry[0]]
+
+    def subset(self, product_ids):
+        """The part of the map a pipeline worker needs for these products"""
+        products = {product_id: self.products[product_id] for product_id in product_ids if product_id in self.products}
+        return ClusterMap(products, {key: self.representatives[key] for key, _ in products.values()})
+
+    def __len__(self):
+        return len(self.representatives)
@@ -0,0 +1,46 @@
+"""Files the site reads that are derived from products.json.
+
+Each of them records the digest of the products.json it was built from
+(``source``), and the app ignores one whose digest does not match the catalog
+it has read, falling back to scanning or sorting every product itself. Scripts that rewrite
+the catalog call ``rebuild_derived`` afterwards so the site keeps using them.
+"""
+import json
+import os
+
+from catalog.products_io import PRODUCTS_PATH
+from catalog.search_index import SEARCH_INDEX_PATH, build_search_index, file_digest, write_search_index
+from catalog.unit_price import PRICE_INDEX_PATH, build_price_index, write_price_index
+
+# (path, build(products_path) -> document, write(document, path))
+DERIVED_FILES = [
+    (SEARCH_INDEX_PATH, build_search_index, write_search_index),
+    (PRICE_INDEX_PATH, build_price_index, write_price_index),
+]
+
+
+def stored_source(path):
+    """The source digest a derived file records, None if it is missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data.get('source') if isinstance(data, dict) else None
+
+
+def rebuild_derived(products_path=PRODUCTS_PATH):
+    """Rebuild the derived files that no longer match the site's catalog; return their paths.
+
+    Only the catalog at ``PRODUCTS_PATH`` has derived files, so any other
+    path is left alone.
+    """
+    if os.path.abspath(products_path) != os.path.abspath(PRODUCTS_PATH):
+        return []
+    digest = file_digest(products_path)
+    rebuilt = []
+    for path, build, write in DERIVED_FILES:
+        if stored_source(path) != digest:
+            write(build(products_path), path)
+            rebuilt.append(path)
+    return rebuilt
@@ -0,0 +1,286 @@
+"""Asynchronous HTTP fetching with per-host limits over pooled keep-alive connections.
+
+``Fetcher`` is used from asyncio code but sends requests with ``http.client``
+in a thread pool; the standard library has no asyncio HTTP client, and
+``http.client`` connections stay open between requests, so each host gets a
+small pool of keep-alive connections that are reused instead of reconnecting
+for every page.
+
+Per host, a semaphore caps the requests in flight and a rate limiter spaces
+their start times. A request that fails to connect, times out or gets a 429
+or 5xx answer is retried with exponential backoff and jitter, honouring
+Retry-After. Nothing starts or waits past the fetcher's deadline: a request
+that would is failed with ``DeadlineExceeded`` instead.
+"""
+import asyncio
+import gzip
+import http.client
+import random
+import re
+import ssl
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urljoin, urlsplit
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+MAX_REDIRECTS = 5
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+class FetchError(Exception):
+    """A request that failed after its retries"""
+
+    def __init__(self, url, message, status=None):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.status = status
+
+
+class DeadlineExceeded(FetchError):
+    pass
+
+
+class Response:
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def text(self):
+        """The body decoded with the declared charset; Korean malls often use EUC-KR"""
+        charset = None
+        content_type = self.headers.get('content-type', '')
+        if 'charset=' in content_type:
+            charset = content_type.split('charset=')[-1].split(';')[0].strip().strip('"\'')
+        if not charset:
+            match = META_CHARSET.search(self.body[:4096])
+            charset = match.group(1).decode('ascii') if match else 'utf-8'
+        if charset.lower() in ('euc-kr', 'ks_c_5601-1987', 'ksc5601'):
+            # cp949 is the superset browsers actually decode EUC-KR pages with
+            charset = 'cp949'
+        try:
+            return self.body.decode(charset, errors='replace')
+        except LookupError:
+            return self.body.decode('utf-8', errors='replace')
+
+
+class RateLimiter:
+    """Space out request starts to at most ``rate`` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_start = 0
+        self.lock = asyncio.Lock()
+
+    async def wait(self, deadline=None):
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, self.next_start)
+            if deadline is not None and start > deadline:
+                return False
+            self.next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+        return True
+
+
+class ConnectionPool:
+    """Idle keep-alive connections of one host, shared by the worker threads"""
+
+    def __init__(self, scheme, netloc, timeout, ssl_context=None):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                self.reused += 1
+                return self.idle.pop()
+            self.opened += 1
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.netloc, timeout=self.timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def release(self, connection):
+        with self.lock:
+            self.idle.append(connection)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+
+
+class HostState:
+    def __init__(self, concurrency, rate):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = RateLimiter(rate)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+
+class Fetcher:
+    """Fetch URLs concurrently within per-host limits and an overall deadline.
+
+    ``deadline`` is in seconds from when the fetcher is created. Use it as an
+    async context manager, or call ``close`` when done.
+    """
+
+    def __init__(self, concurrency_per_host=4, rate_per_host=2.0, retries=3, backoff=0.5,
+                 timeout=20.0, deadline=None, headers=None, max_workers=32):
+        self.concurrency_per_host = concurrency_per_host
+        self.rate_per_host = rate_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate', **(headers or {})}
+        self.ssl_context = ssl.create_default_context()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+        self.pools = {}
+        self.hosts = {}
+        loop = asyncio.get_running_loop()
+        self.deadline = loop.time() + deadline if deadline else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for pool in self.pools.values():
+            pool.close()
+
+    def remaining(self):
+        """Seconds left before the deadline, None without one"""
+        if self.deadline is None:
+            return None
+        return self.deadline - asyncio.get_running_loop().time()
+
+    def _host(self, netloc):
+        state = self.hosts.get(netloc)
+        if state is None:
+            state = self.hosts[netloc] = HostState(self.concurrency_per_host, self.rate_per_host)
+        return state
+
+    def _pool(self, scheme, netloc):
+        key = (scheme, netloc)
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = ConnectionPool(scheme, netloc, self.timeout, self.ssl_context)
+        return pool
+
+    def _request(self, pool, method, path, headers):
+        """Send one request on a pooled connection (runs in a worker thread)"""
+        connection = pool.acquire()
+        try:
+            connection.request(method, path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            # A kept-alive connection the server has since closed fails here;
+            # it is dropped and the request counts as a retryable failure
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            pool.release(connection)
+
+        encoding = (response.getheader('Content-Encoding') or '').lower()
+        if encoding == 'gzip':
+            body = gzip.decompress(body)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+        return response.status, {name.lower(): value for name, value in response.getheaders()}, body
+
+    async def fetch(self, url, headers=None, host=None, method='GET'):
+        """GET (or ``method``) url, following redirects; raises ``FetchError`` once retries run out.
+
+        The request counts against the limits of ``host``, by default url's
+        own; a replay server passes the host of the page it stands in for.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._fetch_once(url, headers, host, method)
+            if response.status not in REDIRECT_STATUSES or 'location' not in response.headers:
+                return response
+            url = urljoin(url, response.headers['location'])
+        raise FetchError(url, 'too many redirects')
+
+    async def _fetch_once(self, url, headers, host_name, method):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise FetchError(url, f"unsupported scheme {parts.scheme!r}")
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        # http.client sends the path as is; Hangul in mall URLs must be escaped
+        path = quote(path, safe="/?&=%:;@+,!$'()*~-._")
+        request_headers = {**self.headers, **(headers or {})}
+        host = self._host(host_name or parts.netloc)
+        pool = self._pool(parts.scheme, parts.netloc)
+        loop = asyncio.get_running_loop()
+
+        attempt = 0
+        while True:
+            async with host.semaphore:
+                if not await host.limiter.wait(self.deadline):
+                    raise DeadlineExceeded(url, 'deadline reached before the request could start')
+                host.requests += 1
+                request = loop.run_in_executor(self.executor, self._request, pool, method, path, request_headers)
+                remaining = self.remaining()
+                try:
+                    status, response_headers, body = await asyncio.wait_for(request, remaining)
+                    error = None
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(url, 'deadline reached during the request') from None
+                except (OSError, http.client.HTTPException, zlib.error, EOFError) as exc:
+                    status, response_headers, body = None, {}, b''
+                    error = exc
+
+            if error is None and status not in RETRY_STATUSES:
+                return Response(url, status, response_headers, body)
+
+            if attempt >= self.retries:
+                host.failures += 1
+                message = f"HTTP {status}" if error is None else f"{type(error).__name__}: {error}"
+                raise FetchError(url, f"{message} after {attempt + 1} attempts", status)
+
+            delay = self.backoff * 2 ** attempt * random.uniform(1, 1.5)
+            retry_after = response_headers.get('retry-after', '')
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            remaining = self.remaining()
+            if remaining is not None and delay >= remaining:
+                raise DeadlineExceeded(url, f"deadline reached while backing off ({status or error})")
+            attempt += 1
+            host.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        """Request, retry and failure counts per host, and connection counts"""
+        stats = {
+            netloc: {'requests': host.requests, 'retries': host.retries, 'failures': host.failures}
+            for netloc, host in self.hosts.items()
+        }
+        connections = {
+            'opened': sum(pool.opened for pool in self.pools.values()),
+            'reused': sum(pool.reused for pool in self.pools.values()),
+        }
+        return stats, connections
@@ -0,0 +1,101 @@
+"""Major/mid/minor category hierarchy for the flat product categories.
+
+The nested ``CATEGORY_HIERARCHY`` is the editable source. It is flattened once
+into ``HIERARCHY_INDEX`` so each lookup is a single dict access, and the same
+index is exported to src/data/category-hierarchy-index.json for the site.
+"""
+import os
+
+from catalog.products_io import DATA_DIR, write_json
+
+INDEX_PATH = os.path.join(DATA_DIR, 'category-hierarchy-index.json')
+
+# Define hierarchical category structure
+CATEGORY_HIERARCHY = {
+    "식품": {
+        "농산물": {
+            "쌀/곡물": ["쌀/곡물류"],
+            "채소": ["채소", "채소/나물류", "나물/산채"],
+            "과일": ["과일/채소"],
+            "버섯": ["버섯류", "버섯"],
+            "기타농산물": ["농산물", "곶감", "구기자"]
+        },
+        "축산물": {
+            "한우": ["한우", "한우/육류"],
+            "돼지고기": ["육류"],
+            "기타육류": ["축산물", "정육류", "순대/가공육"]
+        },
+        "수산물": {
+            "생선": ["수산물"],
+            "전복": ["완도전복"],
+            "해조류": ["해조류", "김"],
+            "젓갈": ["젓갈"]
+        },
+        "가공식품": {
+            "장류": ["김치/장/절임", "발효식품", "전통발효식품", "장류/조미료", "양념/장류", "장류/가공식품"],
+            "조미료": ["조미료", "기름/참깨", "소금"],
+            "절임류": ["장아찌"],
+            "즉석/간편식": ["만두/떡/간편식", "간편식품", "간편식"],
+            "떡/한과": ["떡류", "전통떡", "전통한과", "과자"],
+            "베이커리": ["베이커리/간식"],
+            "음료": ["음료/차/주류", "차/음료", "전통주"],
+            "건강식품": ["건강식품", "꿀/홍삼", "인삼/홍삼", "양봉제품", "즙류/식초"],
+            "기타가공": ["가공식품", "가공상품", "전통식품", "식품", "반찬", "건과류", "유제품"]
+        }
+    },
+    "비식품": {
+        "생활용품": {
+            "주방/생활": ["생활용품", "생활/리빙"],
+            "가구/인테리어": ["가구/인테리어"],
+            "위생용품": ["위생용품"],
+            "사무용품": ["사무용품"]
+        },
+        "취미/문화": {
+            "공예품": ["공예품"],
+            "원예": ["원예/화훼"],
+            "교육": ["교육/취미", "체험/교육"]
+        },
+        "기타상품": {
+            "선물세트": ["선물세트"],
+            "디지털": ["디지털/가전"],
+            "패션": ["패션/뷰티"],
+            "반려동물": ["반려동물용품"],
+            "서비스": ["서비스"],
+            "기타": ["기타", "신상품", "신선식품"]
+        }
+    }
+}
+
+UNCLASSIFIED = ("기타", "미분류", "미분류")
+
+def build_hierarchy_index(hierarchy=CATEGORY_HIERARCHY):
+    """Flatten the hierarchy into {original category: (major, mid, minor)}.
+
+    Raises ValueError if an original category is listed under two leaves,
+    since products in it could not be placed unambiguously.
+    """
+    index = {}
+    for major, mid_dict in hierarchy.items():
+        for mid, minor_dict in mid_dict.items():
+            for minor, categories in minor_dict.items():
+                for category in categories:
+                    if category in index:
+                        raise ValueError(
+                            f"Category '{category}' is listed under both "
+                            f"{'/'.join(index[category])} and {major}/{mid}/{minor}"
+                        )
+                    index[category] = (major, mid, minor)
+    return index
+
+HIERARCHY_INDEX = build_hierarchy_index()
+
+def find_category_hierarchy(current_category):
+    """Find the hierarchical path for a category"""
+    return HIERARCHY_INDEX.get(current_category, UNCLASSIFIED)
+
+def export_hierarchy_index(path=INDEX_PATH):
+    """Write the flattened index as JSON for src/lib/data.ts"""
+    write_json({
+        'unclassified': list(UNCLASSIFIED),
+        'categories': {category: list(leaf) for category, leaf in HIERARCHY_INDEX.items()},
+    }, path)
@@ -0,0 +1,270 @@
+"""A small HTML tree and CSS selector engine for the mall scrapers.
+
+The TypeScript scrapers use cheerio; the Python side has only the standard
+library, so ``parse_html`` builds an element tree with ``html.parser`` and
+``select`` supports the selectors that scraper configs actually use: type,
+``.class``, ``#id`` and attribute selectors (``[a]``, ``[a=v]``, ``[a*=v]``,
+``[a^=v]``, ``[a$=v]``, ``[a~=v]``), ``:first-child``, ``:last-child``,
+jQuery's ``:contains("text")``, descendant and child combinators, and
+comma-separated groups. Like cheerio's ``find``, ``select`` searches the
+descendants of an element, and returns matches in document order.
+"""
+import re
+from html.parser import HTMLParser
+
+VOID_ELEMENTS = frozenset({
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+})
+# Elements whose start tag closes an open element of the same kind, as in
+# <li>one<li>two
+SELF_CLOSING_SIBLINGS = frozenset({'li', 'p', 'option', 'tr', 'td', 'th', 'dt', 'dd'})
+
+
+class Element:
+    """An HTML element with its attributes, children and text"""
+
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        # Child elements and text strings, in document order
+        self.children = []
+        self.parent = parent
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+    @property
+    def classes(self):
+        return self.attrs.get('class', '').split()
+
+    def iter(self):
+        """Descendant elements in document order, not including this one"""
+        stack = [child for child in reversed(self.children) if isinstance(child, Element)]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(child for child in reversed(element.children) if isinstance(child, Element))
+
+    def text(self):
+        """All text below this element, like cheerio's .text()"""
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            else:
+                stack.extend(reversed(node.children))
+        return ''.join(parts)
+
+    def select(self, selector):
+        return select(self, selector)
+
+    def select_one(self, selector):
+        for element in select(self, selector):
+            return element
+        return None
+
+    def __repr__(self):
+        return f"<{self.tag} {self.attrs}>"
+
+
+class TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Element('#document')
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SELF_CLOSING_SIBLINGS and self.stack[-1].tag == tag:
+            self.stack.pop()
+        parent = self.stack[-1]
+        element = Element(tag, {name: value if value is not None else '' for name, value in attrs}, parent)
+        parent.children.append(element)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS and self.stack[-1].tag == tag:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        # Close the nearest open element of this kind; a stray end tag is ignored
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.stack[depth].tag == tag:
+                del self.stack[depth:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+def parse_html(html):
+    """Parse a document into an ``Element`` tree; returns the root"""
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+COMPOUND_PART = re.compile(r"""
+    \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[*^$~|]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[^\]\s]+)))?\s*\]
+  | :(?P<pseudo>first-child|last-child)
+  | :contains\(\s*(?:"(?P<cdq>[^"]*)"|'(?P<csq>[^']*)')\s*\)
+""", re.VERBOSE)
+TYPE_SELECTOR = re.compile(r'\*|[\w-]+')
+
+
+class Compound:
+    """One compound selector, e.g. a.item-link[href*="goods"]"""
+
+    def __init__(self, text):
+        self.tag = None
+        self.ids = []
+        self.classes = []
+        self.attributes = []
+        self.pseudo = []
+        self.contains = []
+        match = TYPE_SELECTOR.match(text)
+        pos = 0
+        if match:
+            self.tag = None if match.group() == '*' else match.group().lower()
+            pos = match.end()
+        while pos < len(text):
+            match = COMPOUND_PART.match(text, pos)
+            if not match:
+                raise ValueError(f"Unsupported selector: {text!r}")
+            if match.group('id'):
+                self.ids.append(match.group('id'))
+            elif match.group('cls'):
+                self.classes.append(match.group('cls'))
+            elif match.group('pseudo'):
+                self.pseudo.append(match.group('pseudo'))
+            elif match.group('cdq') is not None or match.group('csq') is not None:
+                self.contains.append(match.group('cdq') if match.group('cdq') is not None else match.group('csq'))
+            else:
+                value = next((group for group in match.group('dq', 'sq', 'bare') if group is not None), None)
+                self.attributes.append((match.group('attr').lower(), match.group('op'), value))
+            pos = match.end()
+
+    def matches(self, element):
+        if self.tag and element.tag != self.tag:
+            return False
+        if any(element.attrs.get('id') != id_ for id_ in self.ids):
+            return False
+        if self.classes:
+            classes = element.classes
+            if any(cls not in classes for cls in self.classes):
+                return False
+        for name, op, value in self.attributes:
+            actual = element.attrs.get(name)
+            if actual is None:
+                return False
+            if op is None:
+                continue
+            if op == '=' and actual != value:
+                return False
+            if op == '*=' and (not value or value not in actual):
+                return False
+            if op == '^=' and (not value or not actual.startswith(value)):
+                return False
+            if op == '$=' and (not value or not actual.endswith(value)):
+                return False
+            if op == '~=' and value not in actual.split():
+                return False
+            if op == '|=' and actual != value and not actual.startswith(value + '-'):
+                return False
+        for pseudo in self.pseudo:
+            siblings = [child for child in element.parent.children if isinstance(child, Element)]
+            if element is not siblings[0 if pseudo == 'first-child' else -1]:
+                return False
+        if self.contains:
+            text = element.text()
+            if any(value not in text for value in self.contains):
+                return False
+        return True
+
+
+def split_outside_brackets(text, separators):
+    """Split text at separator characters that are not inside [...] or quotes"""
+    parts = []
+    current = []
+    depth = 0
+    quote = None
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif depth == 0 and char in separators:
+            parts.append(''.join(current))
+            parts.append(char)
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current))
+    return parts
+
+
+class ComplexSelector:
+    """Compound selectors joined by descendant (' ') and child ('>') combinators"""
+
+    def __init__(self, text):
+        # [(combinator to the previous compound, compound)], left to right
+        self.steps = []
+        combinator = None
+        for part in split_outside_brackets(text.strip(), ' >'):
+            if part == '>':
+                combinator = '>'
+            elif part == ' ' or not part:
+                combinator = combinator or ' '
+            else:
+                self.steps.append((combinator, Compound(part)))
+                combinator = None
+        if not self.steps:
+            raise ValueError(f"Empty selector: {text!r}")
+
+    def matches(self, element, step=None):
+        """Whether element matches; ancestors may lie outside the search scope, as in jQuery"""
+        step = len(self.steps) - 1 if step is None else step
+        combinator, compound = self.steps[step]
+        if not compound.matches(element):
+            return False
+        if step == 0:
+            return True
+        ancestor = element.parent
+        while ancestor is not None:
+            if self.matches(ancestor, step - 1):
+                return True
+            if combinator == '>':
+                return False
+            ancestor = ancestor.parent
+        return False
+
+
+_compiled = {}
+
+
+def compile_selector(selector):
+    """Parse a selector group once; returns its complex selectors"""
+    compiled = _compiled.get(selector)
+    if compiled is None:
+        groups = split_outside_brackets(selector, ',')
+        compiled = _compiled[selector] = [ComplexSelector(group) for group in groups[::2] if group.strip()]
+    return compiled
+
+
+def select(scope, selector):
+    """Descendants of scope matching selector, in document order"""
+    selectors = compile_selector(selector)
+    return [element for element in scope.iter() if any(complex_selector.matches(element) for complex_selector in selectors)]
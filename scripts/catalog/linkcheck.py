@@ -0,0 +1,220 @@
+"""Bulk verification of product links and images.
+
+``LinkChecker`` asks whether a URL is still alive with a HEAD request, over
+the ``Fetcher``'s pooled connections and within its per-host limits. Servers
+that refuse HEAD get a GET for the first byte instead. ``ValidatorCache``
+keeps the ETag and Last-Modified of every URL checked, and later checks send
+them back, so a resource that has not changed costs a 304 with no body.
+
+A URL is dead when its server says so (404, 410) or when it could not be
+reached at all on ``UNREACHABLE_RUNS`` consecutive runs: a DNS failure or a
+refused connection is often a host that is down for the night, so the
+cache counts such runs per URL and any answer resets the count. A 5xx, a
+429, a timeout or a refusal such as 403 proves nothing, and leaves the
+product as it was. ``verify_products`` streams a catalog through
+the checker, keeping a bounded window of products in flight, and yields each
+product in order with ``lastVerified`` and the dead-link flags updated, so a
+caller writes the catalog back in the same pass.
+"""
+import asyncio
+import json
+import os
+from collections import Counter, deque
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from catalog.fetcher import DeadlineExceeded, FetchError
+from catalog.products_io import atomic_open
+
+VALIDATORS_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', 'output', 'link-validators.json')
+)
+
+# (fields holding the URL, first one set wins; flag set on the product when it is dead)
+LINK_FIELDS = (
+    (('productUrl', 'url'), 'isDeadLink'),
+    (('imageUrl', 'image'), 'isDeadImage'),
+)
+DEAD_STATUSES = frozenset({404, 410})
+# Consecutive runs a URL must be unreachable in before it counts as dead
+UNREACHABLE_RUNS = 2
+# Answers to HEAD from servers that only implement GET
+HEAD_REFUSED = frozenset({400, 403, 405, 501})
+WINDOW = 500
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def format_time(moment):
+    """The ISO format lastVerified uses: 2025-06-21T14:02:29.656Z"""
+    return moment.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def parse_time(value):
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def product_links(product):
+    """(flag, url) of each checkable link of a product"""
+    links = []
+    for fields, flag in LINK_FIELDS:
+        url = next((product[field] for field in fields if isinstance(product.get(field), str) and product[field]), None)
+        # Local images (/images/...) are served by the site itself
+        if url and urlsplit(url).scheme in ('http', 'https'):
+            links.append((flag, url))
+    return links
+
+
+class ValidatorCache:
+    """ETag and Last-Modified of every URL checked, and runs it was unreachable in, by URL"""
+
+    def __init__(self, path=VALIDATORS_PATH):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def headers(self, url):
+        """Conditional request headers for url"""
+        entry = self.entries.get(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('lastModified'):
+            headers['If-Modified-Since'] = entry['lastModified']
+        return headers
+
+    def update(self, url, response):
+        etag = response.headers.get('etag')
+        last_modified = response.headers.get('last-modified')
+        if etag or last_modified:
+            self.entries[url] = {'etag': etag, 'lastModified': last_modified}
+
+    def unreachable(self, url):
+        """Count one more consecutive run in which url could not be reached; return the count"""
+        entry = self.entries.setdefault(url, {})
+        entry['unreachable'] = entry.get('unreachable', 0) + 1
+        return entry['unreachable']
+
+    def reachable(self, url):
+        """Reset url's count of unreachable runs after its server answered"""
+        entry = self.entries.get(url)
+        if entry and entry.pop('unreachable', None) and not entry:
+            del self.entries[url]
+
+    def save(self):
+        if self.path:
+            with atomic_open(self.path) as f:
+                json.dump(self.entries, f, ensure_ascii=False, separators=(',', ':'))
+
+
+class LinkChecker:
+    """Check URLs once each, concurrently, through a ``Fetcher``.
+
+    ``url_for`` maps a URL to the URL actually requested (a stub server's,
+    in tests); limits still apply per original host.
+    """
+
+    def __init__(self, fetcher, cache, url_for=None):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.url_for = url_for
+        self.tasks = {}
+        self.outcomes = Counter()
+
+    def check(self, url):
+        """Future of url's verdict: True alive, False dead, None unknown"""
+        task = self.tasks.get(url)
+        if task is None:
+            task = self.tasks[url] = asyncio.ensure_future(self._check(url))
+        return task
+
+    async def _request(self, url, method, headers):
+        if self.url_for:
+            return await self.fetcher.fetch(self.url_for(url), headers, host=urlsplit(url).netloc, method=method)
+        return await self.fetcher.fetch(url, headers, method=method)
+
+    async def _check(self, url):
+        headers = self.cache.headers(url)
+        try:
+            response = await self._request(url, 'HEAD', headers)
+            if response.status in HEAD_REFUSED:
+                response = await self._request(url, 'GET', {**headers, 'Range': 'bytes=0-0'})
+        except DeadlineExceeded:
+            self.outcomes['unchecked'] += 1
+            return None
+        except FetchError as exc:
+            # A status means the server is up but failing, which may pass
+            if exc.status is not None:
+                self.cache.reachable(url)
+                self.outcomes['error'] += 1
+                return None
+            # No answer after every retry: dead only if the last run could
+            # not reach it either
+            if self.cache.unreachable(url) < UNREACHABLE_RUNS:
+                self.outcomes['unreachable once'] += 1
+                return None
+            self.outcomes['unreachable'] += 1
+            return False
+
+        self.cache.reachable(url)
+        if response.status == 304:
+            self.outcomes['not modified'] += 1
+            return True
+        if response.ok:
+            self.cache.update(url, response)
+            self.outcomes['alive'] += 1
+            return True
+        if response.status in DEAD_STATUSES:
+            self.cache.entries.pop(url, None)
+            self.outcomes['dead'] += 1
+            return False
+        self.outcomes['inconclusive'] += 1
+        return None
+
+
+def apply_verdicts(product, verdicts, now):
+    """Set the dead-link flags, and lastVerified if every link was settled; return whether it changed"""
+    before = dict(product)
+    for flag, alive in verdicts:
+        if alive is True:
+            product.pop(flag, None)
+        elif alive is False:
+            product[flag] = True
+    if verdicts and all(alive is not None for _, alive in verdicts):
+        product['lastVerified'] = format_time(now)
+    return product != before
+
+
+async def verify_products(products, checker, max_age=None, window=WINDOW, now=None):
+    """Yield (product, changed) for every product, in order, with its links verified.
+
+    Products verified less than ``max_age`` (a timedelta) ago are passed
+    through unchecked. Up to ``window`` products are in flight at once.
+    """
+    now = now or utc_now()
+    pending = deque()
+
+    async def verify(product):
+        verified = parse_time(product.get('lastVerified'))
+        if max_age is not None and verified is not None and now - verified < max_age:
+            return product, False
+        links = product_links(product)
+        verdicts = await asyncio.gather(*(checker.check(url) for _, url in links))
+        return product, apply_verdicts(product, list(zip((flag for flag, _ in links), verdicts)), now)
+
+    for product in products:
+        pending.append(asyncio.ensure_future(verify(product)))
+        if len(pending) >= window:
+            yield await pending.popleft()
+    while pending:
+        yield await pending.popleft()
@@ -0,0 +1,206 @@
+"""Size-bucketed WebP and AVIF variants of the mall logos.
+
+public/logos holds one full-size image per mall, and the mall cards show it
+in a 32px box. ``build_logos`` converts every logo into one variant per size
+bucket (the longest side scaled down to 32, 64 and 128 px, never up) in each
+format Pillow can write: WebP and, with a Pillow built with AVIF, AVIF.
+Variants go to public/logos/optimized and are named by a hash of their
+bytes, so they can be cached forever.
+
+src/data/logo-manifest.json records, per logo URL as malls.json gives it,
+the hash of the source file, its variants and a ``srcSet`` string per
+format, which the app puts on the mall cards. A logo whose source hash and
+conversion settings match the manifest and whose variants are all on disk
+is skipped; the others are converted in a process pool. Variants the
+manifest no longer names are deleted.
+
+Pillow is optional for the rest of the catalog scripts; without it
+``build_logos`` raises ``LogoToolError``.
+"""
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog.products_io import DATA_DIR, atomic_open, write_json
+from catalog.search_index import file_digest
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+REPO_ROOT = os.path.normpath(os.path.join(DATA_DIR, '..', '..'))
+LOGOS_DIR = os.path.join(REPO_ROOT, 'public', 'logos')
+VARIANTS_DIR = os.path.join(LOGOS_DIR, 'optimized')
+LOGO_MANIFEST_PATH = os.path.join(DATA_DIR, 'logo-manifest.json')
+LOGOS_URL = '/logos'
+
+MANIFEST_VERSION = 1
+SIZES = (32, 64, 128)
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+# Pillow save options per format; AVIF before WebP, as the <source>s are listed
+FORMAT_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 60, 'speed': 4},
+    'webp': {'format': 'WEBP', 'quality': 82, 'method': 6},
+}
+
+
+class LogoToolError(Exception):
+    """The image library needed to convert logos is missing"""
+
+
+def available_formats():
+    """The variant formats this Pillow can write"""
+    if Image is None:
+        return []
+    Image.init()
+    return [name for name, options in FORMAT_OPTIONS.items() if options['format'] in Image.SAVE]
+
+
+def settings_digest(sizes, formats):
+    """Hash of everything besides the source that shapes the variants"""
+    settings = [list(sizes), {name: FORMAT_OPTIONS[name] for name in formats}, MANIFEST_VERSION]
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def logo_sources(directory=LOGOS_DIR):
+    """{logo URL: file path} of the source images in directory"""
+    return {
+        f"{LOGOS_URL}/{name}": os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.lower().endswith(SOURCE_EXTENSIONS) and os.path.isfile(os.path.join(directory, name))
+    }
+
+
+def src_set(variants, file_format):
+    return ', '.join(
+        f"{variant['path']} {variant['width']}w" for variant in variants if variant['format'] == file_format
+    )
+
+
+def convert_logo(path, digest, output_dir, sizes, formats):
+    """Write the variants of one logo; returns its manifest entry. Runs in a worker process."""
+    with Image.open(path) as source:
+        source.load()
+        width, height = source.size
+        has_alpha = source.mode in ('RGBA', 'LA', 'PA') or 'transparency' in source.info
+        image = source.convert('RGBA' if has_alpha else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    variants = []
+    for size in sizes:
+        if size > max(width, height) and size != sizes[0]:
+            # Only the smallest bucket is kept for a logo smaller than a bucket
+            break
+        scaled = image.copy()
+        scaled.thumbnail((size, size), Image.LANCZOS)
+        for file_format in formats:
+            buffer = io.BytesIO()
+            scaled.save(buffer, **FORMAT_OPTIONS[file_format])
+            data = buffer.getvalue()
+            name = f"{stem}-{size}.{hashlib.sha1(data).hexdigest()[:10]}.{file_format}"
+            target = os.path.join(output_dir, name)
+            if not os.path.exists(target):
+                with atomic_open(target, 'wb') as f:
+                    f.write(data)
+            variants.append({
+                'format': file_format,
+                'size': size,
+                'width': scaled.width,
+                'height': scaled.height,
+                'bytes': len(data),
+                'path': f"{LOGOS_URL}/{os.path.basename(output_dir)}/{name}",
+            })
+    return {
+        'source': digest,
+        'width': width,
+        'height': height,
+        'variants': variants,
+        'srcSet': {file_format: src_set(variants, file_format) for file_format in formats},
+    }
+
+
+class LogoBuild:
+    def __init__(self):
+        self.converted = []
+        self.skipped = 0
+        self.failed = {}
+        self.removed = 0
+        self.source_bytes = 0
+        self.variant_bytes = {}
+
+
+def variant_file(output_dir, variant):
+    return os.path.join(output_dir, os.path.basename(variant['path']))
+
+
+def load_manifest(path=LOGO_MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_logos(logos_dir=LOGOS_DIR, output_dir=VARIANTS_DIR, manifest_path=LOGO_MANIFEST_PATH,
+                sizes=SIZES, workers=None, force=False):
+    """Convert the new and changed logos and rewrite the manifest; returns a ``LogoBuild``"""
+    formats = available_formats()
+    if not formats:
+        raise LogoToolError('Converting logos needs Pillow built with WebP support (pip install -r scripts/requirements.txt)')
+    os.makedirs(output_dir, exist_ok=True)
+    settings = settings_digest(sizes, formats)
+    previous = load_manifest(manifest_path)
+    entries = previous.get('logos', {}) if previous.get('settings') == settings and not force else {}
+
+    build = LogoBuild()
+    logos = {}
+    pending = []
+    for url, path in logo_sources(logos_dir).items():
+        digest = file_digest(path)
+        build.source_bytes += os.path.getsize(path)
+        entry = entries.get(url)
+        if entry and entry['source'] == digest and all(
+            os.path.exists(variant_file(output_dir, variant)) for variant in entry['variants']
+        ):
+            logos[url] = entry
+            build.skipped += 1
+        else:
+            pending.append((url, path, digest))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(convert_logo, path, digest, output_dir, sizes, formats): url
+                for url, path, digest in pending
+            }
+            for future, url in futures.items():
+                try:
+                    entry = future.result()
+                except OSError as exc:
+                    # Unreadable or not an image; the card keeps the original
+                    build.failed[url] = str(exc)
+                    continue
+                logos[url] = entry
+                build.converted.append(url)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'settings': settings,
+        'sizes': list(sizes),
+        'formats': formats,
+        'logos': dict(sorted(logos.items())),
+    }
+    write_json(manifest, manifest_path)
+
+    kept = {os.path.basename(variant['path']) for entry in logos.values() for variant in entry['variants']}
+    for name in os.listdir(output_dir):
+        if name not in kept:
+            os.remove(os.path.join(output_dir, name))
+            build.removed += 1
+    for entry in logos.values():
+        for variant in entry['variants']:
+            key = (variant['size'], variant['format'])
+            build.variant_bytes[key] = build.variant_bytes.get(key, 0) + variant['bytes']
+    return build
@@ -0,0 +1,330 @@
+"""The catalog kept as one shard file per mall, merged into products.json on demand.
+
+Syncing one mall used to rewrite the whole of products.json, and so did every
+fix-up script, so two jobs running at once overwrote each other's work.
+``MallShardStore`` keeps each mall's products in a file of its own under
+src/data/mall-shards, in the same array format as products.json, so every
+script that takes ``--products`` also runs on a single shard. A job writes
+only the shards of the malls it works on, and jobs on different malls never
+touch the same file.
+
+``merge`` assembles products.json from the shards. The catalog interleaves
+malls, so every record carries a sequence number, its position in
+products.json when the catalog was split; the merge is a k-way merge of the
+shards by sequence number, which keeps products.json byte-identical to what
+it was. Records are copied as the text they have in their shard, without
+being decoded and encoded again. The merge state records each shard's
+checksum, and products.json is only rewritten when one of them changed.
+
+A shard is named after its mall's id (``mall_key``). Older records without a
+mall id go to the shard of the configured mall their name or URL points to
+(``MallMatcher``), so a sync of that mall, in Python or TypeScript, rewrites
+the shard that holds them; records of malls without a scraper config are
+keyed by mall name. ``merge`` refuses shards that share a configured mall,
+as left by a split made before this rule, which would emit the mall twice.
+
+Each shard's sequence numbers live in a <shard>.meta.json file beside it
+together with the checksum of the shard they belong to. A shard written by
+something other than ``write_mall`` (a fix-up script, the TypeScript sync
+service) no longer matches its checksum; the merge then gives its records
+the numbers recorded for their ids, and numbers after every existing one to
+new records, so new products are appended as a full rewrite would.
+"""
+import hashlib
+import heapq
+import json
+import os
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, ProductWriter, atomic_open, iter_products
+from catalog.report import mall_name
+from catalog.scraping import MallMatcher
+from catalog.search_index import file_digest, product_mall_id
+from catalog.shards import shard_key
+
+MALL_SHARDS_DIR = os.path.join(DATA_DIR, 'mall-shards')
+STATE_NAME = 'merge-state.json'
+META_SUFFIX = '.meta.json'
+WHITESPACE = ' \t\n\r'
+
+
+class ShardConflictError(Exception):
+    """products.json was changed after the last merge, outside the shards"""
+
+
+def mall_key(product, malls=None):
+    """The mall a product's shard is named after.
+
+    Its mall id; without one, the id of the mall of ``malls`` (a
+    ``MallMatcher``) it belongs to, the first if several share its name;
+    else its mall's name.
+    """
+    key = product_mall_id(product)
+    if not key and malls is not None:
+        configured = malls.mall_ids(product)
+        key = min(configured) if configured else None
+    key = key or mall_name(product)
+    return str(key) if key else ''
+
+
+def shard_name(mall):
+    """File name (without .json) of a mall's shard; the TypeScript sync service derives it the same way"""
+    return shard_key('mall', mall)
+
+
+def read_shard(path):
+    """(record, text) of every record in an array file, text as it appears in the file.
+
+    Also returns the file's checksum, so it always matches the records read.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    checksum = hashlib.sha1(data).hexdigest()
+    text = data.decode('utf-8')
+    decoder = json.JSONDecoder()
+    records = []
+    pos = text.index('[') + 1
+    while True:
+        while pos < len(text) and text[pos] in WHITESPACE:
+            pos += 1
+        if pos >= len(text):
+            raise ValueError(f"{path} ends before the array is closed")
+        if text[pos] == ']':
+            return records, checksum
+        if text[pos] == ',' and records:
+            pos += 1
+            continue
+        record, end = decoder.raw_decode(text, pos)
+        records.append((record, text[pos:end]))
+        pos = end
+
+
+class MergeResult:
+    def __init__(self):
+        self.total = 0
+        self.shards = 0
+        self.changed = []
+        self.renumbered = []
+        self.skipped = False
+
+
+class MallShardStore:
+    """Per-mall shard files in one directory, plus the state of the last merge"""
+
+    def __init__(self, directory=MALL_SHARDS_DIR, malls=None):
+        self.directory = directory
+        self.state_path = os.path.join(directory, STATE_NAME)
+        self.malls = malls if malls is not None else MallMatcher.from_config()
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    def shard_path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def meta_path(self, name):
+        return os.path.join(self.directory, f"{name}{META_SUFFIX}")
+
+    def names(self):
+        """Names of the shards in the directory, sorted"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            file_name[:-len('.json')] for file_name in os.listdir(self.directory)
+            if file_name.startswith('mall-') and file_name.endswith('.json') and not file_name.endswith(META_SUFFIX)
+        )
+
+    def load_meta(self, name):
+        path = self.meta_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_state(self):
+        if not self.exists():
+            return None
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def next_sequence(self):
+        """A sequence number after every one in use, so new records sort last"""
+        highest = -1
+        for name in self.names():
+            meta = self.load_meta(name)
+            if meta and meta['order']:
+                highest = max(highest, max(sequence for sequence, _ in meta['order']))
+        return highest + 1
+
+    def _write_meta(self, name, mall, checksum, order):
+        with atomic_open(self.meta_path(name)) as f:
+            json.dump({'mall': mall, 'checksum': checksum, 'order': order}, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _write_state(self, checksums, output_digest):
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_open(self.state_path) as f:
+            json.dump({
+                'mergedAt': datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
+                'output': output_digest,
+                'shards': checksums,
+            }, f, ensure_ascii=False, indent=2)
+
+    def split(self, products_path=PRODUCTS_PATH):
+        """Replace the shards with the malls of a catalog file; returns {mall: product count}"""
+        os.makedirs(self.directory, exist_ok=True)
+        for name in self.names():
+            self.remove(name)
+
+        writers = {}
+        orders = defaultdict(list)
+        with ExitStack() as stack:
+            for sequence, product in enumerate(iter_products(products_path)):
+                mall = mall_key(product, self.malls)
+                writer = writers.get(mall)
+                if writer is None:
+                    writer = writers[mall] = stack.enter_context(ProductWriter(self.shard_path(shard_name(mall))))
+                writer.write(product)
+                orders[mall].append([sequence, product.get('id')])
+
+        checksums = {}
+        for mall, order in orders.items():
+            name = shard_name(mall)
+            checksums[name] = file_digest(self.shard_path(name))
+            self._write_meta(name, mall, checksums[name], order)
+        # products.json already is the merge of these shards
+        self._write_state(checksums, file_digest(products_path))
+        return {mall: len(order) for mall, order in orders.items()}
+
+    def read_mall(self, mall):
+        """The products in a mall's shard, [] if it has none"""
+        path = self.shard_path(shard_name(mall))
+        return [record for record, _ in read_shard(path)[0]] if os.path.exists(path) else []
+
+    def write_mall(self, mall, products):
+        """Replace a mall's shard; products it already had keep their place in the catalog"""
+        name = shard_name(mall)
+        products = list(products)
+        if not products:
+            self.remove(name)
+            return
+
+        meta = self.load_meta(name)
+        known = defaultdict(deque)
+        for sequence, product_id in (meta['order'] if meta else []):
+            known[product_id].append(sequence)
+        fresh = None
+        order = []
+        for product in products:
+            product_id = product.get('id')
+            if known[product_id]:
+                order.append([known[product_id].popleft(), product_id])
+            else:
+                fresh = self.next_sequence() if fresh is None else fresh
+                order.append([fresh, product_id])
+                fresh += 1
+
+        os.makedirs(self.directory, exist_ok=True)
+        with ProductWriter(self.shard_path(name)) as writer:
+            for product in products:
+                writer.write(product)
+        self._write_meta(name, mall, file_digest(self.shard_path(name)), order)
+
+    def remove(self, name):
+        for path in (self.shard_path(name), self.meta_path(name)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _entries(self, name, fresh):
+        """(sequence, name, index, text) of a shard's records, sorted for the merge.
+
+        ``fresh`` is the next unused sequence number. Returns the entries, the
+        shard's checksum, the next unused number, whether the shard's records
+        had to be renumbered and the configured malls its records belong to.
+        """
+        records, checksum = read_shard(self.shard_path(name))
+        meta = self.load_meta(name)
+        if meta and meta['checksum'] == checksum and len(meta['order']) == len(records):
+            sequences = [sequence for sequence, _ in meta['order']]
+            renumbered = False
+        else:
+            known = defaultdict(deque)
+            for sequence, product_id in (meta['order'] if meta else []):
+                known[product_id].append(sequence)
+            sequences = []
+            for record, _ in records:
+                product_id = record.get('id')
+                if known[product_id]:
+                    sequences.append(known[product_id].popleft())
+                else:
+                    sequences.append(fresh)
+                    fresh += 1
+            mall = meta['mall'] if meta else (mall_key(records[0][0], self.malls) if records else '')
+            # Record the numbers unless the shard was rewritten meanwhile
+            if file_digest(self.shard_path(name)) == checksum:
+                order = [[sequence, record.get('id')] for sequence, (record, _) in zip(sequences, records)]
+                self._write_meta(name, mall, checksum, order)
+            renumbered = True
+
+        entries = [(sequence, name, index, text) for index, (sequence, (_, text)) in enumerate(zip(sequences, records))]
+        entries.sort()
+        malls = set()
+        for record, _ in records:
+            malls.update(self.malls.mall_ids(record))
+        return entries, checksum, fresh, renumbered, malls
+
+    def changed_shards(self):
+        """Checksums of the current shards and the names of those changed since the last merge"""
+        state = self.load_state() or {'shards': {}}
+        checksums = {name: file_digest(self.shard_path(name)) for name in self.names()}
+        changed = sorted(
+            name for name in set(checksums) | set(state['shards'])
+            if checksums.get(name) != state['shards'].get(name)
+        )
+        return checksums, changed
+
+    def merge(self, products_path=PRODUCTS_PATH, force=False):
+        """Assemble products_path from the shards if any of them changed since the last merge.
+
+        Raises ``ShardConflictError`` if products_path was modified since the
+        last merge, unless ``force``; those changes would otherwise be lost.
+        """
+        state = self.load_state()
+        if state is None:
+            raise ShardConflictError(f"{self.directory} has no shards yet; split the catalog first")
+        result = MergeResult()
+        checksums, result.changed = self.changed_shards()
+        result.shards = len(checksums)
+
+        output_digest = file_digest(products_path) if os.path.exists(products_path) else None
+        if output_digest != state['output'] and not force:
+            raise ShardConflictError(
+                f"{products_path} was modified after the last merge; split it again to keep those "
+                f"changes, or merge with force to overwrite them"
+            )
+        if not result.changed and output_digest == state['output']:
+            result.skipped = True
+            return result
+
+        shards = []
+        holders = {}
+        fresh = self.next_sequence()
+        for name in checksums:
+            entries, checksums[name], fresh, renumbered, malls = self._entries(name, fresh)
+            shards.append(entries)
+            if renumbered:
+                result.renumbered.append(name)
+            for mall in malls:
+                if holders.setdefault(mall, name) != name:
+                    raise ShardConflictError(
+                        f"shards {holders[mall]} and {name} both hold products of {mall}, which would be "
+                        f"merged twice; remove the stale shard or split the catalog again"
+                    )
+
+        with ProductWriter(products_path) as writer:
+            for _, _, _, text in heapq.merge(*shards):
+                writer.write_encoded(text)
+        result.total = writer.count
+        self._write_state(checksums, file_digest(products_path))
+        return result
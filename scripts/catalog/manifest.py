@@ -0,0 +1,132 @@
+"""Content-hash manifest that lets reclassification skip unchanged products.
+
+For every product id the manifest stores a hash of the fields the classifiers
+read (name, description and tags) and the category each classifier returned
+for that content. A product without an id is keyed by that hash instead
+(``entry_key``), so identical id-less products share an entry. The header
+records each classifier's rule-set version, and results from an older version
+are dropped on load. A rerun after a scrape therefore only classifies
+products that are new or changed, plus everything a classifier touches after
+its rules change.
+
+Given the near-duplicate clusters of ``catalog.dedup``, a product that still
+reads as it did when it was clustered gets its cluster's result: the
+classifier runs once per cluster, on the cluster's representative, so the
+result does not depend on which member is classified first.
+"""
+import hashlib
+import json
+import os
+
+from catalog.products_io import atomic_open
+from catalog.rules import CLASSIFIERS
+
+MANIFEST_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', 'output', 'classification-manifest.json')
+)
+MANIFEST_FORMAT = 1
+CONTENT_KEY_PREFIX = 'content:'
+
+
+def content_hash(product):
+    """Hash the product fields the classifiers look at"""
+    content = [product.get('name') or '', product.get('description') or '', product.get('tags') or []]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def entry_key(product):
+    """The manifest key of a product: its id, or its content hash if it has none"""
+    product_id = product.get('id')
+    return product_id if product_id is not None else CONTENT_KEY_PREFIX + content_hash(product)
+
+
+class ClassificationManifest:
+    """Cache of classifier results keyed by product id (or content) and content hash.
+
+    Use as a context manager: entering attaches the manifest to the
+    classifiers so their ``classify`` calls go through it, and a clean exit
+    detaches it and saves the manifest. With ``path=None`` the manifest lives
+    in memory only, as in pipeline worker processes.
+    """
+
+    def __init__(self, path=MANIFEST_PATH, classifiers=CLASSIFIERS, clusters=None):
+        self.path = path
+        self.classifiers = list(classifiers)
+        self.versions = {classifier.name: classifier.version for classifier in self.classifiers}
+        self.entries = {}
+        # A catalog.dedup.ClusterMap, or None
+        self.clusters = clusters
+        self.cluster_results = {}
+        self.hits = 0
+        self.misses = 0
+        self.cluster_hits = 0
+        self.load()
+
+    def load(self):
+        """Read the manifest, keeping only results whose rules are unchanged"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # A file of another format, or no manifest at all, starts an empty one
+        if not isinstance(data, dict) or data.get('format') != MANIFEST_FORMAT:
+            return
+
+        current = {
+            name for name, version in data.get('rules', {}).items()
+            if self.versions.get(name) == version
+        }
+        for product_id, entry in data.get('products', {}).items():
+            results = {name: category for name, category in entry['results'].items() if name in current}
+            self.entries[product_id] = {'hash': entry['hash'], 'results': results}
+
+    def save(self):
+        """Write the manifest atomically"""
+        data = {'format': MANIFEST_FORMAT, 'rules': self.versions, 'products': self.entries}
+        with atomic_open(self.path) as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def classify(self, classifier, product):
+        """Return the cached result for product, classifying it if needed"""
+        product_id = product.get('id')
+        digest = content_hash(product)
+        key = product_id if product_id is not None else CONTENT_KEY_PREFIX + digest
+        entry = self.entries.get(key)
+        if entry is None or entry['hash'] != digest:
+            entry = self.entries[key] = {'hash': digest, 'results': {}}
+        elif classifier.name in entry['results']:
+            self.hits += 1
+            return entry['results'][classifier.name]
+
+        cluster = self.clusters.lookup(product_id, digest) if self.clusters and product_id is not None else None
+        if cluster:
+            cluster_id, representative = cluster
+            shared = self.cluster_results.setdefault(cluster_id, {})
+            if classifier.name in shared:
+                self.cluster_hits += 1
+            else:
+                self.misses += 1
+                shared[classifier.name] = classifier.compute(representative)
+            entry['results'][classifier.name] = shared[classifier.name]
+            return shared[classifier.name]
+
+        self.misses += 1
+        entry['results'][classifier.name] = classifier.compute(product)
+        return entry['results'][classifier.name]
+
+    def prune(self, keys):
+        """Drop entries for products that are no longer in the catalog, given the ``entry_key`` of each"""
+        keys = set(keys)
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keys}
+
+    def __enter__(self):
+        for classifier in self.classifiers:
+            classifier.manifest = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for classifier in self.classifiers:
+            classifier.manifest = None
+        if exc_type is None and self.path:
+            self.save()
+        return False
@@ -0,0 +1,236 @@
+"""Run several category stages over the catalog in one read and one write.
+
+Running the fix-up scripts one after another parses and rewrites the whole
+catalog once per script. ``Pipeline`` instead streams each product through
+every selected stage in turn and writes it out once. Because stages only look
+at the product they are given, the result is the same as running the scripts
+in sequence.
+
+For large catalogs ``workers`` > 1 shards the products into chunks that a
+process pool runs through the stages in parallel. The workers also serialize
+their products, which costs more than the stages themselves. Chunks are
+written back in input order, so the output is byte-identical to a serial run.
+
+Given a ``catalog.profiling.RuleProfile``, the run also records what every
+classification matched and which keywords each change came from.
+"""
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+from catalog.manifest import ClassificationManifest, entry_key
+from catalog.products_io import PRODUCTS_PATH, ProductWriter, encode_record, iter_products
+from catalog.profiling import RuleProfile
+from catalog.rules import set_matching
+from catalog.stages import DEFAULT_STAGES, STAGES
+
+CHUNK_SIZE = 1000
+
+
+class StageResult:
+    """Change count, outcome distribution and time spent for one stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.changes = 0
+        self.outcomes = Counter()
+        self.seconds = 0.0
+
+    def merge(self, other):
+        """Add the counts and time of another result for the same stage"""
+        self.changes += other.changes
+        self.outcomes.update(other.outcomes)
+        self.seconds += other.seconds
+
+
+def apply_stages(stage_names, products, results, on_change=None):
+    """Run every stage over each product in place, updating results"""
+    stages = [(STAGES[name], result) for name, result in zip(stage_names, results)]
+    clock = time.perf_counter
+    for product in products:
+        for apply, result in stages:
+            stage_started = clock()
+            outcome = apply(product)
+            result.seconds += clock() - stage_started
+            if outcome is not None:
+                result.changes += 1
+                result.outcomes[outcome] += 1
+                if on_change:
+                    on_change(result.name, product, outcome)
+
+
+def process_chunk(stage_names, products, entries=None, encode=True, matching=None, clusters=None,
+                  profile=False):
+    """Worker entry point: run the stages over one chunk of products.
+
+    ``entries`` are the manifest entries for the chunk's products, or None
+    when no manifest is in use, and ``clusters`` the manifest's duplicate
+    clusters for them. ``matching`` overrides the classifiers' keyword
+    matching mode. Returns the updated products, their encoded text
+    (None unless ``encode``), the per-stage results, the changes as
+    (stage name, index in chunk, outcome), the updated manifest state and,
+    if ``profile``, the rule profile's stats.
+    """
+    if matching:
+        set_matching(matching)
+    results = [StageResult(name) for name in stage_names]
+    changes = []
+    manifest = None
+    if entries is not None:
+        manifest = ClassificationManifest(path=None, clusters=clusters)
+        manifest.entries = entries
+
+    positions = {id(product): index for index, product in enumerate(products)}
+
+    def record_change(stage_name, product, outcome):
+        changes.append((stage_name, positions[id(product)], outcome))
+
+    rule_profile = RuleProfile() if profile else None
+    with manifest or nullcontext(), rule_profile or nullcontext():
+        apply_stages(stage_names, products, results, record_change)
+
+    encoded = [encode_record(product) for product in products] if encode else None
+    cache = (manifest.entries, manifest.hits, manifest.misses, manifest.cluster_hits) if manifest else None
+    return products, encoded, results, changes, cache, rule_profile.stats if rule_profile else None
+
+
+class Pipeline:
+    """An ordered list of registered stages.
+
+    ``matching`` switches every classifier to that keyword matching mode
+    (``substring`` or ``token``). It takes effect immediately, so create the
+    pipeline before any ``ClassificationManifest`` that should see it.
+    """
+
+    def __init__(self, stage_names=None, matching=None):
+        self.stage_names = list(DEFAULT_STAGES if stage_names is None else stage_names)
+        unknown = [name for name in self.stage_names if name not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+        self.matching = matching
+        if matching:
+            set_matching(matching)
+        self.results = []
+        self.total = 0
+        self.workers = 1
+        self.wall_seconds = 0.0
+        self.manifest = None
+
+    def run(self, path=PRODUCTS_PATH, write=True, on_change=None, manifest=None,
+            workers=1, chunk_size=CHUNK_SIZE, prune=True, profile=None):
+        """Stream every product through the stages and write the catalog once.
+
+        ``on_change(stage_name, product, outcome)`` is called for each change.
+        With ``write=False`` the catalog is read and processed but left as is.
+        Given a ``ClassificationManifest``, classifier stages reuse its cached
+        results for unchanged products and the manifest is saved afterwards.
+        With ``workers`` > 1 chunks of ``chunk_size`` products are processed
+        in a process pool. ``prune=False`` keeps the manifest entries of
+        products not in this file, for runs over one mall's shard. A
+        ``RuleProfile`` is attached to the classifiers for the run and sees
+        every change.
+        """
+        self.results = [StageResult(name) for name in self.stage_names]
+        self.total = 0
+        self.workers = workers
+        self.manifest = manifest
+        started = time.perf_counter()
+        product_keys = []
+
+        if profile:
+            report_change = on_change
+
+            def on_change(stage_name, product, outcome):
+                profile.on_change(stage_name, product, outcome)
+                if report_change:
+                    report_change(stage_name, product, outcome)
+
+        with manifest or nullcontext(), profile or nullcontext(), \
+                ProductWriter(path) if write else nullcontext() as writer:
+            if workers > 1:
+                processed = self._run_parallel(path, on_change, manifest, workers, chunk_size, write, profile)
+            else:
+                processed = self._run_serial(path, on_change)
+
+            for product, encoded in processed:
+                self.total += 1
+                if manifest and prune:
+                    product_keys.append(entry_key(product))
+                if writer and encoded is not None:
+                    writer.write_encoded(encoded)
+                elif writer:
+                    writer.write(product)
+
+            if manifest and prune:
+                manifest.prune(product_keys)
+
+        self.wall_seconds = time.perf_counter() - started
+        return self.results
+
+    def _run_serial(self, path, on_change):
+        for product in iter_products(path):
+            apply_stages(self.stage_names, [product], self.results, on_change)
+            yield product, None
+
+    def _run_parallel(self, path, on_change, manifest, workers, chunk_size, encode, profile):
+        products = iter_products(path)
+        chunks = iter(lambda: list(islice(products, chunk_size)), [])
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a bounded window of chunks in flight and collect them in
+            # submission order, so memory stays flat and output order is stable
+            pending = deque()
+            for chunk in chunks:
+                entries = clusters = None
+                if manifest:
+                    keys = (entry_key(product) for product in chunk)
+                    entries = {key: manifest.entries[key] for key in keys if key in manifest.entries}
+                    if manifest.clusters:
+                        clusters = manifest.clusters.subset(product.get('id') for product in chunk)
+                pending.append(pool.submit(
+                    process_chunk, self.stage_names, chunk, entries, encode, self.matching, clusters,
+                    profile is not None,
+                ))
+                if len(pending) >= workers * 2:
+                    yield from self._collect(pending.popleft().result(), on_change, manifest, profile)
+            while pending:
+                yield from self._collect(pending.popleft().result(), on_change, manifest, profile)
+
+    def _collect(self, outcome, on_change, manifest, profile):
+        products, encoded, results, changes, cache, profile_stats = outcome
+        for total, result in zip(self.results, results):
+            total.merge(result)
+        if on_change:
+            for stage_name, index, change in changes:
+                on_change(stage_name, products[index], change)
+        if manifest and cache:
+            entries, hits, misses, cluster_hits = cache
+            manifest.entries.update(entries)
+            manifest.hits += hits
+            manifest.misses += misses
+            manifest.cluster_hits += cluster_hits
+        if profile and profile_stats:
+            profile.merge(profile_stats)
+        return zip(products, encoded or [None] * len(products))
+
+    @property
+    def changes(self):
+        """Total number of changes made by all stages"""
+        return sum(result.changes for result in self.results)
+
+    def print_report(self):
+        """Print per-stage change counts and timings"""
+        print(f"Processed {self.total} products through {len(self.results)} stages")
+        print(f"  {'stage':<20} {'changes':>8} {'ms':>10}")
+        for result in self.results:
+            print(f"  {result.name:<20} {result.changes:>8} {result.seconds * 1000:>10.1f}")
+        if self.workers > 1:
+            print(f"  {f'wall ({self.workers} workers)':<20} {'':>8} {self.wall_seconds * 1000:>10.1f}")
+        else:
+            stage_seconds = sum(result.seconds for result in self.results)
+            print(f"  {'read/write':<20} {'':>8} {(self.wall_seconds - stage_seconds) * 1000:>10.1f}")
+        if self.manifest:
+            print(f"Manifest: {self.manifest.hits} cached, {self.manifest.misses} classified", end='')
+            print(f", {self.manifest.cluster_hits} from duplicate clusters" if self.manifest.clusters else '')
@@ -0,0 +1,192 @@
+"""Streaming reader and writer for src/data/products.json.
+
+The catalog is a single JSON array. ``iter_products`` yields its records one
+at a time and ``ProductWriter`` writes records back as they are produced, so
+neither side ever holds the whole catalog in memory. The writer fills a
+temporary file next to the target and renames it into place only once the
+array is complete, which leaves the live catalog untouched if a run crashes.
+
+The output is byte-identical to ``json.dump(products, f, ensure_ascii=False,
+indent=2)``, the format the scripts have always written. ``iter_products``
+also reads the columnar build of the catalog (see ``catalog.columnar``), so
+every script accepts either format as input. ``ProductWriter`` only writes
+JSON and refuses to replace a columnar file with it.
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'data'))
+PRODUCTS_PATH = os.path.join(DATA_DIR, 'products.json')
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+def iter_products(path=PRODUCTS_PATH, chunk_size=CHUNK_SIZE):
+    """Yield the records of a JSON array or columnar catalog file one at a time"""
+    # Imported here because catalog.columnar writes through atomic_open
+    from catalog.columnar import ColumnarCatalog, is_columnar
+
+    if is_columnar(path):
+        with ColumnarCatalog(path) as catalog:
+            yield from catalog
+        return
+
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip(chars):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        skip(WHITESPACE)
+        if pos >= len(buffer) or buffer[pos] != '[':
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos += 1
+
+        expect_value = True
+        while True:
+            skip(WHITESPACE)
+            if pos >= len(buffer):
+                raise ValueError(f"{path} ends before the array is closed")
+            char = buffer[pos]
+            if char == ']':
+                return
+            if char == ',' and not expect_value:
+                pos += 1
+                expect_value = True
+                continue
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+
+            # A number cut off at the buffer edge ("1." of "1.5") still
+            # decodes, so only accept a value once its delimiter is in view.
+            after = end
+            while after < len(buffer) and buffer[after] in WHITESPACE:
+                after += 1
+            if after >= len(buffer) or buffer[after] not in ',]':
+                if eof:
+                    raise ValueError(f"{path} has malformed JSON at offset {after}")
+                fill()
+                continue
+
+            yield record
+            pos = after
+            expect_value = False
+
+
+def load_products(path=PRODUCTS_PATH):
+    """Return the whole catalog as a list"""
+    return list(iter_products(path))
+
+
+@contextmanager
+def atomic_open(path, mode='w'):
+    """Open a temp file beside path and rename it over path on success.
+
+    If the block raises, the temp file is removed and path is left as it was.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        # mkstemp creates the file as 0600; keep the permissions of the file
+        # being replaced, or the usual umask defaults for a new one
+        try:
+            permissions = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            permissions = 0o666 & ~umask
+        os.chmod(temp_path, permissions)
+
+        with os.fdopen(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def encode_record(record):
+    """Serialize one record the way it appears inside the catalog array"""
+    return json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+
+
+def write_json(data, path):
+    """Write a JSON document atomically, formatted like products.json"""
+    with atomic_open(path) as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+class ProductWriter:
+    """Write records to a JSON array file through a temp file and atomic rename.
+
+    Use as a context manager. If the block raises, the temp file is removed
+    and the target file is left as it was.
+    """
+
+    def __init__(self, path=PRODUCTS_PATH):
+        self.path = path
+        self.count = 0
+        self._context = None
+        self._file = None
+
+    def __enter__(self):
+        from catalog.columnar import is_columnar
+
+        if os.path.exists(self.path) and is_columnar(self.path):
+            raise ValueError(f"{self.path} is a columnar catalog; write the changes to products.json and rebuild it")
+        self._context = atomic_open(self.path)
+        self._file = self._context.__enter__()
+        self._file.write('[')
+        return self
+
+    def write(self, record):
+        """Append one record to the array"""
+        self.write_encoded(encode_record(record))
+
+    def write_encoded(self, text):
+        """Append a record already serialized by ``encode_record``"""
+        self._file.write(',\n  ' if self.count else '\n  ')
+        self._file.write(text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._file.write('\n]' if self.count else ']')
+        return self._context.__exit__(exc_type, exc, tb)
+
+
+def save_products(products, path=PRODUCTS_PATH):
+    """Write an iterable of records to path atomically"""
+    with ProductWriter(path) as writer:
+        for product in products:
+            writer.write(product)
+    return writer.count
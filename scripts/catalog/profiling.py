@@ -0,0 +1,188 @@
+"""Opt-in profiling of the keyword rule tables.
+
+When a reclassification run is slow or moves thousands of products, the
+stage totals of ``Pipeline.print_report`` do not say which keywords or
+categories did it. A ``RuleProfile`` attached to the classifiers (use it as a
+context manager, as with ``ClassificationManifest``) records for every
+classification the keywords it found, the category that won with the
+keywords that counted towards it, and the time it took. Given the pipeline's
+changes it also credits each changed product to the category it moved to and
+the keywords that put it there.
+
+Classifiers only check whether a profile is attached, so a run without one
+costs one attribute test per classification. A classifier scans each text
+once for all of its keywords, so time is measured per rule table (per
+classifier), not per keyword; what a keyword costs shows in how often it
+matches. ``report`` gives a JSON document listing, per classifier, keyword
+hits, wins and changes, category wins and changes, and the keywords that
+never matched, which are the candidates for pruning: keywords with many hits
+and few wins are noise, and keywords never hit are dead weight.
+
+Results computed in pipeline workers come back as ``stats`` and are added
+with ``merge``. Classifications answered from the manifest's cache are not
+computed and so not profiled; profile with --no-manifest to see them all.
+"""
+import json
+import os
+from collections import Counter
+from datetime import datetime
+
+from catalog.products_io import atomic_open
+from catalog.rules import CLASSIFIERS
+from catalog.stages import STAGE_CLASSIFIERS
+
+PROFILE_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', 'output', 'rule-profile.json')
+)
+PROFILE_VERSION = 1
+
+
+def category_label(category):
+    # The mapping classifier decides None when nothing matched
+    return '(none)' if category is None else str(category)
+
+
+class ClassifierStats:
+    """What one classifier matched, decided and changed, and the time it took"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.keyword_hits = Counter()
+        self.keyword_wins = Counter()
+        self.keyword_changes = Counter()
+        self.category_wins = Counter()
+        self.category_changes = Counter()
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.keyword_hits.update(other.keyword_hits)
+        self.keyword_wins.update(other.keyword_wins)
+        self.keyword_changes.update(other.keyword_changes)
+        self.category_wins.update(other.category_wins)
+        self.category_changes.update(other.category_changes)
+
+
+class RuleProfile:
+    """Per-keyword and per-category statistics of the classifiers it is attached to"""
+
+    def __init__(self, classifiers=CLASSIFIERS):
+        self.classifiers = list(classifiers)
+        self.stats = {}
+
+    def _stats(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = ClassifierStats()
+        return stats
+
+    def record(self, name, seconds, keywords, category, winning):
+        """Record one classification: keywords found, the winner and the keywords behind it"""
+        stats = self._stats(name)
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.keyword_hits.update(keywords)
+        stats.keyword_wins.update(winning)
+        stats.category_wins[category] += 1
+
+    def on_change(self, stage_name, product, outcome):
+        """Credit a pipeline change to the category and keywords that made it"""
+        classifier = STAGE_CLASSIFIERS.get(stage_name)
+        if classifier is None or classifier not in self.classifiers:
+            return
+        stats = self._stats(classifier.name)
+        stats.category_changes[outcome] += 1
+        # Products classified through a duplicate cluster may not contain
+        # the representative's keywords; they count for the category only
+        stats.keyword_changes.update(classifier.winning_keywords(product, outcome))
+
+    def merge(self, stats):
+        """Add the ``stats`` of a profile from another process"""
+        for name, other in stats.items():
+            self._stats(name).merge(other)
+
+    def report(self, pipeline=None):
+        """The profile as a JSON-serializable document"""
+        classifiers = {}
+        for classifier in self.classifiers:
+            stats = self.stats.get(classifier.name) or ClassifierStats()
+            keywords = sorted(
+                stats.keyword_hits,
+                key=lambda keyword: (-stats.keyword_hits[keyword], -stats.keyword_wins[keyword], keyword),
+            )
+            categories = sorted(
+                set(stats.category_wins) | set(stats.category_changes),
+                key=lambda category: (-stats.category_wins[category], str(category)),
+            )
+            classifiers[classifier.name] = {
+                'version': classifier.version,
+                'calls': stats.calls,
+                'seconds': round(stats.seconds, 6),
+                'microsecondsPerCall': round(stats.seconds / stats.calls * 1e6, 2) if stats.calls else 0,
+                'categories': {
+                    category_label(category): {
+                        'wins': stats.category_wins[category],
+                        'changes': stats.category_changes[category],
+                    }
+                    for category in categories
+                },
+                'keywords': {
+                    keyword: {
+                        'hits': stats.keyword_hits[keyword],
+                        'wins': stats.keyword_wins[keyword],
+                        'changes': stats.keyword_changes[keyword],
+                    }
+                    for keyword in keywords
+                },
+                'unmatched': [keyword for keyword in classifier.automaton.keywords if keyword not in stats.keyword_hits],
+            }
+
+        report = {
+            'version': PROFILE_VERSION,
+            'generated': datetime.now().isoformat(timespec='seconds'),
+        }
+        if pipeline is not None:
+            report['products'] = pipeline.total
+            report['stages'] = {
+                result.name: {
+                    'changes': result.changes,
+                    'seconds': round(result.seconds, 6),
+                    'outcomes': dict(result.outcomes.most_common()),
+                }
+                for result in pipeline.results
+            }
+        report['classifiers'] = classifiers
+        return report
+
+    def write(self, path=PROFILE_PATH, pipeline=None):
+        with atomic_open(path) as f:
+            json.dump(self.report(pipeline), f, ensure_ascii=False, indent=2)
+
+    def print_summary(self, top=5):
+        """Print calls and time per classifier and its noisiest keywords"""
+        print(f"Rule profile: {'classifier':<12} {'calls':>8} {'ms':>10} {'us/call':>8}")
+        for classifier in self.classifiers:
+            stats = self.stats.get(classifier.name)
+            if not stats or not stats.calls:
+                continue
+            print(f"              {classifier.name:<12} {stats.calls:>8} {stats.seconds * 1000:>10.1f} "
+                  f"{stats.seconds / stats.calls * 1e6:>8.1f}")
+            noisy = sorted(
+                stats.keyword_hits,
+                key=lambda keyword: (-(stats.keyword_hits[keyword] - stats.keyword_wins[keyword]), keyword),
+            )[:top]
+            if noisy:
+                print('                noisiest: ' + ', '.join(
+                    f"{keyword} ({stats.keyword_wins[keyword]}/{stats.keyword_hits[keyword]} won)" for keyword in noisy
+                ))
+
+    def __enter__(self):
+        for classifier in self.classifiers:
+            classifier.profile = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for classifier in self.classifiers:
+            classifier.profile = None
+        return False
@@ -0,0 +1,180 @@
+"""A local HTTP server that replays saved mall pages, for testing the scrapers.
+
+``ReplayServer`` serves a table of routes, original page URL -> saved file,
+on 127.0.0.1. A page is fetched from ``server.url_for(original_url)``, which
+encodes the original host and path in the local URL. Routes come from:
+
+* ``routes_from_recordings``: a directory written by ``Recorder``, one file
+  per fetched page under <host>/;
+* ``routes_from_homepages``: the <name>-homepage.html snapshots the
+  structure-analysis scripts leave in scripts/output, matched to malls by
+  name.
+
+The server speaks HTTP/1.1 keep-alive and gzips when asked, so the fetcher's
+pooling and decompression are exercised. It answers HEAD as well as GET, and
+sends an ETag and Last-Modified for every page, answering a request whose
+If-None-Match or If-Modified-Since still holds with 304 Not Modified. To test retries and deadlines, it
+can answer the first ``fail_first`` requests of every route with 503 and
+delay every response by ``latency`` seconds.
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+
+def route_key(url):
+    """(host, unescaped path with query) of a URL, as the handler looks it up"""
+    parts = urlsplit(url)
+    return parts.netloc, unquote((parts.path or '/') + (f"?{parts.query}" if parts.query else ''))
+
+
+class Recorder:
+    """Save fetched pages in the layout ``routes_from_recordings`` reads"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path_for(self, url):
+        host, path = route_key(url)
+        return os.path.join(self.directory, host, quote(path, safe=''))
+
+    def __call__(self, url, response):
+        path = self.path_for(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(response.body)
+
+
+def routes_from_recordings(directory):
+    routes = {}
+    for host in os.listdir(directory):
+        host_dir = os.path.join(directory, host)
+        if os.path.isdir(host_dir):
+            for name in os.listdir(host_dir):
+                routes[(host, unquote(name))] = os.path.join(host_dir, name)
+    return routes
+
+
+def routes_from_homepages(directory, scrapers):
+    """Route each mall's base URL to <directory>/<name>-homepage.html.
+
+    The snapshot is named by the mall id, or by the mall's host name with the
+    usual www./-mall/mall affixes dropped (gwch-mall.com -> gwch).
+    """
+    routes = {}
+    for scraper in scrapers:
+        host = urlsplit(scraper.base_url).hostname or ''
+        short_host = host.removeprefix('www.').split('.')[0]
+        candidates = [scraper.mall_id, short_host, short_host.removesuffix('-mall').removesuffix('mall')]
+        for name in candidates:
+            path = os.path.join(directory, f"{name}-homepage.html")
+            if name and os.path.exists(path):
+                routes[route_key(scraper.base_url)] = path
+                break
+    return routes
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond()
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def _respond(self, head=False):
+        server = self.server
+        # /<host>/<path>: the original URL's host is the first path segment
+        host, _, path = unquote(self.path).lstrip('/').partition('/')
+        key = (host, '/' + path)
+        file_path = server.routes.get(key)
+
+        with server.lock:
+            server.requests += 1
+            attempts = server.attempts[key] = server.attempts.get(key, 0) + 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        if file_path is None:
+            self._send(404, b'not found', 'text/plain', head=head)
+        elif attempts <= server.fail_first:
+            self._send(503, b'try again', 'text/plain', {'Retry-After': '0'}, head=head)
+        else:
+            with open(file_path, 'rb') as f:
+                body = f.read()
+            mtime = int(os.path.getmtime(file_path))
+            validators = {
+                'ETag': f'"{hashlib.sha1(body).hexdigest()[:16]}"',
+                'Last-Modified': formatdate(mtime, usegmt=True),
+            }
+            if self._not_modified(validators['ETag'], mtime):
+                with server.lock:
+                    server.not_modified += 1
+                self._send(304, b'', 'text/html', validators, head=True)
+            else:
+                self._send(200, body, 'text/html', validators, head=head)
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(',')]
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _send(self, status, body, content_type, headers=None, head=False):
+        if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            headers = {**(headers or {}), 'Content-Encoding': 'gzip'}
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Serve routes on a free local port in a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, routes, fail_first=0, latency=0.0):
+        super().__init__(('127.0.0.1', 0), ReplayHandler)
+        self.routes = routes
+        self.fail_first = fail_first
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def url_for(self, url):
+        """The local URL serving url's saved page"""
+        parts = urlsplit(url)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        return f"http://127.0.0.1:{self.server_address[1]}/{parts.netloc}{path}"
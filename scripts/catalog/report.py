@@ -0,0 +1,289 @@
+"""Category statistics and quality report computed over a columnar frame.
+
+``CategoryFrame`` holds the catalog as interned columns: for category, mall
+and region a dictionary of distinct values and one integer code per product.
+Every metric is then a ``Counter`` over a code column (or a zip of two),
+which runs in C, followed by work per distinct value rather than per product:
+category issues, hierarchy paths and uncategorized flags are worked out once
+for each distinct category and folded into the counts.
+
+``uncategorized`` counts products whose category is missing, malformed or
+not in the hierarchy. ``catchAll`` counts, separately, products with a valid
+category that only lands in a catch-all leaf: 기타 (비식품/기타상품/기타) or
+미분류. Those are not errors, but are still waiting for a real category.
+
+A frame is built from records or, without decoding them, straight from the
+memory-mapped columns of a columnar catalog.
+"""
+from collections import Counter
+from datetime import datetime
+
+from catalog.columnar import NULL_CODE, ColumnarCatalog, is_columnar
+from catalog.hierarchy import HIERARCHY_INDEX, UNCLASSIFIED, find_category_hierarchy
+from catalog.products_io import PRODUCTS_PATH, iter_products
+
+MISSING = object()
+ISSUES = ('missing', 'null', 'empty', 'whitespace', 'invalid', 'unmapped')
+SAMPLE_SIZE = 5
+# Hierarchy leaves that hold products no rule could place
+CATCH_ALL_PATHS = frozenset([find_category_hierarchy('기타'), UNCLASSIFIED])
+
+
+def category_issue(value):
+    """Name of the problem with a category value, None if it is a known category"""
+    if value is MISSING:
+        return 'missing'
+    if value is None:
+        return 'null'
+    if not isinstance(value, str):
+        return 'invalid'
+    if value == '':
+        return 'empty'
+    if value.strip() == '':
+        return 'whitespace'
+    if value not in HIERARCHY_INDEX:
+        return 'unmapped'
+    return None
+
+
+def hierarchy_path(value):
+    """The (major, mid, minor) that annotate_hierarchy assigns for a category value"""
+    if value is MISSING:
+        value = '기타'
+    try:
+        return find_category_hierarchy(value)
+    except TypeError:
+        return UNCLASSIFIED
+
+
+def is_catch_all(value):
+    """True for a valid category value whose hierarchy leaf is a catch-all"""
+    return category_issue(value) is None and hierarchy_path(value) in CATCH_ALL_PATHS
+
+
+def mall_name(product):
+    """Display name of a product's mall across the catalog's record layouts"""
+    mall = product.get('mall')
+    if isinstance(mall, dict):
+        mall = mall.get('name')
+    return product.get('mallName') or (mall if isinstance(mall, str) else None) or product.get('mallId')
+
+
+class Interner:
+    """Map values to dense integer codes"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._codes = {}
+        for code, value in enumerate(self.values):
+            self._codes.setdefault(self._key(value), code)
+
+    @staticmethod
+    def _key(value):
+        # Unhashable values (lists, dicts) are interned by identity
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            return ('unhashable', id(value))
+
+    def code(self, value):
+        key = self._key(value)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class CategoryFrame:
+    """Category, mall and region columns of a catalog as interned codes"""
+
+    def __init__(self, categories, malls, regions, describe):
+        self.categories, self.category_codes = categories
+        self.malls, self.mall_codes = malls
+        self.regions, self.region_codes = regions
+        self.count = len(self.category_codes)
+        # describe(index) -> (id, name), used only for issue samples
+        self.describe = describe
+
+    @classmethod
+    def from_products(cls, products):
+        """Build a frame from an iterable of records in one pass"""
+        categories, malls, regions = Interner(), Interner(), Interner()
+        columns = ([], [], [])
+        labels = []
+        for product in products:
+            columns[0].append(categories.code(product.get('category', MISSING)))
+            columns[1].append(malls.code(mall_name(product)))
+            region = product.get('region')
+            columns[2].append(regions.code(region if isinstance(region, str) else None))
+            labels.append((product.get('id', 'unknown'), product.get('name', 'unknown')))
+        return cls(
+            (categories.values, columns[0]),
+            (malls.values, columns[1]),
+            (regions.values, columns[2]),
+            labels.__getitem__,
+        )
+
+    @classmethod
+    def from_columnar(cls, catalog):
+        """Build a frame from an open ``ColumnarCatalog``.
+
+        The interned columns are used as they are; only the non-column fields
+        of products without a plain string category or mall name are decoded.
+        """
+        def column(name, fallback):
+            interner = Interner(catalog.dictionaries[name])
+            codes = catalog.codes(name)
+            missing = [index for index, code in enumerate(codes) if code == NULL_CODE]
+            if not missing:
+                return interner.values, codes
+            codes = list(codes)
+            for index in missing:
+                codes[index] = interner.code(fallback(index))
+            return interner.values, codes
+
+        mall_ids = catalog.strings('mallId')
+
+        def mall_fallback(index):
+            rest = catalog.rest(index)
+            rest.setdefault('mallId', mall_ids[index])
+            return mall_name(rest)
+
+        def describe(index):
+            product = catalog.record(index)
+            return product.get('id', 'unknown'), product.get('name', 'unknown')
+
+        return cls(
+            column('category', lambda index: catalog.rest(index).get('category', MISSING)),
+            column('mallName', mall_fallback),
+            column('region', lambda index: None),
+            describe,
+        )
+
+
+def catalog_report(path=PRODUCTS_PATH, sample_size=SAMPLE_SIZE):
+    """Load a JSON or columnar catalog file into a frame and report on it"""
+    if is_columnar(path):
+        with ColumnarCatalog(path) as catalog:
+            return category_report(CategoryFrame.from_columnar(catalog), sample_size)
+    return category_report(CategoryFrame.from_products(iter_products(path)), sample_size)
+
+
+def hierarchy_counts(frame):
+    """Nested {major: {mid: {minor: count}}} of the paths annotate_hierarchy assigns"""
+    counts = {}
+    for code, count in Counter(frame.category_codes).items():
+        major, mid, minor = hierarchy_path(frame.categories[code])
+        minors = counts.setdefault(major, {}).setdefault(mid, {})
+        minors[minor] = minors.get(minor, 0) + count
+    return counts
+
+
+def category_report(frame, sample_size=SAMPLE_SIZE):
+    """Compute every category metric for a frame as a JSON-ready dict"""
+    category_counts = Counter(frame.category_codes)
+    issue_of = {code: category_issue(frame.categories[code]) for code in category_counts}
+    catch_all_codes = {code for code in category_counts if is_catch_all(frame.categories[code])}
+
+    issues = {name: {'count': 0, 'samples': []} for name in ISSUES}
+    for code, count in category_counts.items():
+        if issue_of[code]:
+            issues[issue_of[code]]['count'] += count
+    # Samples need product positions, so scan only when a problem exists
+    problem_codes = {code for code, issue in issue_of.items() if issue}
+    wanted = sum(min(issue['count'], sample_size) for issue in issues.values())
+    if problem_codes and sample_size:
+        for index, code in enumerate(frame.category_codes):
+            if code in problem_codes:
+                samples = issues[issue_of[code]]['samples']
+                if len(samples) < sample_size:
+                    product_id, name = frame.describe(index)
+                    samples.append({'index': index, 'id': product_id, 'name': name})
+                    wanted -= 1
+                    if not wanted:
+                        break
+
+    # Only non-blank string categories count as categories
+    categories = {
+        frame.categories[code]: count
+        for code, count in category_counts.most_common()
+        if issue_of[code] in (None, 'unmapped')
+    }
+
+    hierarchy = []
+    for major, mids in sorted(hierarchy_counts(frame).items()):
+        mid_entries = [
+            {'mid': mid, 'count': sum(minors.values()), 'minors': dict(sorted(minors.items()))}
+            for mid, minors in sorted(mids.items())
+        ]
+        hierarchy.append({'major': major, 'count': sum(entry['count'] for entry in mid_entries), 'mids': mid_entries})
+
+    mall_totals = Counter(frame.mall_codes)
+    mall_uncategorized = Counter()
+    mall_catch_all = Counter()
+    for (mall_code, category_code), count in Counter(zip(frame.mall_codes, frame.category_codes)).items():
+        if issue_of[category_code]:
+            mall_uncategorized[mall_code] += count
+        elif category_code in catch_all_codes:
+            mall_catch_all[mall_code] += count
+    malls = [
+        {
+            'mall': frame.malls[code],
+            'count': count,
+            'uncategorized': mall_uncategorized[code],
+            'uncategorizedRate': round(mall_uncategorized[code] / count, 4),
+            'catchAll': mall_catch_all[code],
+            'catchAllRate': round(mall_catch_all[code] / count, 4),
+        }
+        for code, count in mall_totals.most_common()
+    ]
+
+    regions = {frame.regions[code]: count for code, count in Counter(frame.region_codes).most_common()}
+
+    uncategorized = sum(issue['count'] for issue in issues.values())
+    catch_all = sum(category_counts[code] for code in catch_all_codes)
+    return {
+        'generatedAt': datetime.now().isoformat(timespec='seconds'),
+        'total': frame.count,
+        'uncategorized': uncategorized,
+        'uncategorizedRate': round(uncategorized / frame.count, 4) if frame.count else 0,
+        'catchAll': catch_all,
+        'catchAllRate': round(catch_all / frame.count, 4) if frame.count else 0,
+        'issues': issues,
+        'categories': categories,
+        'hierarchy': hierarchy,
+        'malls': malls,
+        'regions': regions,
+    }
+
+
+def uncategorized_trend(store):
+    """Uncategorized and catch-all rates of every snapshot in a ``BackupStore``, oldest first and undated (created None) last"""
+    issue_by_hash = {}
+    catch_all_hashes = set()
+    for digest, product in store.iter_records():
+        value = product.get('category', MISSING) if isinstance(product, dict) else None
+        issue_by_hash[digest] = category_issue(value)
+        if is_catch_all(value):
+            catch_all_hashes.add(digest)
+    trend = []
+    for info in store.list_snapshots():
+        digests = Counter(digest for _, digest in store.snapshot(info['name'])['records'])
+        total = sum(digests.values())
+        uncategorized = sum(count for digest, count in digests.items() if issue_by_hash.get(digest))
+        catch_all = sum(count for digest, count in digests.items() if digest in catch_all_hashes)
+        trend.append({
+            'snapshot': info['name'],
+            'created': (
+                datetime.fromtimestamp(info['created'] / 1000).isoformat(timespec='seconds')
+                if info['created'] is not None else None
+            ),
+            'total': total,
+            'uncategorized': uncategorized,
+            'uncategorizedRate': round(uncategorized / total, 4) if total else 0,
+            'catchAll': catch_all,
+            'catchAllRate': round(catch_all / total, 4) if total else 0,
+        })
+    return trend
@@ -0,0 +1,26 @@
+"""Classifiers used by the category fix-up scripts.
+
+The keyword tables live in src/data/classification-rules.json, and the
+model shared with src/lib/product-classifier.ts in category-mapping.json and
+tag-mapping.json. ``catalog.compiler`` compiles them once and caches the
+result, so importing this module is a cache load rather than an automaton
+build. Each script's table differs slightly from the others, as they
+evolved separately.
+"""
+from catalog.compiler import load_rule_set
+
+RULE_SET = load_rule_set()
+
+MISC_CLASSIFIER = RULE_SET.classifiers['misc']
+MISSING_CLASSIFIER = RULE_SET.classifiers['missing']
+JEONCHE_CLASSIFIER = RULE_SET.classifiers['jeonche']
+POPULAR_CLASSIFIER = RULE_SET.classifiers['popular']
+MAPPING_CLASSIFIER = RULE_SET.mapping
+
+CLASSIFIERS = [MISC_CLASSIFIER, MISSING_CLASSIFIER, JEONCHE_CLASSIFIER, POPULAR_CLASSIFIER]
+
+
+def set_matching(mode):
+    """Switch every fix-up classifier to a matching mode (substring or token)"""
+    for classifier in CLASSIFIERS:
+        classifier.matching = mode
@@ -0,0 +1,313 @@
+"""Concurrent mall scraping driven by the selector configs in mall-scrapers.json.
+
+mall-scrapers.json holds the generic scraper configs of
+src/lib/scrapers/scraper-registry.ts as data: the CSS selectors for a mall's
+product cards, names, prices, images and links, and in place of the
+registry's extractor functions, the regular expressions they try in order
+(``namePatterns``, ``pricePatterns``). A pattern's first group is used if it
+has one, otherwise the whole match.
+
+``scrape_malls`` runs every mall at once through a ``Fetcher``, which keeps
+each host within its concurrency and rate limits, and returns one
+``MallResult`` per mall. ``merge_results`` then replaces the products of each
+mall that returned products, the way ProductSyncService.syncMall does; a mall
+that failed or found nothing keeps its current products. Older records name
+their mall only by a name string, or by a dict without a mall id, so a
+product without a mall id is matched by its mall name, as ``RegionResolver``
+matches malls, and failing that by the host of its URL (see ``MallMatcher``).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlsplit
+
+from catalog.fetcher import FetchError
+from catalog.html_select import parse_html
+from catalog.products_io import DATA_DIR, write_json
+from catalog.report import mall_name
+from catalog.search_index import product_mall_id
+
+MALL_SCRAPERS_PATH = os.path.join(DATA_DIR, 'mall-scrapers.json')
+SYNC_STATUS_PATH = os.path.join(DATA_DIR, 'sync-status.json')
+
+
+def normalize_price(text):
+    """BaseScraper.normalizePrice: the digits of a price string, 0 if none"""
+    digits = re.sub(r'[^\d]', '', text)
+    return int(digits) if digits else 0
+
+
+def first_match(patterns, text):
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return (match.group(1) if pattern.groups else match.group()).strip()
+    return ''
+
+
+class MallScraper:
+    """Extract products from a mall's pages with one selector config"""
+
+    def __init__(self, config):
+        self.config = config
+        self.mall_id = config['mallId']
+        self.mall_name = config['mallName']
+        self.base_url = config['baseUrl']
+        self.name_patterns = [re.compile(pattern) for pattern in config.get('namePatterns', [])]
+        self.price_patterns = [re.compile(pattern) for pattern in config.get('pricePatterns', [])]
+
+    def page_urls(self):
+        return [self.base_url]
+
+    def _name(self, card):
+        element = card.select_one(self.config['nameSelector'])
+        if element is None:
+            return ''
+        if self.config.get('nameAttribute') == 'alt':
+            name = element.get('alt', '')
+        else:
+            name = element.text()
+        if self.name_patterns:
+            name = first_match(self.name_patterns, name)
+        return ' '.join(name.split())
+
+    def _price(self, card):
+        element = card.select_one(self.config['priceSelector'])
+        if element is None:
+            return ''
+        text = element.text()
+        return first_match(self.price_patterns, text) if self.price_patterns else text.strip()
+
+    def parse(self, html, page_url):
+        """Products on one page, shaped like GenericHTMLScraper's"""
+        products = []
+        seen = set()
+        for card in parse_html(html).select(self.config['productSelector']):
+            name = self._name(card)
+            price = self._price(card)
+            if not name or not price:
+                continue
+
+            link = card.select_one(self.config['linkSelector']) if self.config.get('linkSelector') else None
+            href = (link or card).get('href')
+            product_url = urljoin(page_url, href) if href else self.base_url
+            image = card.select_one(self.config['imageSelector']) if self.config.get('imageSelector') else None
+            image_url = urljoin(page_url, image.get('src')) if image is not None and image.get('src') else ''
+
+            # Ids follow the product URL so a rescrape keeps them stable
+            product_id = f"{self.mall_id}_{hashlib.sha1(product_url.encode('utf-8')).hexdigest()[:12]}"
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            products.append({
+                'id': product_id,
+                'name': name,
+                'price': normalize_price(price),
+                'image': image_url,
+                'category': 'other',
+                'region': self.config.get('region', ''),
+                'url': product_url,
+                'description': '',
+                'tags': [],
+                'isFeatured': False,
+                'isNew': True,
+                'mall': {
+                    'mallId': self.mall_id,
+                    'mallName': self.mall_name,
+                    'mallUrl': self.base_url,
+                    'region': self.config.get('region', ''),
+                },
+            })
+        return products
+
+
+def load_scrapers(path=MALL_SCRAPERS_PATH):
+    """{mall id: MallScraper} for every config in the file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+    return {mall_id: MallScraper(config) for mall_id, config in configs.items()}
+
+
+def apply_classification(product, classifier):
+    """Set category and category tag as ProductSyncService.syncMall does; return the match"""
+    classification = classifier.classify(product)
+    if classification:
+        product['category'] = classification['mainCategory']
+        if classification['mainCategory'] not in product['tags']:
+            product['tags'].append(classification['mainCategory'])
+    return classification
+
+
+def classify_products(products, service):
+    """Classify scraped products with a ``ClassificationService``, as the sync service does.
+
+    The mapping classifier alone gives category-mapping ids such as 'seafood',
+    which no stage maps back to a site category; the service runs the
+    category stages too and classifies a category they cannot place from
+    scratch, so products arrive with a site category and their hierarchy.
+    """
+    for product in products:
+        result = service.classify(product)
+        del result['classification']
+        product.update((field, value) for field, value in result.items() if value is not None)
+
+
+class MallResult:
+    def __init__(self, scraper):
+        self.mall_id = scraper.mall_id
+        self.mall_name = scraper.mall_name
+        self.base_url = scraper.base_url
+        self.products = []
+        self.pages = 0
+        self.error = None
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None and bool(self.products)
+
+    def sync_status(self):
+        """The mall's entry for sync-status.json (ProductSyncStatus)"""
+        status = {
+            'mallId': self.mall_id,
+            'mallName': self.mall_name,
+            'lastSyncTime': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'productCount': len(self.products) if self.ok else 0,
+            'status': 'success' if self.ok else 'failed',
+        }
+        if not self.ok:
+            status['errorMessage'] = self.error or 'No products found'
+        return status
+
+
+async def scrape_mall(fetcher, scraper, url_for=None, on_page=None):
+    """Fetch and parse every page of one mall.
+
+    ``url_for`` maps a page URL to the URL actually fetched (a replay server's,
+    in tests); links are still resolved against the real page URL.
+    ``on_page(url, response)`` sees every fetched page, e.g. to record it.
+    """
+    result = MallResult(scraper)
+    started = time.perf_counter()
+    try:
+        for page_url in scraper.page_urls():
+            if url_for:
+                response = await fetcher.fetch(url_for(page_url), host=urlsplit(page_url).netloc)
+            else:
+                response = await fetcher.fetch(page_url)
+            if not response.ok:
+                raise FetchError(page_url, f"HTTP {response.status}", response.status)
+            if on_page:
+                on_page(page_url, response)
+            result.products.extend(scraper.parse(response.text(), page_url))
+            result.pages += 1
+    except FetchError as exc:
+        result.error = str(exc)
+    except ValueError as exc:
+        # An unsupported selector in the mall's config
+        result.error = f"{scraper.mall_id}: {exc}"
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+async def scrape_malls(fetcher, scrapers, url_for=None, on_page=None):
+    """Scrape malls concurrently; one ``MallResult`` per scraper, in order.
+
+    Malls still running at the fetcher's deadline are cancelled and reported
+    as failed.
+    """
+    tasks = [asyncio.ensure_future(scrape_mall(fetcher, scraper, url_for, on_page)) for scraper in scrapers]
+    if not tasks:
+        return []
+    remaining = fetcher.remaining()
+    await asyncio.wait(tasks, timeout=max(remaining, 0) if remaining is not None else None)
+
+    results = []
+    for scraper, task in zip(scrapers, tasks):
+        if task.done():
+            results.append(task.result())
+        else:
+            task.cancel()
+            result = MallResult(scraper)
+            result.error = 'deadline reached before the mall finished'
+            results.append(result)
+    return results
+
+
+def name_key(name):
+    """A mall name as products spell it: '장흥몰 (산들해랑장흥몰)' as '장흥몰', without spaces"""
+    return ''.join(name.split('(')[0].split())
+
+
+def url_host(url):
+    host = urlsplit(url).netloc.lower()
+    return host[len('www.'):] if host.startswith('www.') else host
+
+
+class MallMatcher:
+    """Tell whether a catalog product belongs to one of a set of malls.
+
+    A product with a mall id belongs to that mall only. One without belongs to
+    the malls of its mall name, else to those at the host of its product URL:
+    products scraped before the configs existed name 진도아리랑몰 '진도몰'.
+    """
+
+    def __init__(self, malls):
+        self.ids = set()
+        self.names = {}
+        self.hosts = {}
+        for mall_id, name, base_url in malls:
+            self.ids.add(mall_id)
+            self.names.setdefault(name_key(name), set()).add(mall_id)
+            self.hosts.setdefault(url_host(base_url), set()).add(mall_id)
+
+    @classmethod
+    def from_config(cls, path=MALL_SCRAPERS_PATH):
+        """A matcher for every mall in mall-scrapers.json"""
+        return cls(
+            (scraper.mall_id, scraper.mall_name, scraper.base_url) for scraper in load_scrapers(path).values()
+        )
+
+    def mall_ids(self, product):
+        """Ids of the malls among these that a product belongs to; more than one if they share a name"""
+        mall_id = product_mall_id(product)
+        if mall_id:
+            return {mall_id} & self.ids
+        name = mall_name(product)
+        if isinstance(name, str) and name_key(name) in self.names:
+            return self.names[name_key(name)]
+        url = product.get('url') or product.get('productUrl')
+        if isinstance(url, str) and url:
+            return self.hosts.get(url_host(url), set())
+        return set()
+
+    def matches(self, product):
+        return bool(self.mall_ids(product))
+
+
+def merge_results(products, results):
+    """Yield the catalog with each successfully scraped mall's products replaced"""
+    replaced = MallMatcher(
+        (result.mall_id, result.mall_name, result.base_url) for result in results if result.ok
+    )
+    for product in products:
+        if not replaced.matches(product):
+            yield product
+    for result in results:
+        if result.ok:
+            yield from result.products
+
+
+def update_sync_status(results, path=SYNC_STATUS_PATH):
+    """Record each mall's outcome in sync-status.json, keeping other malls' entries"""
+    statuses = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            statuses = {status['mallId']: status for status in json.load(f)}
+    for result in results:
+        statuses[result.mall_id] = result.sync_status()
+    write_json(list(statuses.values()), path)
@@ -0,0 +1,176 @@
+"""Inverted search index over the catalog for /api/products and ProductSyncService.
+
+Product search is a lowercase substring test over name, description and tags.
+The index lets the app narrow that test to a few candidates: for every gram
+(a single character or two adjacent characters) of Hangul syllables, latin
+letters and digits in those fields, it lists the positions of the products
+that contain it. A query matches only products holding every gram of the
+query, so the app intersects the query's posting lists and runs the substring
+test on what is left. Queries without indexable characters fall back to a
+full scan. Exact tags, categories and mall ids get their own posting lists for
+filtering.
+
+Positions refer to the order of products.json, and posting lists are stored
+as gaps between positions to keep the file small. ``count`` and ``ids`` let
+the app tell that an index no longer belongs to the catalog it has loaded.
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, atomic_open, iter_products
+
+SEARCH_INDEX_PATH = os.path.join(DATA_DIR, 'search-index.json')
+INDEX_VERSION = 1
+
+# Runs of indexed characters; grams never span a space or punctuation
+INDEXED_RUN = re.compile(r'[가-힣a-z0-9]+')
+
+
+def text_grams(text):
+    """Unigrams and bigrams of the indexed runs of lowercased text"""
+    grams = set()
+    for run in INDEXED_RUN.findall(text.lower()):
+        grams.update(run)
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def searchable_texts(product):
+    """The strings /api/products searches: name, description and tags"""
+    for field in ('name', 'description'):
+        value = product.get(field)
+        if isinstance(value, str):
+            yield value
+    for tag in product.get('tags') or []:
+        if isinstance(tag, str):
+            yield tag
+
+
+def product_mall_id(product):
+    """Mall id the way the app resolves it: mall.mallId, then mallId"""
+    mall = product.get('mall')
+    mall_id = mall.get('mallId') if isinstance(mall, dict) else None
+    return mall_id or product.get('mallId')
+
+
+def encode_postings(positions):
+    """Gaps between ascending positions"""
+    gaps = []
+    previous = 0
+    for position in positions:
+        gaps.append(position - previous)
+        previous = position
+    return gaps
+
+
+def decode_postings(gaps):
+    """Positions from gaps, the inverse of ``encode_postings``"""
+    positions = []
+    position = 0
+    for gap in gaps:
+        position += gap
+        positions.append(position)
+    return positions
+
+
+class SearchIndexBuilder:
+    """Collect posting lists product by product, in catalog order"""
+
+    def __init__(self):
+        self.ids = []
+        self.grams = {}
+        self.tags = {}
+        self.categories = {}
+        self.malls = {}
+
+    @staticmethod
+    def _post(postings, key, position):
+        positions = postings.setdefault(key, [])
+        # A product adds each key once even if several fields contain it
+        if not positions or positions[-1] != position:
+            positions.append(position)
+
+    def add(self, product):
+        position = len(self.ids)
+        self.ids.append(product.get('id'))
+
+        grams = set()
+        for text in searchable_texts(product):
+            grams |= text_grams(text)
+        for gram in grams:
+            self._post(self.grams, gram, position)
+
+        for tag in product.get('tags') or []:
+            if isinstance(tag, str):
+                self._post(self.tags, tag.lower(), position)
+        category = product.get('category')
+        if isinstance(category, str):
+            self._post(self.categories, category, position)
+        mall_id = product_mall_id(product)
+        if isinstance(mall_id, str):
+            self._post(self.malls, mall_id, position)
+
+    def build(self, source=None):
+        """The index as a JSON-ready dict"""
+        def encode(postings):
+            return {key: encode_postings(postings[key]) for key in sorted(postings)}
+
+        return {
+            'version': INDEX_VERSION,
+            'generatedAt': datetime.now().isoformat(timespec='seconds'),
+            'source': source,
+            'count': len(self.ids),
+            'ids': self.ids,
+            'grams': encode(self.grams),
+            'tags': encode(self.tags),
+            'categories': encode(self.categories),
+            'malls': encode(self.malls),
+        }
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_search_index(products_path=PRODUCTS_PATH):
+    """Index a catalog file in one streaming pass"""
+    builder = SearchIndexBuilder()
+    for product in iter_products(products_path):
+        builder.add(product)
+    return builder.build(source=file_digest(products_path))
+
+
+def write_search_index(index, path=SEARCH_INDEX_PATH):
+    """Write the index compactly; it is read by the app, not by people"""
+    with atomic_open(path) as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def search(index, products, query):
+    """Positions of products matching query, as /api/products would find them.
+
+    Used to check an index against the catalog it was built from.
+    """
+    query = query.lower()
+    # Every product containing query contains each of its grams
+    grams = text_grams(query)
+    if grams:
+        candidates = None
+        for gram in sorted(grams, key=lambda gram: len(index['grams'].get(gram, ()))):
+            positions = set(decode_postings(index['grams'].get(gram, ())))
+            candidates = positions if candidates is None else candidates & positions
+            if not candidates:
+                return []
+    else:
+        candidates = range(len(products))
+    return [
+        position for position in sorted(candidates)
+        if any(query in text.lower() for text in searchable_texts(products[position]))
+    ]
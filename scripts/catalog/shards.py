@@ -0,0 +1,204 @@
+"""Paginated, precompressed static catalog shards for the product lists.
+
+``build_shards`` splits the catalog into the lists the site shows: one per
+categoryMajor, categoryMajor/Mid and categoryMajor/Mid/Minor, one per flat
+category and one per mall (the two lists /api/products filters by) and one
+per region. Each list is cut into pages of ``PAGE_SIZE`` products, and every
+page is written as compact JSON next to a gzip copy and, when the optional
+``brotli`` package is installed, a brotli copy. The pages land in
+public/catalog, which ``next build`` ships as static files, and
+/api/products hands them out as they are for a paginated request on one
+category or mall, with no parsing or filtering per request.
+
+Every record is encoded once and pages are joined from the encoded text.
+Shard files are named by a hash of their list's key, so Hangul names never
+end up in URLs, and ``manifest.json`` maps the names to their shards and
+counts. Like the search index, the manifest records the digest of the
+products.json it was built from, and the API ignores shards of any other
+catalog. A page whose JSON has not changed is not rewritten or
+recompressed, and pages that no longer exist are deleted.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from catalog.counts import UNKNOWN_REGION, RegionResolver, product_hierarchy
+from catalog.products_io import DATA_DIR, atomic_open, iter_products
+from catalog.report import mall_name
+from catalog.search_index import file_digest, product_mall_id
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+REPO_ROOT = os.path.normpath(os.path.join(DATA_DIR, '..', '..'))
+SHARDS_DIR = os.path.join(REPO_ROOT, 'public', 'catalog')
+
+PAGE_SIZE = 60
+SHARD_VERSION = 2
+
+
+def shard_key(kind, *names):
+    """File-system safe name of a list"""
+    digest = hashlib.sha1(json.dumps(names, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return f"{kind}-{digest[:12]}"
+
+
+def compress_gzip(data):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+COMPRESSORS = [('.gz', compress_gzip)] + ([('.br', compress_brotli)] if brotli else [])
+
+
+class ShardWriter:
+    """Write shard pages into a directory, skipping pages that are unchanged"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.written = set()
+        self.changed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.bytes = {'.json': 0, **{suffix: 0 for suffix, _ in COMPRESSORS}}
+
+    def write(self, relative_path, data):
+        path = os.path.join(self.directory, relative_path)
+        self.written.add(path)
+        self.bytes['.json'] += len(data)
+        outputs = [(path, data)]
+        unchanged = os.path.exists(path) and all(os.path.exists(path + suffix) for suffix, _ in COMPRESSORS)
+        if unchanged:
+            with open(path, 'rb') as f:
+                unchanged = f.read() == data
+        for suffix, compress in COMPRESSORS:
+            self.written.add(path + suffix)
+            if unchanged:
+                self.bytes[suffix] += os.path.getsize(path + suffix)
+            else:
+                compressed = compress(data)
+                self.bytes[suffix] += len(compressed)
+                outputs.append((path + suffix, compressed))
+        if unchanged:
+            self.unchanged += 1
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for output_path, output in outputs:
+            with atomic_open(output_path, 'wb') as f:
+                f.write(output)
+        self.changed += 1
+
+    def remove_stale(self):
+        """Delete the shard files that this run did not write"""
+        for root, _, files in os.walk(self.directory, topdown=False):
+            for name in files:
+                path = os.path.join(root, name)
+                if path not in self.written:
+                    os.remove(path)
+                    self.removed += 1
+            if root != self.directory and not os.listdir(root):
+                os.rmdir(root)
+
+
+def write_list(writer, key, positions, encoded, page_size):
+    """Write one list's pages; return its manifest entry"""
+    pages = max(1, -(-len(positions) // page_size))
+    for page in range(pages):
+        chunk = positions[page * page_size:(page + 1) * page_size]
+        body = (
+            f'{{"key":"{key}","page":{page + 1},"pages":{pages},"total":{len(positions)},'
+            f'"products":[{",".join(encoded[position] for position in chunk)}]}}'
+        )
+        writer.write(os.path.join(key, f"page-{page + 1}.json"), body.encode('utf-8'))
+    return {'key': key, 'count': len(positions), 'pages': pages}
+
+
+def build_shards(products_path, directory=SHARDS_DIR, page_size=PAGE_SIZE, resolver=None):
+    """Write every list of the catalog as shard pages; return the manifest and writer"""
+    resolver = resolver or RegionResolver.from_sources()
+    encoded = []
+    categories = {}
+    flat_categories = {}
+    malls = {}
+    regions = {}
+    for product in iter_products(products_path):
+        # The products API never lists commented-out products
+        if product.get('_commented'):
+            continue
+        position = len(encoded)
+        encoded.append(json.dumps(product, ensure_ascii=False, separators=(',', ':')))
+
+        major, mid, minor = product_hierarchy(product)
+        major_entry = categories.setdefault(major, ([], {}))
+        major_entry[0].append(position)
+        mid_entry = major_entry[1].setdefault(mid, ([], {}))
+        mid_entry[0].append(position)
+        mid_entry[1].setdefault(minor, []).append(position)
+
+        category = product.get('category')
+        if isinstance(category, str) and category:
+            flat_categories.setdefault(category, []).append(position)
+
+        # Keyed by mall id as /api/products?mallId= matches it, else by name
+        mall_id = product_mall_id(product)
+        mall = mall_id or mall_name(product)
+        if isinstance(mall, str):
+            malls.setdefault(mall, (mall_name(product), mall_id, []))[2].append(position)
+        regions.setdefault(resolver.resolve(product), []).append(position)
+
+    writer = ShardWriter(directory)
+    category_entries = {}
+    for major, (major_positions, mids) in sorted(categories.items()):
+        entry = write_list(writer, shard_key('category', major), major_positions, encoded, page_size)
+        entry['mids'] = {}
+        for mid, (mid_positions, minors) in sorted(mids.items()):
+            mid_entry = write_list(writer, shard_key('category', major, mid), mid_positions, encoded, page_size)
+            mid_entry['minors'] = {
+                minor: write_list(writer, shard_key('category', major, mid, minor), positions, encoded, page_size)
+                for minor, positions in sorted(minors.items())
+            }
+            entry['mids'][mid] = mid_entry
+        category_entries[major] = entry
+
+    flat_entries = {
+        category: write_list(writer, shard_key('flat', category), positions, encoded, page_size)
+        for category, positions in sorted(flat_categories.items())
+    }
+
+    mall_entries = {}
+    for mall, (name, mall_id, positions) in sorted(malls.items()):
+        mall_entries[mall] = {
+            'name': name,
+            'mallId': mall_id or None,
+            **write_list(writer, shard_key('mall', mall), positions, encoded, page_size),
+        }
+
+    region_entries = {}
+    for region_id, positions in sorted(regions.items()):
+        region_entries[region_id] = {
+            'name': resolver.names.get(region_id),
+            **write_list(writer, shard_key('region', region_id), positions, encoded, page_size),
+        }
+
+    manifest = {
+        'version': SHARD_VERSION,
+        'source': file_digest(products_path),
+        'pageSize': page_size,
+        'total': len(encoded),
+        'encodings': ['gzip'] + (['br'] if brotli else []),
+        'categories': category_entries,
+        'flatCategories': flat_entries,
+        'malls': mall_entries,
+        'regions': region_entries,
+    }
+    writer.write('manifest.json', json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    writer.remove_stale()
+    return manifest, writer
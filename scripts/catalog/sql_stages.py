@@ -0,0 +1,168 @@
+"""The category stages of ``catalog.stages`` as SQL over a ``CatalogDB``.
+
+Each stage selects the rows it applies to through the indexed generated
+columns and rewrites only those records, with json_set, so a run over the
+database touches the rows that change and nothing else. Stages that need a
+classifier read their candidate rows with an indexed query, classify them in
+Python and update the ones whose category changed.
+
+Every stage returns (changes, outcomes) and leaves the records exactly as the
+Python stage of the same name would, including where new keys go, so
+exporting after ``run_sql_stages`` gives the same products.json as
+run-category-pipeline.py.
+"""
+import json
+from collections import Counter
+from contextlib import nullcontext
+
+from catalog.catalog_db import compact_record
+from catalog.hierarchy import HIERARCHY_INDEX, UNCLASSIFIED
+from catalog.rules import JEONCHE_CLASSIFIER, MISC_CLASSIFIER, MISSING_CLASSIFIER, POPULAR_CLASSIFIER
+from catalog.stages import AGRICULTURAL_MOVES, DEFAULT_STAGES, RICE_KEYWORDS, annotate_unit_price
+
+SQL_STAGES = {}
+
+
+def sql_stage(name):
+    """Register the SQL version of the stage called name"""
+    def decorator(func):
+        SQL_STAGES[name] = func
+        return func
+    return decorator
+
+
+def set_categories(connection, rows, classifier, keep=None):
+    """Classify (pos, record) rows and set each category, unless it is ``keep``"""
+    outcomes = Counter()
+    updates = []
+    for pos, text in rows:
+        category = classifier.classify(json.loads(text))
+        if category != keep:
+            updates.append((category, pos))
+            outcomes[category] += 1
+    connection.executemany("UPDATE products SET record = json_set(record, '$.category', ?) WHERE pos = ?", updates)
+    return len(updates), outcomes
+
+
+@sql_stage('fix-agricultural')
+def fix_agricultural(connection):
+    outcomes = Counter()
+    for old, new in AGRICULTURAL_MOVES.items():
+        count = connection.execute(
+            "UPDATE products SET record = json_set(record, '$.category', ?) WHERE category = ?", (new, old)
+        ).rowcount
+        if count:
+            outcomes[new] += count
+    return sum(outcomes.values()), outcomes
+
+
+@sql_stage('fix-missing')
+def fix_missing(connection):
+    # category IS NULL: no category key, or a null one
+    rows = connection.execute('SELECT pos, record FROM products WHERE category IS NULL').fetchall()
+    return set_categories(connection, rows, MISSING_CLASSIFIER)
+
+
+@sql_stage('move-rice')
+def move_rice(connection):
+    # Keywords of one or two characters are too short for the trigram index
+    matches = ' OR '.join(['instr(name, ?) OR instr(description, ?)'] * len(RICE_KEYWORDS))
+    params = [keyword for keyword in RICE_KEYWORDS for _ in range(2)]
+    count = connection.execute(
+        f"UPDATE products SET record = json_set(record, '$.category', '쌀/곡물류') "
+        f"WHERE category IS NOT '쌀/곡물류' AND ({matches})",
+        params,
+    ).rowcount
+    return count, Counter({'쌀/곡물류': count} if count else {})
+
+
+@sql_stage('reclassify-jeonche')
+def reclassify_jeonche(connection):
+    rows = connection.execute("SELECT pos, record FROM products WHERE category = '전체상품'").fetchall()
+    return set_categories(connection, rows, JEONCHE_CLASSIFIER)
+
+
+@sql_stage('reclassify-popular')
+def reclassify_popular(connection):
+    rows = connection.execute("SELECT pos, record FROM products WHERE category = '인기상품'").fetchall()
+    return set_categories(connection, rows, POPULAR_CLASSIFIER)
+
+
+@sql_stage('reclassify-misc')
+def reclassify_misc(connection):
+    rows = connection.execute("SELECT pos, record FROM products WHERE category = '기타'").fetchall()
+    return set_categories(connection, rows, MISC_CLASSIFIER, keep='기타')
+
+
+@sql_stage('hierarchy')
+def annotate_hierarchy(connection):
+    connection.execute('CREATE TEMP TABLE IF NOT EXISTS hierarchy (category TEXT PRIMARY KEY, major, mid, minor)')
+    connection.execute('DELETE FROM temp.hierarchy')
+    connection.executemany(
+        'INSERT INTO temp.hierarchy VALUES (?, ?, ?, ?)',
+        [(category, *leaf) for category, leaf in HIERARCHY_INDEX.items()],
+    )
+    # A product without a category key counts as 기타, as in the Python stage
+    changed = connection.execute(
+        """
+        SELECT pos, original, coalesce(h.major, ?), coalesce(h.mid, ?), coalesce(h.minor, ?)
+        FROM (
+            SELECT pos, record, category_major, category_mid, category_minor,
+                   CASE WHEN json_type(record, '$.category') IS NULL THEN '기타' ELSE category END AS original
+            FROM products
+        ) AS p LEFT JOIN temp.hierarchy AS h ON h.category = p.original
+        WHERE category_major IS NOT coalesce(h.major, ?) OR category_mid IS NOT coalesce(h.mid, ?)
+           OR category_minor IS NOT coalesce(h.minor, ?)
+           OR json_extract(record, '$.categoryOriginal') IS NOT original
+           OR json_type(record, '$.categoryOriginal') IS NULL
+        """,
+        UNCLASSIFIED * 2,
+    ).fetchall()
+    connection.executemany(
+        "UPDATE products SET record = json_set(record, '$.categoryMajor', ?, '$.categoryMid', ?, "
+        "'$.categoryMinor', ?, '$.categoryOriginal', ?) WHERE pos = ?",
+        [(major, mid, minor, original, pos) for pos, original, major, mid, minor in changed],
+    )
+    outcomes = Counter(f"{major}/{mid}/{minor}" for _, _, major, mid, minor in changed)
+    return len(changed), outcomes
+
+
+@sql_stage('unit-price')
+def annotate_unit_prices(connection):
+    # Only a name or description with a digit can hold a pack size; other rows
+    # change only if they still carry the fields
+    rows = connection.execute(
+        "SELECT pos, record FROM products WHERE name GLOB '*[0-9]*' OR description GLOB '*[0-9]*' "
+        "OR json_type(record, '$.packSize') IS NOT NULL OR json_type(record, '$.unitPrice') IS NOT NULL"
+    ).fetchall()
+    outcomes = Counter()
+    updates = []
+    for pos, text in rows:
+        product = json.loads(text)
+        outcome = annotate_unit_price(product)
+        if outcome is not None:
+            # The parse runs in Python, so the whole record is written back
+            updates.append((compact_record(product), pos))
+            outcomes[outcome] += 1
+    connection.executemany('UPDATE products SET record = ? WHERE pos = ?', updates)
+    return len(updates), outcomes
+
+
+def run_sql_stages(db, stage_names=None, manifest=None):
+    """Run stages over the database in one transaction; returns [(name, changes, outcomes)].
+
+    Given a ``ClassificationManifest``, classifier stages reuse its cached
+    results, as in ``Pipeline.run``; it is saved afterwards.
+    """
+    stage_names = list(DEFAULT_STAGES if stage_names is None else stage_names)
+    unknown = [name for name in stage_names if name not in SQL_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    results = []
+    with manifest or nullcontext(), db.connection:
+        for name in stage_names:
+            changes, outcomes = SQL_STAGES[name](db.connection)
+            results.append((name, changes, outcomes))
+    if any(changes for _, changes, _ in results):
+        db.mark_dirty()
+    return results
@@ -0,0 +1,147 @@
+"""Per-product category fix-ups, one per maintenance script.
+
+Each stage takes a single product, updates it in place and returns the new
+value when it changed something (None otherwise). Stages only look at the
+product they are given, so any sequence of them can run over the catalog in
+a single pass. ``STAGES`` lists them in the order the scripts are meant to run,
+and ``STAGE_CLASSIFIERS`` the keyword classifier each classifying stage uses.
+``DEFAULT_STAGES`` are the ones a pipeline runs when none are named: every
+stage but unit-price. That stage is not a category fix-up. It stores the
+pack size and unit price parsed from each product name (see
+``catalog.unit_price``), which touches most of the catalog, so it only runs
+when asked for.
+"""
+from catalog.hierarchy import find_category_hierarchy
+from catalog.rules import JEONCHE_CLASSIFIER, MISC_CLASSIFIER, MISSING_CLASSIFIER, POPULAR_CLASSIFIER
+from catalog.unit_price import UNIT_PRICE_FIELDS, unit_price_fields
+
+STAGES = {}
+STAGE_CLASSIFIERS = {}
+DEFAULT_STAGES = []
+
+# Old 농산물/* sub-categories and where their products belong
+AGRICULTURAL_MOVES = {
+    '농산물/기름': '조미료',
+    '농산물/더덕': '농산물',
+    '농산물/축산': '축산물',
+}
+
+RICE_KEYWORDS = [
+    '쌀', '찹쌀', '현미', '백미', '흑미', '적미', '오대미', '햅쌀',
+    '화순쌀', '강진쌀', '공주쌀', '진천쌀', '양주골쌀', '생거진천쌀'
+]
+
+
+def stage(name, classifier=None, default=True):
+    """Register a stage function under name, and the classifier it decides with"""
+    def decorator(func):
+        STAGES[name] = func
+        if default:
+            DEFAULT_STAGES.append(name)
+        if classifier is not None:
+            STAGE_CLASSIFIERS[name] = classifier
+        return func
+    return decorator
+
+
+@stage('fix-agricultural')
+def fix_agricultural(product):
+    """Move oil, 더덕 and egg products out of the old 농산물/* categories"""
+    new_category = AGRICULTURAL_MOVES.get(product.get('category', ''))
+    if new_category:
+        product['category'] = new_category
+    return new_category
+
+
+@stage('fix-missing', MISSING_CLASSIFIER)
+def fix_missing(product):
+    """Classify products that have no category at all"""
+    if 'category' not in product or product.get('category') is None:
+        product['category'] = MISSING_CLASSIFIER.classify(product)
+        return product['category']
+    return None
+
+
+@stage('move-rice')
+def move_rice(product):
+    """Move products naming a kind of rice into 쌀/곡물류"""
+    if product.get('category') == '쌀/곡물류':
+        return None
+
+    name = product.get('name', '')
+    description = product.get('description', '')
+    for keyword in RICE_KEYWORDS:
+        if keyword in name or keyword in description:
+            product['category'] = '쌀/곡물류'
+            return product['category']
+    return None
+
+
+@stage('reclassify-jeonche', JEONCHE_CLASSIFIER)
+def reclassify_jeonche(product):
+    """Reclassify products filed under the mall-level 전체상품 category"""
+    if product.get('category') == '전체상품':
+        product['category'] = JEONCHE_CLASSIFIER.classify(product)
+        return product['category']
+    return None
+
+
+@stage('reclassify-popular', POPULAR_CLASSIFIER)
+def reclassify_popular(product):
+    """Reclassify products filed under the mall-level 인기상품 category"""
+    if product.get('category') == '인기상품':
+        product['category'] = POPULAR_CLASSIFIER.classify(product)
+        return product['category']
+    return None
+
+
+@stage('reclassify-misc', MISC_CLASSIFIER)
+def reclassify_misc(product):
+    """Move 기타 products into a real category when the match is strong"""
+    if product.get('category') == '기타':
+        new_category = MISC_CLASSIFIER.classify(product)
+        if new_category != '기타':
+            product['category'] = new_category
+            return new_category
+    return None
+
+
+@stage('hierarchy')
+def annotate_hierarchy(product):
+    """Set categoryMajor/Mid/Minor/Original from the flat category"""
+    current_category = product.get('category', '기타')
+    major, mid, minor = find_category_hierarchy(current_category)
+
+    changed = (
+        product.get('categoryMajor') != major
+        or product.get('categoryMid') != mid
+        or product.get('categoryMinor') != minor
+        or product.get('categoryOriginal') != current_category
+    )
+
+    # Add new hierarchical fields
+    product['categoryMajor'] = major
+    product['categoryMid'] = mid
+    product['categoryMinor'] = minor
+    # Keep original category for now
+    product['categoryOriginal'] = current_category
+
+    return f"{major}/{mid}/{minor}" if changed else None
+
+
+@stage('unit-price', default=False)
+def annotate_unit_price(product):
+    """Set packSize, packUnit and unitPrice from the pack size in the name"""
+    fields = unit_price_fields(product)
+    changed = False
+    for key in UNIT_PRICE_FIELDS:
+        if key in fields:
+            if key not in product or product[key] != fields[key]:
+                product[key] = fields[key]
+                changed = True
+        elif key in product:
+            del product[key]
+            changed = True
+    if not changed:
+        return None
+    return fields.get('packUnit', 'none')
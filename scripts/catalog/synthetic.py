@@ -0,0 +1,110 @@
+"""Synthetic Korean product catalogs drawn from the real catalog's distributions.
+
+``CatalogModel`` samples the real data once: product records (for their key
+layout, mall, region and category fields), the words of real product names,
+real tags, prices, the category keywords in category-mapping.json and the
+tags in tag-mapping.json. ``generate`` then yields any number of products that
+look like the real ones to the classifiers: names mix real name words with
+category keywords, tags mix real and mapped tags, and prices keep their real
+int or "N원" string form. The same seed always yields the same catalog.
+"""
+import json
+import os
+import random
+import re
+
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, ProductWriter, iter_products
+
+CATEGORY_MAPPING_PATH = os.path.join(DATA_DIR, 'category-mapping.json')
+TAG_MAPPING_PATH = os.path.join(DATA_DIR, 'tag-mapping.json')
+
+WEIGHTS = ['100g', '300g', '500g', '1kg', '2kg', '3kg', '5kg', '10kg', '500ml', '1L', '1박스', '10개입', '선물세트']
+WORD = re.compile(r'[가-힣A-Za-z0-9]+')
+
+
+class CatalogModel:
+    """Distributions sampled from the real catalog and keyword mappings"""
+
+    def __init__(self, products, category_mapping, tag_mapping):
+        self.templates = []
+        self.name_words = []
+        self.tags = []
+        self.prices = []
+        for product in products:
+            self.templates.append(product)
+            name = product.get('name') or product.get('title') or ''
+            self.name_words.extend(WORD.findall(name))
+            self.tags.extend(tag for tag in product.get('tags') or [] if isinstance(tag, str))
+            if 'price' in product:
+                self.prices.append(product['price'])
+        if not self.templates:
+            raise ValueError('Cannot model an empty catalog')
+
+        self.keywords = [
+            keyword
+            for category in category_mapping.values()
+            for subcategory in category.get('subcategories', {}).values()
+            for keyword in subcategory.get('keywords', [])
+        ]
+        self.tags.extend(tag_mapping.get('tagToCategoryMapping', {}))
+        self.tags.extend(tag_mapping.get('recommendedNewTags', []))
+
+    @classmethod
+    def from_sources(cls, products_path=PRODUCTS_PATH, category_mapping_path=CATEGORY_MAPPING_PATH,
+                     tag_mapping_path=TAG_MAPPING_PATH):
+        """Build the model from the catalog and mapping files"""
+        with open(category_mapping_path, 'r', encoding='utf-8') as f:
+            category_mapping = json.load(f)
+        with open(tag_mapping_path, 'r', encoding='utf-8') as f:
+            tag_mapping = json.load(f)
+        return cls(iter_products(products_path), category_mapping, tag_mapping)
+
+    def _name(self, rng):
+        words = rng.sample(self.name_words, rng.randint(1, 3)) if self.name_words else []
+        if self.keywords and rng.random() < 0.7:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(self.keywords))
+        if rng.random() < 0.6:
+            words.append(rng.choice(WEIGHTS))
+        return ' '.join(words)
+
+    def _price(self, rng):
+        price = rng.choice(self.prices) if self.prices else 10000
+        if type(price) is int:
+            return max(0, int(round(price * rng.uniform(0.8, 1.2), -2)))
+        return f"{rng.randrange(10, 1000) * 100:,}원"
+
+    def product(self, rng, index):
+        """One synthetic product modelled on a random real one"""
+        template = rng.choice(self.templates)
+        name = self._name(rng)
+        mall = template.get('mallId') or 'synthetic'
+        generated = {
+            'id': f"{mall}-{index}",
+            'name': name,
+            'title': name,
+            'price': self._price(rng),
+            'tags': rng.sample(self.tags, min(len(self.tags), rng.randint(2, 6))),
+            'description': f"{name} {rng.choice(self.keywords)}" if self.keywords else name,
+        }
+
+        product = {}
+        for key, value in template.items():
+            product[key] = generated.get(key, value)
+        if 'name' not in product and 'title' not in product:
+            product['name'] = name
+        return product
+
+    def generate(self, count, seed=0):
+        """Yield count synthetic products"""
+        rng = random.Random(seed)
+        for index in range(count):
+            yield self.product(rng, index)
+
+
+def write_synthetic_catalog(path, count, seed=0, model=None):
+    """Write a synthetic catalog of count products to path; return the count"""
+    model = model or CatalogModel.from_sources()
+    with ProductWriter(path) as writer:
+        for product in model.generate(count, seed):
+            writer.write(product)
+    return writer.count
@@ -0,0 +1,369 @@
+"""Sparse tag co-occurrence counts for regenerating the tag mapping files.
+
+tag-mapping.json says which category-mapping.json categories a product tag
+points to, and tag-analysis.json summarizes the catalog's tags; both were
+kept up to date by hand. ``TagCooccurrence`` counts, over the tagged
+products of the catalog:
+
+* how many products carry each tag, and how many fall in each category of
+  the category-mapping.json classifier (the port of classifyProduct, which
+  gives the category ids tag-mapping.json uses);
+* a sparse tag x category matrix: products with the tag in the category;
+* a sparse tag x tag matrix: products with both tags, each pair stored once
+  under its alphabetically first tag.
+
+Both matrices are dicts of Counters holding only the non-zero cells, filled
+in one pass with one classification per distinct product. A product's tags
+are counted once each; tags that are themselves category ids, which the sync
+appends when it classifies a product, are left out.
+
+The counts are saved with, for every distinct content hash of the fields the
+classifier and the counts read (as in ``catalog.manifest``), the product's
+tags, category and number of copies. ``update`` then applies only the
+difference between that and a new catalog: products that disappeared or
+changed are subtracted, new or changed ones classified and added, so
+regenerating the mapping files after a scrape costs a read of the catalog
+plus the changed products. A change to category-mapping.json rebuilds the
+counts from scratch.
+
+A tag suggests a category when enough products carry both and the tag makes
+the category markedly more likely than it is overall:
+
+  lift = P(category | tag) / P(category) = n(tag, category) * N / (n(tag) * n(category))
+  PMI = log2(lift)
+"""
+import json
+import math
+import os
+from collections import Counter, defaultdict
+
+from catalog.manifest import content_hash
+from catalog.products_io import DATA_DIR, atomic_open, iter_products
+from catalog.rules import MAPPING_CLASSIFIER
+
+TAG_MAPPING_PATH = os.path.join(DATA_DIR, 'tag-mapping.json')
+TAG_ANALYSIS_PATH = os.path.join(DATA_DIR, 'tag-analysis.json')
+COOCCURRENCE_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', 'output', 'tag-cooccurrence.json')
+)
+COOCCURRENCE_FORMAT = 1
+
+# Defaults for suggesting a category from a tag
+MIN_COUNT = 5
+MIN_LIFT = 2.0
+MIN_CONFIDENCE = 0.3
+MAX_CATEGORIES = 2
+# Defaults for related tags
+MIN_PAIR_COUNT = 3
+RELATED_TAGS = 5
+
+
+def decrement(counter, key, count):
+    """Subtract count from counter[key], dropping the key at zero to keep the matrix sparse"""
+    remaining = counter[key] - count
+    if remaining:
+        counter[key] = remaining
+    else:
+        del counter[key]
+
+
+class UpdateResult:
+    def __init__(self):
+        self.total = 0
+        self.added = 0
+        self.removed = 0
+        self.classified = 0
+        self.rebuilt = False
+
+
+class TagCooccurrence:
+    """Tag, category and tag-pair counts over a catalog's tagged products"""
+
+    def __init__(self, classifier=MAPPING_CLASSIFIER):
+        self.classifier = classifier
+        self.version = classifier.version
+        self.category_ids = frozenset(
+            category_id for category_id, _, _, _ in classifier.subcategories
+        )
+        self.products = 0
+        self.tag_counts = Counter()
+        self.category_counts = Counter()
+        self.tag_categories = defaultdict(Counter)
+        self.tag_pairs = defaultdict(Counter)
+        # content hash -> [copies, tags, category]
+        self.entries = {}
+
+    def product_tags(self, product):
+        """The distinct tags counted for a product, sorted"""
+        return sorted({
+            tag.strip() for tag in product.get('tags') or ()
+            if isinstance(tag, str) and tag.strip() and tag.strip() not in self.category_ids
+        })
+
+    def classify(self, product):
+        match = self.classifier.classify(product)
+        return match['mainCategory'] if match else None
+
+    def _count(self, tags, category, copies):
+        """Add copies of one product's contribution; negative copies subtract it"""
+        self.products += copies
+        if category is not None:
+            self.category_counts[category] += copies
+        for i, tag in enumerate(tags):
+            self.tag_counts[tag] += copies
+            if category is not None:
+                self.tag_categories[tag][category] += copies
+            if i + 1 < len(tags):
+                pairs = self.tag_pairs[tag]
+                for other in tags[i + 1:]:
+                    pairs[other] += copies
+
+    def _uncount(self, tags, category, copies):
+        self.products -= copies
+        if category is not None:
+            decrement(self.category_counts, category, copies)
+        for i, tag in enumerate(tags):
+            decrement(self.tag_counts, tag, copies)
+            if category is not None:
+                decrement(self.tag_categories[tag], category, copies)
+                if not self.tag_categories[tag]:
+                    del self.tag_categories[tag]
+            if i + 1 < len(tags):
+                pairs = self.tag_pairs[tag]
+                for other in tags[i + 1:]:
+                    decrement(pairs, other, copies)
+                if not pairs:
+                    del self.tag_pairs[tag]
+
+    def _scan(self, products):
+        """Count the copies of each distinct tagged product; returns ({hash: copies}, {hash: product}, total)"""
+        copies = Counter()
+        first = {}
+        total = 0
+        for product in products:
+            total += 1
+            if not self.product_tags(product):
+                continue
+            digest = content_hash(product)
+            copies[digest] += 1
+            first.setdefault(digest, product)
+        return copies, first, total
+
+    def update(self, products):
+        """Bring the counts in line with products, counting only what changed"""
+        result = UpdateResult()
+        copies, first, result.total = self._scan(products)
+
+        for digest, entry in list(self.entries.items()):
+            count, tags, category = entry
+            difference = copies.get(digest, 0) - count
+            if difference < 0:
+                self._uncount(tags, category, -difference)
+                result.removed -= difference
+            elif difference > 0:
+                self._count(tags, category, difference)
+                result.added += difference
+            if difference:
+                if count + difference:
+                    entry[0] = count + difference
+                else:
+                    del self.entries[digest]
+
+        for digest, count in copies.items():
+            if digest in self.entries:
+                continue
+            product = first[digest]
+            tags = self.product_tags(product)
+            category = self.classify(product)
+            result.classified += 1
+            self.entries[digest] = [count, tags, category]
+            self._count(tags, category, count)
+            result.added += count
+        return result
+
+    @classmethod
+    def build(cls, products, classifier=MAPPING_CLASSIFIER):
+        """Count a catalog from scratch"""
+        counts = cls(classifier)
+        counts.update(products)
+        return counts
+
+    @classmethod
+    def load(cls, path=COOCCURRENCE_PATH, classifier=MAPPING_CLASSIFIER):
+        """The saved counts, or empty ones if there are none or the classifier changed"""
+        counts = cls(classifier)
+        if not path or not os.path.exists(path):
+            return counts
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != COOCCURRENCE_FORMAT or data.get('classifier') != counts.version:
+            return counts
+        counts.products = data['products']
+        counts.tag_counts = Counter(data['tagCounts'])
+        counts.category_counts = Counter(data['categoryCounts'])
+        counts.tag_categories = defaultdict(Counter, {
+            tag: Counter(row) for tag, row in data['tagCategories'].items()
+        })
+        counts.tag_pairs = defaultdict(Counter, {tag: Counter(row) for tag, row in data['tagPairs'].items()})
+        counts.entries = data['entries']
+        return counts
+
+    def save(self, path=COOCCURRENCE_PATH):
+        """Write the counts atomically"""
+        data = {
+            'format': COOCCURRENCE_FORMAT,
+            'classifier': self.version,
+            'products': self.products,
+            'tagCounts': self.tag_counts,
+            'categoryCounts': self.category_counts,
+            'tagCategories': self.tag_categories,
+            'tagPairs': self.tag_pairs,
+            'entries': self.entries,
+        }
+        with atomic_open(path) as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+    def matrices(self):
+        """The counts as plain sorted dicts, for comparing two instances"""
+        return {
+            'products': self.products,
+            'tagCounts': dict(sorted(self.tag_counts.items())),
+            'categoryCounts': dict(sorted(self.category_counts.items())),
+            'tagCategories': {tag: dict(sorted(row.items())) for tag, row in sorted(self.tag_categories.items())},
+            'tagPairs': {tag: dict(sorted(row.items())) for tag, row in sorted(self.tag_pairs.items())},
+        }
+
+    def lift(self, joint, first, second):
+        if not joint:
+            return 0.0
+        return joint * self.products / (first * second)
+
+    def category_scores(self, tag):
+        """[(category, products, confidence, lift)] for a tag, best first"""
+        total = self.tag_counts.get(tag, 0)
+        scores = [
+            (category, joint, joint / total, self.lift(joint, total, self.category_counts[category]))
+            for category, joint in self.tag_categories.get(tag, {}).items()
+        ]
+        scores.sort(key=lambda score: (-score[3], -score[1], score[0]))
+        return scores
+
+    def suggest_mappings(self, min_count=MIN_COUNT, min_lift=MIN_LIFT, min_confidence=MIN_CONFIDENCE,
+                         max_categories=MAX_CATEGORIES):
+        """{tag: [(category, products, confidence, lift)]} for tags that point to a category"""
+        suggestions = {}
+        for tag in sorted(self.tag_categories, key=lambda tag: (-self.tag_counts[tag], tag)):
+            scores = [
+                score for score in self.category_scores(tag)
+                if score[1] >= min_count and score[2] >= min_confidence and score[3] >= min_lift
+            ]
+            if scores:
+                suggestions[tag] = scores[:max_categories]
+        return suggestions
+
+    def related_tags(self, min_count=MIN_PAIR_COUNT, limit=RELATED_TAGS, min_lift=MIN_LIFT):
+        """{tag: [(other tag, products, lift)]}: the tags most over-represented alongside each tag"""
+        related = defaultdict(list)
+        for tag, row in self.tag_pairs.items():
+            for other, joint in row.items():
+                if joint < min_count:
+                    continue
+                lift = self.lift(joint, self.tag_counts[tag], self.tag_counts[other])
+                if lift >= min_lift:
+                    related[tag].append((other, joint, lift))
+                    related[other].append((tag, joint, lift))
+        return {
+            tag: sorted(pairs, key=lambda pair: (-pair[2], -pair[1], pair[0]))[:limit]
+            for tag, pairs in sorted(related.items(), key=lambda item: (-self.tag_counts[item[0]], item[0]))
+        }
+
+
+def score_document(category, products, confidence, lift):
+    return {
+        'category': category,
+        'products': products,
+        'confidence': round(confidence, 3),
+        'lift': round(lift, 3),
+        'pmi': round(math.log2(lift), 3),
+    }
+
+
+def read_document(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_document(text, path):
+    """Write JSON text atomically, keeping the CRLF line endings of the file it replaces"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if b'\r\n' in f.read(4096):
+                text = text.replace('\n', '\r\n')
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+def format_tag_mapping(document):
+    """tag-mapping.json text: indented JSON with each tag's category list on one line"""
+    mapping = document.get('tagToCategoryMapping', {})
+    placeholders = {tag: f"\0{i}" for i, tag in enumerate(mapping)}
+    text = json.dumps(dict(document, tagToCategoryMapping=placeholders), ensure_ascii=False, indent=2)
+    for i, categories in enumerate(mapping.values()):
+        text = text.replace(f'"\\u0000{i}"', json.dumps(categories, ensure_ascii=False), 1)
+    return text
+
+
+def regenerate_tag_mapping(document, suggestions, rederive=False):
+    """tag-mapping.json with suggested categories for unmapped tags; returns (document, added, changed).
+
+    Existing entries are kept, including the empty lists that mark a tag as
+    pointing nowhere, unless ``rederive``, which replaces every entry the
+    counts give a suggestion for.
+    """
+    mapping = dict(document.get('tagToCategoryMapping', {}))
+    added = []
+    changed = []
+    for tag, scores in suggestions.items():
+        categories = [score[0] for score in scores]
+        if tag not in mapping:
+            mapping[tag] = categories
+            added.append(tag)
+        elif rederive and mapping[tag] != categories:
+            mapping[tag] = categories
+            changed.append(tag)
+    return dict(document, tagToCategoryMapping=mapping), added, changed
+
+
+def regenerate_tag_analysis(document, counts, suggestions, mapping, related):
+    """tag-analysis.json with the frequencies, suggestions and related tags of the counts.
+
+    The hand-made tag groups and recommended new tags are kept.
+    """
+    document = dict(document)
+    document['uniqueTagsTotal'] = len(counts.tag_counts)
+    document['taggedProducts'] = counts.products
+    document['tagFrequency'] = dict(sorted(counts.tag_counts.items(), key=lambda item: (-item[1], item[0])))
+    recommendations = dict(document.get('recommendations', {}))
+    recommendations['suggestedMappings'] = {
+        tag: [score_document(*score) for score in scores] for tag, scores in suggestions.items()
+    }
+    recommendations['mappingReview'] = {
+        tag: {'mapped': mapping[tag], 'suggested': [score[0] for score in scores]}
+        for tag, scores in suggestions.items()
+        if tag in mapping and mapping[tag] != [score[0] for score in scores]
+    }
+    document['recommendations'] = recommendations
+    document['relatedTags'] = {
+        tag: [{'tag': other, 'products': joint, 'lift': round(lift, 3)} for other, joint, lift in pairs]
+        for tag, pairs in related.items()
+    }
+    return document
+
+
+def load_counts(products_path, path=COOCCURRENCE_PATH, rebuild=False):
+    """The saved counts brought up to date with products_path; returns (counts, UpdateResult)"""
+    counts = TagCooccurrence() if rebuild else TagCooccurrence.load(path)
+    rebuilt = not counts.entries
+    result = counts.update(iter_products(products_path))
+    result.rebuilt = rebuilt
+    return counts, result
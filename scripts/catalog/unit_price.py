@@ -0,0 +1,213 @@
+"""Pack sizes and unit prices parsed from product names, and presorted price indexes.
+
+Names carry the pack size in free text: "생표고버섯 1kg", "다정다감 쌍화차100ml*30",
+"불고기400gX2", "약과750g+정과250g", options such as "900g,2kg,3kg" or
+"(6마리, 10마리)". ``TOKEN`` is one compiled alternation that splits such text
+into quantities (an amount and a unit), multipliers ("x2", "*30"), "+" and
+option separators in a single scan. ``pack_size`` reads them as:
+
+* a quantity, multiplied by a multiplier or a count right after it
+  ("500g x 2", "1kg 2봉");
+* quantities joined by "+" and of the same kind added up;
+* of several options or unrelated quantities, the first by weight or
+  volume, else the first count: the listed price is that of the first option.
+
+Amounts are normalized to kg, L or pieces (개), and ``unit_price`` is the
+price in won per one of those. The opt-in unit-price stage of
+``catalog.stages`` stores them on each product as packSize, packUnit and
+unitPrice.
+
+``build_price_index`` writes, for every flat category and for the whole
+catalog ('all'), the product positions in products.json ordered by price
+and, per pack unit, by unit price, so the site can list products cheapest
+first, or cheapest per kg, without parsing anything per request. It parses
+the names itself, so it does not depend on the stage having run.
+Like the search index it records the digest of the products.json it was
+built from, so a stale index is noticed and ignored.
+"""
+import json
+import os
+import re
+from collections import defaultdict
+
+from catalog.columnar import parse_price
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, atomic_open, iter_products
+from catalog.search_index import file_digest
+
+PRICE_INDEX_PATH = os.path.join(DATA_DIR, 'price-index.json')
+PRICE_INDEX_VERSION = 1
+ALL = 'all'
+UNIT_PRICE_FIELDS = ('packSize', 'packUnit', 'unitPrice')
+
+# unit text -> (pack unit, factor to it); alternatives are tried longest first
+UNITS = {
+    'kg': ('kg', 1), '㎏': ('kg', 1), '킬로그램': ('kg', 1), '킬로': ('kg', 1), '키로': ('kg', 1),
+    'g': ('kg', 0.001), '그램': ('kg', 0.001),
+    'l': ('L', 1), 'ℓ': ('L', 1), '리터': ('L', 1),
+    'ml': ('L', 0.001), '㎖': ('L', 0.001), 'cc': ('L', 0.001),
+}
+COUNT_UNITS = (
+    '개입', '개', '입', '봉지', '봉', '팩', '병', '포기', '포', '마리', '미', '구', '캔', 'ea', '알', '장', '티백', '스틱',
+)
+PACK_UNITS = ('kg', 'L', '개')
+# Korean units that are the start of another word: 6개월, 3구이, 1미터
+NOT_UNIT = {'개': '월', '구': '이', '미': '터'}
+MAX_AMOUNT = {'kg': 1000, 'L': 1000, '개': 10000}
+# Prices outside these are placeholders ("1원") or several option prices run
+# together by a scraper ("56000600001680") and are left out of the indexes
+MIN_PRICE = 100
+MAX_PRICE = 10_000_000
+
+AMOUNT = r'(?:\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)'
+MEASURE_UNIT = '|'.join(sorted(map(re.escape, UNITS), key=len, reverse=True))
+COUNT_UNIT = '|'.join(
+    f"{unit}(?!{NOT_UNIT[unit]})" if unit in NOT_UNIT else unit
+    for unit in sorted(COUNT_UNITS, key=len, reverse=True)
+)
+TOKEN = re.compile(
+    # A unit may be followed by "x2" but not by other letters: 3gap, 2lb
+    rf"(?P<quantity>(?<![\d.]){AMOUNT}\s*(?P<unit>{MEASURE_UNIT}|{COUNT_UNIT})(?![a-wyz]))"
+    rf"|(?P<times>[x×*]\s*(?P<times_count>\d+)(?:\s*(?:{COUNT_UNIT}))?(?![\d.]|\s*(?:{MEASURE_UNIT})))"
+    r"|(?P<plus>\+)"
+    r"|(?P<separator>[,/|]|\s또는\s)"
+)
+
+
+def normalize_number(value):
+    """value rounded to 6 places, as an int when it is whole"""
+    value = round(value, 6)
+    return int(value) if value == int(value) else value
+
+
+def pack_size(text):
+    """(amount, pack unit) of the first pack size in text, or None"""
+    if not text:
+        return None
+    text = text.lower()
+    # [pack unit, amount] per quantity, multiplied and summed as the text says
+    quantities = []
+    last_end = None
+    joined = False
+    for match in TOKEN.finditer(text):
+        kind = match.lastgroup
+        adjacent = last_end is not None and not text[last_end:match.start()].strip()
+        if kind == 'quantity':
+            unit = match.group('unit')
+            pack_unit, factor = UNITS.get(unit, ('개', 1))
+            amount = float(match.group()[:-len(unit)].strip().replace(',', '')) * factor
+            previous = quantities[-1] if quantities else None
+            if joined and previous and previous[0] == pack_unit:
+                previous[1] += amount
+            elif adjacent and previous and pack_unit == '개' and previous[0] != '개':
+                previous[1] *= amount
+            else:
+                quantities.append([pack_unit, amount])
+            last_end = match.end()
+            joined = False
+        elif kind == 'times':
+            if adjacent and quantities:
+                quantities[-1][1] *= int(match.group('times_count'))
+                last_end = match.end()
+        elif kind == 'plus':
+            joined = adjacent
+        else:
+            last_end = None
+            joined = False
+
+    for pack_unit, amount in sorted(quantities, key=lambda quantity: quantity[0] == '개'):
+        if 0 < amount <= MAX_AMOUNT[pack_unit]:
+            return normalize_number(amount), pack_unit
+    return None
+
+
+def product_pack_size(product):
+    """Pack size from the product's name, else its description"""
+    for field in ('name', 'description'):
+        value = product.get(field)
+        size = pack_size(value) if isinstance(value, str) else None
+        if size:
+            return size
+    return None
+
+
+def listed_price(value):
+    """Numeric price of an int or "30,000원" price, None if missing or implausible"""
+    price = parse_price(value)
+    if price is None or not MIN_PRICE <= price <= MAX_PRICE:
+        return None
+    return price
+
+
+def unit_price(price, amount):
+    """Won per pack unit, None without a plausible price"""
+    price = listed_price(price)
+    if price is None:
+        return None
+    return round(price / amount)
+
+
+def unit_price_fields(product):
+    """{'packSize', 'packUnit', 'unitPrice'} for a product, without the ones that do not apply"""
+    size = product_pack_size(product)
+    if size is None:
+        return {}
+    amount, pack_unit = size
+    fields = {'packSize': amount, 'packUnit': pack_unit}
+    price = unit_price(product.get('price'), amount)
+    if price is not None:
+        fields['unitPrice'] = price
+    return fields
+
+
+class PriceIndexBuilder:
+    """Collect (value, position) per list in one pass, then sort each list once"""
+
+    def __init__(self):
+        self.ids = []
+        self.by_price = defaultdict(list)
+        self.by_unit_price = {pack_unit: defaultdict(list) for pack_unit in PACK_UNITS}
+
+    def add(self, product):
+        position = len(self.ids)
+        self.ids.append(product.get('id'))
+        if product.get('_commented'):
+            return
+        lists = (ALL, product['category']) if isinstance(product.get('category'), str) else (ALL,)
+        price = listed_price(product.get('price'))
+        if price is not None:
+            for name in lists:
+                self.by_price[name].append((price, position))
+        fields = unit_price_fields(product)
+        per_unit = self.by_unit_price.get(fields.get('packUnit'))
+        if per_unit is not None and 'unitPrice' in fields:
+            for name in lists:
+                per_unit[name].append((fields['unitPrice'], position))
+
+    @staticmethod
+    def _positions(lists):
+        return {name: [position for _, position in sorted(entries)] for name, entries in sorted(lists.items())}
+
+    def build(self, source=None):
+        return {
+            'version': PRICE_INDEX_VERSION,
+            'source': source,
+            'count': len(self.ids),
+            'ids': self.ids,
+            'byPrice': self._positions(self.by_price),
+            'byUnitPrice': {
+                pack_unit: self._positions(lists) for pack_unit, lists in self.by_unit_price.items() if lists
+            },
+        }
+
+
+def build_price_index(products_path=PRODUCTS_PATH):
+    """Index a catalog in one streaming pass"""
+    builder = PriceIndexBuilder()
+    for product in iter_products(products_path):
+        builder.add(product)
+    return builder.build(source=file_digest(products_path))
+
+
+def write_price_index(index, path=PRICE_INDEX_PATH):
+    with atomic_open(path) as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
@@ -1,70 +1,63 @@
 #!/usr/bin/env python3
+import argparse
 import json
 
+from catalog.backups import BackupStore
+from catalog.products_io import DATA_DIR, PRODUCTS_PATH, write_json
+from catalog.report import catalog_report, uncategorized_trend
+
+REPORT_PATH = f"{DATA_DIR}/category-report.json"
+
+ISSUE_LABELS = [
+    ('missing', 'without category field'),
+    ('empty', 'with empty category'),
+    ('null', 'with null category'),
+    ('whitespace', 'with whitespace-only category'),
+]
+
 def main():
-    # Load products
-    with open('/mnt/c/Users/johndoe/Desktop/e-paldogangsan/src/data/products.json', 'r', encoding='utf-8') as f:
-        products = json.load(f)
-    
-    print(f"Total products: {len(products)}")
-    
-    # Check for products without category field
-    no_category = []
-    empty_category = []
-    null_category = []
-    whitespace_category = []
-    
-    # Count categories
-    category_counts = {}
-    
-    for i, product in enumerate(products):
-        # Check if category field exists
-        if 'category' not in product:
-            no_category.append((i, product.get('id', 'unknown'), product.get('name', 'unknown')))
-        else:
-            category = product['category']
-            
-            # Check for various problematic category values
-            if category is None:
-                null_category.append((i, product.get('id', 'unknown'), product.get('name', 'unknown')))
-            elif category == "":
-                empty_category.append((i, product.get('id', 'unknown'), product.get('name', 'unknown')))
-            elif isinstance(category, str) and category.strip() == "":
-                whitespace_category.append((i, product.get('id', 'unknown'), product.get('name', 'unknown')))
-            else:
-                category_counts[category] = category_counts.get(category, 0) + 1
-    
+    parser = argparse.ArgumentParser(description='Report category problems and statistics for the catalog')
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='JSON or columnar catalog to check')
+    parser.add_argument('--json', nargs='?', const=REPORT_PATH, help='also write the full report as JSON for the admin page')
+    parser.add_argument('--trend', action='store_true', help='include the uncategorized rate of every stored backup')
+    args = parser.parse_args()
+
+    report = catalog_report(args.products)
+    if args.trend:
+        report['trend'] = uncategorized_trend(BackupStore())
+
+    print(f"Total products: {report['total']}")
+
     print(f"\nCategory Issues:")
-    print(f"Products without category field: {len(no_category)}")
-    print(f"Products with empty category: {len(empty_category)}")
-    print(f"Products with null category: {len(null_category)}")
-    print(f"Products with whitespace-only category: {len(whitespace_category)}")
-    
-    if no_category:
-        print(f"\nProducts without category field (first 5):")
-        for i, (idx, pid, name) in enumerate(no_category[:5]):
-            print(f"  {idx}: {pid} - {name}")
-    
-    if empty_category:
-        print(f"\nProducts with empty category (first 5):")
-        for i, (idx, pid, name) in enumerate(empty_category[:5]):
-            print(f"  {idx}: {pid} - {name}")
-    
-    if null_category:
-        print(f"\nProducts with null category (first 5):")
-        for i, (idx, pid, name) in enumerate(null_category[:5]):
-            print(f"  {idx}: {pid} - {name}")
-    
-    if whitespace_category:
-        print(f"\nProducts with whitespace-only category (first 5):")
-        for i, (idx, pid, name) in enumerate(whitespace_category[:5]):
-            print(f"  {idx}: {pid} - {name}")
-    
-    print(f"\nValid categories found: {len(category_counts)}")
+    for issue, label in ISSUE_LABELS:
+        print(f"Products {label}: {report['issues'][issue]['count']}")
+
+    for issue, label in ISSUE_LABELS:
+        samples = report['issues'][issue]['samples']
+        if samples:
+            print(f"\nProducts {label} (first 5):")
+            for sample in samples:
+                print(f"  {sample['index']}: {sample['id']} - {sample['name']}")
+
+    categories = report['categories']
+    print(f"\nValid categories found: {len(categories)}")
     print(f"Top 10 categories by product count:")
-    sorted_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)
-    for category, count in sorted_categories[:10]:
+    for category, count in list(categories.items())[:10]:
         print(f"  {category}: {count} products")
 
+    print(f"\nUncategorized: {report['uncategorized']} ({report['uncategorizedRate']:.1%}), "
+          f"of which {report['issues']['unmapped']['count']} not in the category hierarchy")
+    print(f"Catch-all (기타 or 미분류): {report['catchAll']} ({report['catchAllRate']:.1%}), not counted above")
+    if args.trend:
+        print(f"\nUncategorized and catch-all rates by backup:")
+        for point in report['trend']:
+            created = point['created'] or 'undated'
+            print(f"  {created:<19}  {point['uncategorizedRate']:>6.1%}  {point['catchAllRate']:>6.1%}  "
+                  f"({point['uncategorized']}+{point['catchAll']}/{point['total']})  {point['snapshot']}")
+
+    if args.json:
+        write_json(report, args.json)
+        print(f"\nReport written to {args.json}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
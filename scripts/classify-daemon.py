@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Run the category classifiers as a resident service for the sync path.
+
+  serve [--port 8765 | --socket PATH]       keep the rules loaded and answer requests
+  bench [--batch-size 500] [--products F]   classify a catalog through a running service
+  metrics                                   print a running service's metrics
+
+The service loads the compiled rule set and the category hierarchy once and
+classifies batches of products over localhost HTTP or a Unix socket, one
+round trip per batch (see catalog/classify_service.py for the protocol).
+ProductSyncService.syncMall uses it when CLASSIFIER_URL or CLASSIFIER_SOCKET
+is set, and falls back to classifyProduct when the service is not running.
+Restart the service after changing the rule files.
+"""
+import argparse
+import json
+import signal
+import sys
+import time
+from itertools import islice
+
+from catalog.classify_service import (
+    DEFAULT_PORT, MAX_BATCH, ClassificationServer, ClassificationService, ServiceClient, UnixClassificationServer,
+)
+from catalog.products_io import PRODUCTS_PATH, iter_products
+
+def serve(args):
+    started = time.perf_counter()
+    service = ClassificationService(max_batch=args.max_batch)
+    if args.socket:
+        server = UnixClassificationServer(service, args.socket)
+        where = args.socket
+    else:
+        server = ClassificationServer(service, args.host, args.port)
+        where = f"http://{args.host}:{server.server_address[1]}"
+    print(f"Classifying on {where} (rules {service.fingerprint[:12]}, "
+          f"ready in {time.perf_counter() - started:.2f}s)", flush=True)
+
+    # Stop cleanly on SIGTERM as on Ctrl-C, removing the socket file
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(service.metrics.snapshot(), ensure_ascii=False))
+
+def bench(args, client):
+    products = iter_products(args.products)
+    total = 0
+    started = time.perf_counter()
+    for batch in iter(lambda: list(islice(products, args.batch_size)), []):
+        total += len(client.classify(batch))
+    elapsed = time.perf_counter() - started
+    print(f"Classified {total} products in batches of {args.batch_size} in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} products/s including transfer)")
+    print_metrics(client.metrics())
+
+def print_metrics(metrics):
+    latency = metrics['latencyMs']
+    print(f"Service: {metrics['requests']} requests, {metrics['products']} products, {metrics['errors']} errors, "
+          f"up {metrics['uptimeSeconds']}s")
+    print(f"  {metrics['productsPerSecond']} products/s while classifying, mean batch {metrics['meanBatchSize']}")
+    print(f"  batch latency over the last {latency['window']}: p50 {latency['p50']} ms, p90 {latency['p90']} ms, "
+          f"p99 {latency['p99']} ms, max {latency['max']} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on or connect to')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port')
+    parser.add_argument('--socket', help='Unix socket path, instead of a TCP port')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_cmd = commands.add_parser('serve', help='run the service')
+    serve_cmd.add_argument('--max-batch', type=int, default=MAX_BATCH, help='largest batch accepted')
+
+    bench_cmd = commands.add_parser('bench', help='classify a catalog through the service')
+    bench_cmd.add_argument('--products', default=PRODUCTS_PATH, help='catalog file to send')
+    bench_cmd.add_argument('--batch-size', type=int, default=500, help='products per request')
+
+    commands.add_parser('metrics', help="print the service's metrics")
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args)
+        return
+
+    client = ServiceClient(args.host, args.port, args.socket)
+    try:
+        if args.command == 'bench':
+            bench(args, client)
+        else:
+            print_metrics(client.metrics())
+    except (ConnectionError, FileNotFoundError) as exc:
+        sys.exit(f"No classification service at {args.socket or f'{args.host}:{args.port}'}: {exc}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
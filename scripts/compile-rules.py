@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Compile the classification rule files and refresh the cached matcher.
+
+Sources: src/data/classification-rules.json, category-mapping.json,
+tag-mapping.json and noun-lexicon.json. The scripts recompile automatically
+when a source changes; run this after editing the rules to check them
+(including the lexicon's sample words) and warm the cache.
+"""
+import argparse
+import time
+
+from catalog.compiler import COMPILED_PATH, SOURCE_PATHS, compile_rule_set, load_rule_set, save_rule_set
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=COMPILED_PATH, help='compiled matcher cache')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rule_set = compile_rule_set(SOURCE_PATHS)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    save_rule_set(rule_set, args.output)
+
+    started = time.perf_counter()
+    load_rule_set(SOURCE_PATHS, args.output)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Compiled rule set {rule_set.fingerprint[:12]}")
+    for name, classifier in rule_set.classifiers.items():
+        keywords = len(classifier.automaton.keywords)
+        print(f"  {name:<10} version {classifier.version}  {len(classifier.categories):>3} categories  {keywords:>4} keywords")
+    mapping = rule_set.mapping
+    print(f"  {mapping.name:<10} version {mapping.version}  {len(mapping.subcategories):>3} subcategories"
+          f"  {len(mapping.automaton.keywords):>4} keywords")
+    print(f"  {len(rule_set.tag_categories)} tag mappings")
+    print(f"Compile {compile_ms:.1f} ms, cached load {load_ms:.1f} ms -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Find near-duplicate products across malls and write their cluster ids.
+
+  find-duplicates.py                  write src/data/duplicate-clusters.json
+  find-duplicates.py --show 20        also print the 20 largest clusters
+  find-duplicates.py --threshold 0.8  only cluster closer matches
+
+Names (and descriptions that add to them) are shingled, MinHash signatures
+are bucketed with locality-sensitive hashing, and only products sharing a
+bucket are compared, so the run stays linear in the catalog size. Products
+that differ only in pack size or mall end up in one cluster.
+
+The clusters file maps product ids to cluster ids. /api/products?dedupe=1
+lists one product per cluster, and run-category-pipeline.py --clusters
+classifies each cluster once. Rerun it whenever products.json changes;
+products edited since the last run are treated as unclustered.
+"""
+import argparse
+import os
+import time
+
+from catalog.dedup import CLUSTERS_PATH, THRESHOLD, build_clusters, write_clusters
+from catalog.products_io import PRODUCTS_PATH, load_products
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to scan')
+    parser.add_argument('--output', default=CLUSTERS_PATH, help='clusters file to write')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Jaccard similarity to join a cluster')
+    parser.add_argument('--show', type=int, default=0, metavar='N', help='print the N largest clusters')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    document = build_clusters(args.products, args.threshold)
+    write_clusters(document, args.output)
+    clusters = document['clusters']
+    print(f"Scanned {document['count']} products in {time.perf_counter() - started:.2f}s, "
+          f"verified {document['compared']} candidate pairs")
+    print(f"  {len(clusters)} clusters holding {sum(len(cluster['ids']) for cluster in clusters.values())} products, "
+          f"{sum(1 for cluster in clusters.values() if cluster['malls'] > 1)} spanning several malls")
+    print(f"  {os.path.getsize(args.output):,} bytes written to {args.output}")
+
+    if args.show:
+        names = {product.get('id'): product.get('name') for product in load_products(args.products)}
+        largest = sorted(clusters.items(), key=lambda item: (-len(item[1]['ids']), item[0]))[:args.show]
+        for key, cluster in largest:
+            print(f"\n{key}  {len(cluster['ids'])} products, {cluster['malls']} malls")
+            for product_id in cluster['ids']:
+                print(f"  {product_id:<28} {names.get(product_id)}")
+
+if __name__ == "__main__":
+    main()
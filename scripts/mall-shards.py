@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Keep the catalog as one shard file per mall and merge them into products.json.
+
+  split                    (re)create src/data/mall-shards from products.json
+  merge [--force]          rebuild products.json if any shard changed
+  status                   list the shards and which changed since the last merge
+  pipeline [--malls A,B]   run the category pipeline over the shards, then merge
+
+Jobs that work on different malls write different shard files, so a mall sync
+and the fix-up scripts can run at the same time; run a script on one mall with
+--products src/data/mall-shards/<shard>.json (see status for the names). merge
+only rewrites products.json when a shard's checksum changed, and refuses to if
+products.json was edited since the last merge, which would lose that edit.
+After a merge, the files the site derives from products.json are rebuilt
+(see catalog/derived.py).
+"""
+import argparse
+import sys
+import time
+
+from catalog.derived import rebuild_derived
+from catalog.mall_shards import MALL_SHARDS_DIR, MallShardStore, ShardConflictError, shard_name
+from catalog.manifest import ClassificationManifest
+from catalog.pipeline import Pipeline
+from catalog.products_io import PRODUCTS_PATH
+
+def print_merge(result, products_path, elapsed):
+    if result.skipped:
+        print(f"{products_path} is up to date with {result.shards} shards")
+        return
+    print(f"Merged {result.shards} shards ({len(result.changed)} changed) into {products_path}: "
+          f"{result.total} products in {elapsed:.2f}s")
+    if result.renumbered:
+        print(f"  {len(result.renumbered)} shards written outside write_mall had their order recovered by id")
+
+def merge(store, products_path, force=False):
+    started = time.perf_counter()
+    try:
+        result = store.merge(products_path, force=force)
+    except ShardConflictError as exc:
+        sys.exit(f"Not merged: {exc}")
+    print_merge(result, products_path, time.perf_counter() - started)
+    if not result.skipped:
+        for path in rebuild_derived(products_path):
+            print(f"Rebuilt {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shards', default=MALL_SHARDS_DIR, help='shard directory')
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog file assembled from the shards')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('split', help='shard the catalog by mall')
+
+    merge_cmd = commands.add_parser('merge', help='assemble the catalog from the shards')
+    merge_cmd.add_argument('--force', action='store_true', help='overwrite products.json even if it was edited')
+
+    commands.add_parser('status', help='list the shards')
+
+    pipeline_cmd = commands.add_parser('pipeline', help='run the category pipeline shard by shard')
+    pipeline_cmd.add_argument('--malls', help='comma-separated mall ids (default: every shard)')
+    pipeline_cmd.add_argument('--no-merge', action='store_true', help='leave products.json for a later merge')
+
+    args = parser.parse_args()
+    store = MallShardStore(args.shards)
+
+    if args.command == 'split':
+        started = time.perf_counter()
+        counts = store.split(args.products)
+        print(f"Split {sum(counts.values())} products into {len(counts)} mall shards "
+              f"in {time.perf_counter() - started:.2f}s -> {args.shards}")
+
+    elif args.command == 'merge':
+        merge(store, args.products, args.force)
+
+    elif args.command == 'status':
+        _, changed = store.changed_shards()
+        changed = set(changed)
+        for name in store.names():
+            meta = store.load_meta(name) or {'mall': '?', 'order': []}
+            mark = '*' if name in changed else ' '
+            print(f"{mark} {name}  {len(meta['order']):>6}  {meta['mall']}")
+        print(f"\n{len(store.names())} shards, {len(changed)} changed since the last merge (*)")
+
+    elif args.command == 'pipeline':
+        names = [shard_name(mall) for mall in args.malls.split(',')] if args.malls else store.names()
+        missing = [name for name in names if name not in store.names()]
+        if missing:
+            parser.error(f"no shard for: {', '.join(missing)}")
+        pipeline = Pipeline()
+        manifest = ClassificationManifest()
+        total = 0
+        for name in names:
+            # Keep the cached results of the other malls' products
+            pipeline.run(store.shard_path(name), manifest=manifest, prune=False)
+            total += pipeline.changes
+        print(f"Pipeline changed {total} products in {len(names)} shards")
+        if not args.no_merge:
+            merge(store, args.products)
+
+if __name__ == "__main__":
+    main()
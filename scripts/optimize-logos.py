@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Convert the mall logos into size-bucketed WebP/AVIF variants for the mall cards.
+
+  optimize-logos.py                  convert new and changed logos in public/logos
+  optimize-logos.py --workers 4
+  optimize-logos.py --force          reconvert every logo
+
+Variants are written to public/logos/optimized, named by content hash, and
+src/data/logo-manifest.json lists them per logo with the srcSet the mall
+cards use; a card whose logo is not in the manifest shows the original.
+Logos whose source file and the conversion settings are unchanged since the
+last run are skipped. Needs Pillow (scripts/requirements.txt); AVIF variants
+need a Pillow built with AVIF support, otherwise only WebP is written.
+`npm run build` runs this before `next build` (the prebuild script), so every
+deploy ships the variants and a full manifest; neither is committed beyond the
+empty manifest the app falls back to.
+"""
+import argparse
+import sys
+import time
+
+from catalog.logos import LOGO_MANIFEST_PATH, LOGOS_DIR, SIZES, VARIANTS_DIR, LogoToolError, build_logos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logos', default=LOGOS_DIR, help='directory of source logos')
+    parser.add_argument('--output', default=VARIANTS_DIR, help='directory to write the variants to')
+    parser.add_argument('--manifest', default=LOGO_MANIFEST_PATH, help='manifest file for the app')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma-separated size buckets in px')
+    parser.add_argument('--workers', type=int, help='conversion processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='reconvert logos even if unchanged')
+    args = parser.parse_args()
+
+    sizes = tuple(sorted(int(size) for size in args.sizes.split(',')))
+    started = time.perf_counter()
+    try:
+        build = build_logos(args.logos, args.output, args.manifest, sizes, args.workers, args.force)
+    except LogoToolError as exc:
+        sys.exit(str(exc))
+
+    total = len(build.converted) + build.skipped
+    print(f"{total} logos in {time.perf_counter() - started:.2f}s: {len(build.converted)} converted, "
+          f"{build.skipped} unchanged, {build.removed} stale variants removed")
+    for url, error in build.failed.items():
+        print(f"  failed {url}: {error}")
+    print(f"  sources {build.source_bytes / 1024:.0f} KB")
+    for (size, file_format), size_bytes in sorted(build.variant_bytes.items()):
+        print(f"  {size:>4}px {file_format:<5} {size_bytes / 1024:.0f} KB")
+    print(f"Manifest written to {args.manifest}")
+
+if __name__ == "__main__":
+    main()
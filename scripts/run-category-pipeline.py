@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Run the category fix-up scripts as one pass over products.json.
+
+By default every category stage runs, in the order the individual scripts
+are meant to be run: fix-agricultural, fix-missing, move-rice,
+reclassify-jeonche, reclassify-popular, reclassify-misc and hierarchy. The
+unit-price stage, which stores the pack size and unit price parsed from each
+product name, only runs when named in --stages.
+
+Classifier results are cached in a content-hash manifest, so a rerun after a
+scrape only classifies products that are new or changed (or all of them once,
+after a rules change). Pass --no-manifest to classify everything from scratch.
+
+--workers N spreads the stages over N processes for large merged catalogs.
+The output is byte-identical to a serial run; for a catalog of a few thousand
+products the process start-up costs more than it saves.
+
+--clusters classifies near-duplicate products (see find-duplicates.py) once
+per cluster: every product that has not changed since it was clustered gets
+the result of its cluster's representative.
+
+--matching token stops single-syllable keywords (어, 조, 게, 배, 감, 김)
+matching inside unrelated words, by splitting words into the nouns of
+src/data/noun-lexicon.json, so products stop moving between categories
+from run to run. With --trigger-rebuild, scripts/trigger-rebuild.json is only
+rewritten (and a deploy triggered) when some product actually changed.
+
+After writing products.json, the pipeline rebuilds the files the site
+derives from it (see catalog/derived.py), src/data/search-index.json and
+price-index.json, when they no longer match the catalog.
+
+--profile records, for every keyword of the rule tables, how often it matched,
+won and changed a product, plus category wins and time per classifier, in
+scripts/output/rule-profile.json (or the given path). Cached classifications
+are not profiled, so combine it with --no-manifest for a full picture.
+"""
+import argparse
+import os
+from datetime import datetime, timezone
+
+from catalog.classifier import MATCHING_MODES
+from catalog.columnar import is_columnar
+from catalog.dedup import CLUSTERS_PATH, ClusterMap
+from catalog.derived import rebuild_derived
+from catalog.manifest import MANIFEST_PATH, ClassificationManifest
+from catalog.pipeline import CHUNK_SIZE, Pipeline
+from catalog.products_io import PRODUCTS_PATH, write_json
+from catalog.profiling import PROFILE_PATH, RuleProfile
+from catalog.stages import DEFAULT_STAGES, STAGES
+
+TRIGGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trigger-rebuild.json')
+
+def write_trigger(pipeline):
+    """Record the changes in trigger-rebuild.json so the next push redeploys"""
+    write_json({
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'reason': f"Category pipeline changed {pipeline.changes} product categories",
+        'changes': {result.name: result.changes for result in pipeline.results if result.changes},
+    }, TRIGGER_PATH)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', help='comma-separated stage names (default: all but unit-price)')
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog file to update')
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing')
+    parser.add_argument('--verbose', action='store_true', help='print every change')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='classification manifest file')
+    parser.add_argument('--no-manifest', action='store_true', help='classify every product from scratch')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='products per worker task')
+    parser.add_argument('--clusters', nargs='?', const=CLUSTERS_PATH, help='classify each duplicate cluster once')
+    parser.add_argument('--matching', choices=MATCHING_MODES, help='keyword matching mode (default: per rule set)')
+    parser.add_argument('--profile', nargs='?', const=PROFILE_PATH, help='write a per-keyword rule profile to this file')
+    parser.add_argument('--trigger-rebuild', action='store_true', help='update trigger-rebuild.json if anything changed')
+    parser.add_argument('--list', action='store_true', help='list the available stages and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, func in STAGES.items():
+            print(f"{name:<20} {func.__doc__}{'' if name in DEFAULT_STAGES else ' (only with --stages)'}")
+        return
+
+    # The pipeline writes JSON; a columnar catalog is only read, for reports
+    if not args.dry_run and is_columnar(args.products):
+        parser.error(f"{args.products} is a columnar catalog; pass --dry-run, or run on products.json "
+                     "and rebuild the .cols file with build-columnar-catalog.py")
+
+    stage_names = args.stages.split(',') if args.stages else None
+    pipeline = Pipeline(stage_names, matching=args.matching)
+
+    def print_change(stage_name, product, outcome):
+        print(f"[{stage_name}] '{product.get('name', 'Unknown')}' -> '{outcome}'")
+
+    clusters = ClusterMap.load(args.clusters) if args.clusters else None
+    if args.no_manifest or args.dry_run:
+        # An in-memory manifest still shares results within each cluster
+        manifest = ClassificationManifest(path=None, clusters=clusters) if clusters else None
+    else:
+        manifest = ClassificationManifest(args.manifest, clusters=clusters)
+    profile = RuleProfile() if args.profile else None
+    pipeline.run(
+        args.products,
+        write=not args.dry_run,
+        on_change=print_change if args.verbose else None,
+        manifest=manifest,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        profile=profile,
+    )
+    pipeline.print_report()
+    if profile:
+        profile.write(args.profile, pipeline)
+        profile.print_summary()
+        print(f"Rule profile written to {args.profile}")
+
+    if not args.dry_run:
+        for path in rebuild_derived(args.products):
+            print(f"Rebuilt {path}")
+
+    if args.dry_run:
+        print("\nDry run: products.json was not modified")
+    elif args.trigger_rebuild:
+        if pipeline.changes:
+            write_trigger(pipeline)
+            print(f"\nUpdated {TRIGGER_PATH}")
+        else:
+            print("\nNo category changes; rebuild not triggered")
+
+if __name__ == "__main__":
+    main()
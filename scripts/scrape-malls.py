@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Scrape the malls in mall-scrapers.json concurrently and classify the results.
+
+  scrape-malls.py                              scrape every configured mall
+  scrape-malls.py --malls cyso,bmall --dry-run
+  scrape-malls.py --homepages scripts/output   replay the saved homepages locally
+  scrape-malls.py --record pages/ ; scrape-malls.py --replay pages/
+
+All malls run at once. Requests to each host are limited to --concurrency at
+a time and --rate per second, go over pooled keep-alive connections, and are
+retried with backoff; the whole run stops at --deadline seconds, and malls
+not finished by then keep their current products. Each mall that returned
+products has them replaced in products.json, its outcome is recorded in
+sync-status.json, and the category pipeline then runs over the catalog as
+run-category-pipeline.py would.
+
+With --shards, each mall's products go to its own shard file under
+src/data/mall-shards instead (see mall-shards.py), the pipeline runs over
+those shards only, and products.json is merged from the shards afterwards;
+other jobs can keep working on other malls' shards meanwhile.
+
+--profile records which category-mapping.json keywords classified the scraped
+products, as run-category-pipeline.py --profile does for the fix-up rules.
+
+--replay and --homepages serve saved pages from a local stub server instead
+of the malls; --fail-first and --latency make that server flaky or slow.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from contextlib import nullcontext
+
+from catalog.classify_service import ClassificationService
+from catalog.fetcher import Fetcher
+from catalog.mall_shards import MALL_SHARDS_DIR, MallShardStore, ShardConflictError, shard_name
+from catalog.manifest import ClassificationManifest
+from catalog.pipeline import Pipeline
+from catalog.products_io import PRODUCTS_PATH, ProductWriter, iter_products
+from catalog.profiling import PROFILE_PATH, RuleProfile
+from catalog.replay import Recorder, ReplayServer, routes_from_homepages, routes_from_recordings
+from catalog.rules import MAPPING_CLASSIFIER
+from catalog.scraping import (
+    MALL_SCRAPERS_PATH, SYNC_STATUS_PATH, classify_products, load_scrapers, merge_results, scrape_malls,
+    update_sync_status,
+)
+
+async def scrape(scrapers, args, url_for=None):
+    recorder = Recorder(args.record) if args.record else None
+    async with Fetcher(
+        concurrency_per_host=args.concurrency,
+        rate_per_host=args.rate,
+        retries=args.retries,
+        timeout=args.timeout,
+        deadline=args.deadline,
+    ) as fetcher:
+        results = await scrape_malls(fetcher, scrapers, url_for, recorder)
+        return results, fetcher.stats()
+
+def run(scrapers, args):
+    if not (args.replay or args.homepages):
+        return asyncio.run(scrape(scrapers, args))
+
+    if args.replay:
+        routes = routes_from_recordings(args.replay)
+    else:
+        routes = routes_from_homepages(args.homepages, scrapers)
+    with ReplayServer(routes, fail_first=args.fail_first, latency=args.latency) as server:
+        print(f"Replaying {len(routes)} saved pages from http://127.0.0.1:{server.server_address[1]}/")
+        return asyncio.run(scrape(scrapers, args, server.url_for))
+
+def write_shards(succeeded, args):
+    """Write each mall's shard, run the pipeline over just those, and merge"""
+    store = MallShardStore(args.shards)
+    for result in succeeded:
+        store.write_mall(result.mall_id, result.products)
+    print(f"\nWrote {len(succeeded)} mall shards to {args.shards}")
+
+    if not args.no_pipeline:
+        print()
+        pipeline = Pipeline()
+        manifest = ClassificationManifest()
+        changes = 0
+        for result in succeeded:
+            pipeline.run(store.shard_path(shard_name(result.mall_id)), manifest=manifest, prune=False)
+            changes += pipeline.changes
+        print(f"Pipeline changed {changes} products in {len(succeeded)} shards")
+
+    try:
+        merged = store.merge(args.products)
+    except ShardConflictError as exc:
+        sys.exit(f"Not merged: {exc}")
+    print(f"Merged {merged.shards} shards into {args.products}: {merged.total} products")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--malls', help='comma-separated mall ids (default: all)')
+    parser.add_argument('--config', default=MALL_SCRAPERS_PATH, help='mall scraper configs')
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to merge the results into')
+    parser.add_argument('--status', default=SYNC_STATUS_PATH, help='sync status file to update')
+    parser.add_argument('--concurrency', type=int, default=4, help='requests in flight per host')
+    parser.add_argument('--rate', type=float, default=2.0, help='requests started per second per host')
+    parser.add_argument('--retries', type=int, default=3, help='retries per request')
+    parser.add_argument('--timeout', type=float, default=20.0, help='seconds per request')
+    parser.add_argument('--deadline', type=float, default=900.0, help='seconds for the whole run')
+    parser.add_argument('--dry-run', action='store_true', help='scrape and report without writing anything')
+    parser.add_argument('--no-pipeline', action='store_true', help='skip the category pipeline after merging')
+    parser.add_argument('--shards', nargs='?', const=MALL_SHARDS_DIR, help='write per-mall shards in this directory, then merge')
+    parser.add_argument('--profile', nargs='?', const=PROFILE_PATH, help='write a per-keyword profile of the classification')
+    parser.add_argument('--record', help='save every fetched page under this directory')
+    parser.add_argument('--replay', help='serve pages saved with --record instead of fetching the malls')
+    parser.add_argument('--homepages', help='serve the <mall>-homepage.html snapshots in this directory')
+    parser.add_argument('--fail-first', type=int, default=0, help='replay: answer the first N requests of each page with 503')
+    parser.add_argument('--latency', type=float, default=0.0, help='replay: seconds to delay each response')
+    args = parser.parse_args()
+
+    if args.shards and not MallShardStore(args.shards).exists():
+        parser.error(f"no mall shards in {args.shards}; run mall-shards.py split first")
+
+    scrapers = load_scrapers(args.config)
+    if args.malls:
+        unknown = [mall_id for mall_id in args.malls.split(',') if mall_id not in scrapers]
+        if unknown:
+            parser.error(f"no scraper config for: {', '.join(unknown)}")
+        scrapers = [scrapers[mall_id] for mall_id in args.malls.split(',')]
+    else:
+        scrapers = list(scrapers.values())
+
+    started = time.perf_counter()
+    results, (stats, connections) = run(scrapers, args)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{'mall':<28} {'products':>8} {'seconds':>8}  status")
+    for result in results:
+        status = 'ok' if result.ok else (result.error or 'no products found')
+        print(f"{result.mall_id:<28} {len(result.products):>8} {result.seconds:>8.2f}  {status}")
+    succeeded = [result for result in results if result.ok]
+    print(f"\nScraped {sum(len(result.products) for result in succeeded)} products from "
+          f"{len(succeeded)}/{len(results)} malls in {elapsed:.1f}s")
+    requests = sum(host['requests'] for host in stats.values())
+    retries = sum(host['retries'] for host in stats.values())
+    print(f"  {requests} requests to {len(stats)} hosts, {retries} retries, "
+          f"{connections['opened']} connections opened, {connections['reused']} reuses")
+
+    if args.dry_run:
+        print("\nDry run: products.json and sync-status.json were not modified")
+        return
+
+    service = ClassificationService()
+    profile = RuleProfile([MAPPING_CLASSIFIER]) if args.profile else None
+    with profile or nullcontext():
+        for result in succeeded:
+            classify_products(result.products, service)
+    if profile:
+        profile.write(args.profile)
+        print(f"\nRule profile written to {args.profile}")
+    update_sync_status(results, args.status)
+    if not succeeded:
+        print("\nNo mall returned products; products.json was not modified")
+        return
+    if args.shards:
+        write_shards(succeeded, args)
+        return
+    with ProductWriter(args.products) as writer:
+        for product in merge_results(iter_products(args.products), results):
+            writer.write(product)
+    print(f"\nMerged into {args.products}: {writer.count} products")
+
+    if not args.no_pipeline:
+        print()
+        pipeline = Pipeline()
+        pipeline.run(args.products, manifest=ClassificationManifest())
+        pipeline.print_report()
+
+if __name__ == "__main__":
+    main()
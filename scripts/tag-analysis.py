@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Regenerate tag-mapping.json and tag-analysis.json from tag co-occurrence in the catalog.
+
+  update [--rebuild]               bring the saved counts up to date with products.json
+  suggest [--tag T] [--all]        print suggested tag -> category mappings and their scores
+  write [--rederive] [--dry-run]   regenerate src/data/tag-mapping.json and tag-analysis.json
+
+Every command first updates the counts in scripts/output/tag-cooccurrence.json
+from the products that changed since the last run (see catalog/tag_stats.py);
+the first run, or --rebuild, counts the whole catalog.
+
+write adds the suggested categories of tags that tag-mapping.json does not
+list yet, keeping the existing entries (--rederive replaces those too), and
+rewrites the tag frequencies of tag-analysis.json along with the suggested
+mappings, the mapped tags whose suggestion differs (mappingReview) and the
+related tags of each tag. Its tag groups and recommended new tags are kept.
+"""
+import argparse
+import json
+import math
+import time
+
+from catalog.products_io import PRODUCTS_PATH
+from catalog.tag_stats import (
+    COOCCURRENCE_PATH, MIN_CONFIDENCE, MIN_COUNT, MIN_LIFT, TAG_ANALYSIS_PATH, TAG_MAPPING_PATH,
+    format_tag_mapping, load_counts, read_document, regenerate_tag_analysis, regenerate_tag_mapping,
+    write_document,
+)
+
+def print_scores(tag, total, scores, mapped=None):
+    mapped_note = f", mapped to {', '.join(mapped) or 'nothing'}" if mapped is not None else ''
+    print(f"{tag} ({total} products{mapped_note})")
+    for category, products, confidence, lift in scores:
+        print(f"  {category:<14} {products:>6} products  {confidence:>6.1%} of the tag  "
+              f"lift {lift:>7.2f}  PMI {math.log2(lift):>5.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog file to count')
+    parser.add_argument('--state', default=COOCCURRENCE_PATH, help='saved counts')
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT,
+                        help='products a tag and category must share to be suggested')
+    parser.add_argument('--min-lift', type=float, default=MIN_LIFT,
+                        help='how much more likely the tag must make the category')
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE,
+                        help="share of the tag's products that must be in the category")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    update_cmd = commands.add_parser('update', help='update the saved counts')
+    update_cmd.add_argument('--rebuild', action='store_true', help='count the whole catalog from scratch')
+
+    suggest_cmd = commands.add_parser('suggest', help='print suggested mappings')
+    suggest_cmd.add_argument('--tag', help='print every category score of this tag')
+    suggest_cmd.add_argument('--all', action='store_true', help='include tags already mapped the same way')
+
+    write_cmd = commands.add_parser('write', help='regenerate the tag files')
+    write_cmd.add_argument('--rederive', action='store_true', help='also replace existing mappings')
+    write_cmd.add_argument('--dry-run', action='store_true', help='report the changes without writing')
+    write_cmd.add_argument('--mapping', default=TAG_MAPPING_PATH, help='tag-mapping.json to regenerate')
+    write_cmd.add_argument('--analysis', default=TAG_ANALYSIS_PATH, help='tag-analysis.json to regenerate')
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts, result = load_counts(args.products, args.state, rebuild=getattr(args, 'rebuild', False))
+    counts.save(args.state)
+    how = 'Counted' if result.rebuilt else 'Updated'
+    print(f"{how} {counts.products} tagged products of {result.total} in {time.perf_counter() - started:.2f}s: "
+          f"+{result.added} -{result.removed}, {result.classified} classified; "
+          f"{len(counts.tag_counts)} tags, {sum(map(len, counts.tag_pairs.values()))} tag pairs")
+
+    suggestions = counts.suggest_mappings(args.min_count, args.min_lift, args.min_confidence)
+    mapping_document = read_document(TAG_MAPPING_PATH if args.command != 'write' else args.mapping)
+    mapping = mapping_document.get('tagToCategoryMapping', {})
+
+    if args.command == 'suggest':
+        if args.tag:
+            print_scores(args.tag, counts.tag_counts.get(args.tag, 0), counts.category_scores(args.tag),
+                         mapping.get(args.tag))
+            return
+        shown = 0
+        for tag, scores in suggestions.items():
+            if args.all or mapping.get(tag) != [score[0] for score in scores]:
+                print_scores(tag, counts.tag_counts[tag], scores, mapping.get(tag))
+                shown += 1
+        print(f"\n{len(suggestions)} tags with a suggestion, {shown} shown")
+
+    elif args.command == 'write':
+        new_mapping_document, added, changed = regenerate_tag_mapping(mapping_document, suggestions, args.rederive)
+        analysis = regenerate_tag_analysis(
+            read_document(args.analysis), counts, suggestions, mapping, counts.related_tags(),
+        )
+        print(f"{args.mapping}: {len(added)} tags added, {len(changed)} remapped")
+        for tag in added:
+            print(f"  + {tag}: {', '.join(new_mapping_document['tagToCategoryMapping'][tag])}")
+        for tag in changed:
+            print(f"  ~ {tag}: {', '.join(mapping[tag]) or 'nothing'} -> "
+                  f"{', '.join(new_mapping_document['tagToCategoryMapping'][tag])}")
+        print(f"{args.analysis}: {analysis['uniqueTagsTotal']} tags, "
+              f"{len(analysis['recommendations']['mappingReview'])} mappings to review")
+        if args.dry_run:
+            print('Dry run: nothing written')
+            return
+        write_document(format_tag_mapping(new_mapping_document), args.mapping)
+        write_document(json.dumps(analysis, ensure_ascii=False, indent=2), args.analysis)
+
+if __name__ == "__main__":
+    main()
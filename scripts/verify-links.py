@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Verify every product's link and image, refreshing lastVerified and the dead-link flags.
+
+  verify-links.py                      check products not verified in the last 24 hours
+  verify-links.py --max-age 0          check everything
+  verify-links.py --stub --stub-dead 0.05 --dry-run   against a local stub server
+
+Links are checked with HEAD requests (a one-byte GET where HEAD is refused),
+at most --concurrency at a time and --rate per second per host, over pooled
+keep-alive connections. ETags and Last-Modified dates are kept in
+scripts/output/link-validators.json and sent back, so unchanged resources
+answer 304. A product whose link or image answers 404/410, or could not be
+reached in this run and the previous one, gets isDeadLink/isDeadImage; one
+whose links all answered gets a fresh lastVerified. The validators file
+also counts those unreachable runs, so with --no-validators an unreachable
+link is never marked dead. Errors that may pass (5xx, 429, 403, timeouts) change
+nothing. The catalog is read and written back in one streaming pass.
+
+--stub serves every URL in the catalog from a local server instead, with
+the --stub-dead fraction of them missing; --fail-first and --latency make it
+flaky or slow.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from catalog.fetcher import Fetcher
+from catalog.linkcheck import VALIDATORS_PATH, LinkChecker, ValidatorCache, product_links, verify_products
+from catalog.products_io import PRODUCTS_PATH, ProductWriter, iter_products
+from catalog.replay import ReplayServer, route_key
+
+def stub_routes(products_path, dead_fraction, body_path):
+    """Route every link in the catalog to body_path, except a dead_fraction of them"""
+    routes = {}
+    for product in iter_products(products_path):
+        for _, url in product_links(product):
+            # Decide by hash, so the same URLs are dead on every run
+            if int(hashlib.sha1(url.encode('utf-8')).hexdigest()[:8], 16) / 0xffffffff >= dead_fraction:
+                routes[route_key(url)] = body_path
+    return routes
+
+async def verify(args, url_for=None):
+    cache = ValidatorCache(None if args.no_validators else args.validators)
+    max_age = timedelta(hours=args.max_age) if args.max_age else None
+    totals = {'products': 0, 'changed': 0, 'dead links': 0, 'dead images': 0}
+
+    async with Fetcher(
+        concurrency_per_host=args.concurrency,
+        rate_per_host=args.rate,
+        retries=args.retries,
+        timeout=args.timeout,
+        deadline=args.deadline,
+    ) as fetcher:
+        checker = LinkChecker(fetcher, cache, url_for)
+        with nullcontext() if args.dry_run else ProductWriter(args.products) as writer:
+            async for product, changed in verify_products(iter_products(args.products), checker, max_age, args.window):
+                totals['products'] += 1
+                totals['changed'] += changed
+                totals['dead links'] += bool(product.get('isDeadLink'))
+                totals['dead images'] += bool(product.get('isDeadImage'))
+                if writer:
+                    writer.write(product)
+        stats, connections = fetcher.stats()
+
+    if not args.dry_run:
+        cache.save()
+    return totals, checker, stats, connections
+
+def run(args):
+    if not args.stub:
+        return asyncio.run(verify(args))
+
+    with tempfile.NamedTemporaryFile(suffix='.html') as body:
+        body.write(b'<html><body>stub</body></html>')
+        body.flush()
+        routes = stub_routes(args.products, args.stub_dead, body.name)
+        with ReplayServer(routes, fail_first=args.fail_first, latency=args.latency) as server:
+            print(f"Serving {len(routes)} stub URLs from http://127.0.0.1:{server.server_address[1]}/")
+            result = asyncio.run(verify(args, server.url_for))
+            print(f"  stub server: {server.requests} requests, {server.not_modified} answered 304")
+            return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', default=PRODUCTS_PATH, help='catalog to verify')
+    parser.add_argument('--validators', default=VALIDATORS_PATH, help='ETag/Last-Modified cache file')
+    parser.add_argument('--no-validators', action='store_true', help='send no conditional headers and keep none')
+    parser.add_argument('--max-age', type=float, default=24.0, help='skip products verified in the last N hours (0: none)')
+    parser.add_argument('--concurrency', type=int, default=4, help='requests in flight per host')
+    parser.add_argument('--rate', type=float, default=4.0, help='requests started per second per host')
+    parser.add_argument('--retries', type=int, default=2, help='retries per request')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds per request')
+    parser.add_argument('--deadline', type=float, default=1800.0, help='seconds for the whole run')
+    parser.add_argument('--window', type=int, default=500, help='products in flight at once')
+    parser.add_argument('--dry-run', action='store_true', help='check and report without writing anything')
+    parser.add_argument('--stub', action='store_true', help='check against a local stub server')
+    parser.add_argument('--stub-dead', type=float, default=0.0, help='stub: fraction of URLs that answer 404')
+    parser.add_argument('--fail-first', type=int, default=0, help='stub: answer the first N requests of each URL with 503')
+    parser.add_argument('--latency', type=float, default=0.0, help='stub: seconds to delay each response')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    totals, checker, stats, connections = run(args)
+    elapsed = time.perf_counter() - started
+
+    print(f"Verified {len(checker.tasks)} URLs of {totals['products']} products in {elapsed:.1f}s")
+    for outcome, count in sorted(checker.outcomes.items()):
+        print(f"  {outcome:<14} {count:>7}")
+    requests = sum(host['requests'] for host in stats.values())
+    retries = sum(host['retries'] for host in stats.values())
+    print(f"  {requests} requests to {len(stats)} hosts, {retries} retries, "
+          f"{connections['opened']} connections opened, {connections['reused']} reuses")
+    print(f"{totals['changed']} products updated; {totals['dead links']} with dead links, "
+          f"{totals['dead images']} with dead images")
+    if args.dry_run:
+        print(f"\nDry run: {os.path.basename(args.products)} was not modified")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 import { NextResponse } from 'next/server';
 import { Product } from '@/types';
+import { candidatePositions, catalogDigest, indexMatches, loadSearchIndex } from '@/lib/search-index';
+import { collapseDuplicates, loadDuplicateClusters } from '@/lib/duplicate-clusters';
+import { sortByPrice } from '@/lib/price-index';
+import { PAGE_SIZE, loadShardManifest, readShardPage, shardList } from '@/lib/catalog-shards';
 import fs from 'fs/promises';
 import path from 'path';
 
@@ -8,14 +12,26 @@ export const dynamic = 'force-dynamic';
 
 const PRODUCTS_FILE = path.join(process.cwd(), 'src/data/products.json');
 
-async function getProducts(): Promise<Product[]> {
+interface Catalog {
+  products: Product[];
+  // Digest of the file the products were parsed from, to check the indexes
+  digest: string;
+}
+
+let cachedProducts: (Catalog & { mtimeMs: number }) | null = null;
+
+// Every product in file order, including commented ones, so positions in the
+// search index line up. Re-read only when products.json changes.
+async function getCatalog(): Promise<Catalog> {
   try {
-    const data = await fs.readFile(PRODUCTS_FILE, 'utf-8');
-    const allProducts = JSON.parse(data);
-    // Filter out commented products (those with _commented: true)
-    return allProducts.filter((product: any) => !product._commented);
+    const { mtimeMs } = await fs.stat(PRODUCTS_FILE);
+    if (!cachedProducts || cachedProducts.mtimeMs !== mtimeMs) {
+      const data = await fs.readFile(PRODUCTS_FILE);
+      cachedProducts = { mtimeMs, products: JSON.parse(data.toString('utf-8')), digest: catalogDigest(data) };
+    }
+    return cachedProducts;
   } catch (error) {
-    return [];
+    return { products: [], digest: '' };
   }
 }
 
@@ -26,8 +42,44 @@ export async function GET(request: Request) {
     const mallId = searchParams.get('mallId');
     const search = searchParams.get('search');
     const limit = searchParams.get('limit');
+    const dedupe = searchParams.get('dedupe') === '1';
+    // sort=price: cheapest first; sort=unitPrice&unit=kg|L|개: cheapest per unit
+    const sort = searchParams.get('sort');
+    const unit = searchParams.get('unit') || 'kg';
+    // page=N: the Nth page of PAGE_SIZE products, with the list's total
+    const page = searchParams.get('page');
+
+    const { products: allProducts, digest } = await getCatalog();
+    let products = allProducts;
+
+    // A page of one category or one mall is served as stored in the static
+    // shards, precompressed, when they were built from this catalog
+    if (page && !search && !sort && !dedupe && !limit) {
+      const manifest = await loadShardManifest();
+      const list = manifest && shardList(manifest, digest, { category, mallId });
+      const stored = list && (await readShardPage(list, Number(page), request.headers.get('accept-encoding') || ''));
+      if (stored) {
+        const headers: Record<string, string> = {
+          'Content-Type': 'application/json; charset=utf-8',
+          'Vary': 'Accept-Encoding',
+        };
+        if (stored.encoding) headers['Content-Encoding'] = stored.encoding;
+        return new NextResponse(stored.body, { headers });
+      }
+    }
+
+    // Narrow down with the search index when it was built from this catalog;
+    // the filters below still check every candidate
+    const index = await loadSearchIndex();
+    if (index && indexMatches(index, digest)) {
+      const positions = candidatePositions(index, { category, mallId, search });
+      if (positions) {
+        products = positions.map(position => allProducts[position]);
+      }
+    }
 
-    let products = await getProducts();
+    // Filter out commented products (those with _commented: true)
+    products = products.filter((product: any) => !product._commented);
 
     // Filter by category
     if (category && category !== 'all') {
@@ -52,11 +104,34 @@ export async function GET(request: Request) {
       );
     }
 
+    if (sort === 'price' || sort === 'unitPrice') {
+      products = await sortByPrice(products, allProducts, digest, category, sort === 'unitPrice' ? unit : null);
+    }
+
+    // One product per near-duplicate cluster (the same product in several
+    // malls or pack sizes)
+    if (dedupe) {
+      const clusters = await loadDuplicateClusters();
+      if (clusters) {
+        products = collapseDuplicates(products, clusters);
+      }
+    }
+
     // Limit results
     if (limit) {
       products = products.slice(0, parseInt(limit));
     }
 
+    if (page) {
+      const pageNumber = parseInt(page);
+      return NextResponse.json({
+        page: pageNumber,
+        pages: Math.max(1, Math.ceil(products.length / PAGE_SIZE)),
+        total: products.length,
+        products: products.slice((pageNumber - 1) * PAGE_SIZE, pageNumber * PAGE_SIZE),
+      });
+    }
+
     return NextResponse.json({
       products,
       total: products.length,
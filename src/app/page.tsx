@@ -2,11 +2,12 @@
 
 import InteractiveMap from '@/components/InteractiveMap';
 import FeaturedMalls from '@/components/FeaturedMalls';
-import { getMalls, getRegions } from '@/lib/data';
+import { getMalls, getRegions, getRegionProductCounts } from '@/lib/data';
 
 export default function HomePage() {
   const malls = getMalls();
   const regions = getRegions();
+  const productCounts = getRegionProductCounts();
 
   return (
     <div className="min-h-screen">
@@ -49,7 +50,7 @@ export default function HomePage() {
       {/* Interactive Map Section */}
       <section className="py-16 bg-gray-50">
         <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8">
-          <InteractiveMap regions={regions} malls={malls} />
+          <InteractiveMap regions={regions} malls={malls} productCounts={productCounts} />
         </div>
       </section>
 
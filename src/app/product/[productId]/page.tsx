@@ -2,7 +2,7 @@ import { notFound } from 'next/navigation';
 import Image from 'next/image';
 import Link from 'next/link';
 import { Product } from '@/types';
-import { getMallById } from '@/lib/data';
+import { getMallById, getProductCategoryPath } from '@/lib/data';
 import productsData from '@/data/products.json';
 
 export async function generateStaticParams() {
@@ -46,6 +46,7 @@ export default function ProductDetailPage({ params }: { params: { productId: str
   }
   
   const mall = getMallById(mallId);
+  const categoryPath = getProductCategoryPath(rawProduct);
 
   const categoryNames: Record<string, string> = {
     agricultural: '농산물',
@@ -180,7 +181,7 @@ export default function ProductDetailPage({ params }: { params: { productId: str
             <div>
               <h3 className="font-medium text-gray-900 mb-2">{mallName}</h3>
               <p className="text-sm text-gray-600 mb-1">지역: {product.region}</p>
-              <p className="text-sm text-gray-600 mb-1">카테고리: {product.category}</p>
+              <p className="text-sm text-gray-600 mb-1">카테고리: {categoryPath.major} &gt; {categoryPath.mid} &gt; {categoryPath.minor}</p>
               {product.isFeatured && (
                 <span className="inline-block mt-2 px-3 py-1 bg-yellow-100 text-yellow-800 rounded-full text-xs font-medium">
                   추천 상품
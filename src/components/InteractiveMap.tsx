@@ -17,9 +17,10 @@ const KoreaMap = dynamic(
 interface InteractiveMapProps {
   regions: Region[];
   malls: Mall[];
+  productCounts?: Record<string, number>;
 }
 
-const InteractiveMap: React.FC<InteractiveMapProps> = ({ regions, malls }) => {
+const InteractiveMap: React.FC<InteractiveMapProps> = ({ regions, malls, productCounts = {} }) => {
   const [selectedRegionId, setSelectedRegionId] = useState<string | null>(null);
   const [hoveredRegionId, setHoveredRegionId] = useState<string | null>(null);
 
@@ -101,6 +102,9 @@ const InteractiveMap: React.FC<InteractiveMapProps> = ({ regions, malls }) => {
             <div className="absolute top-2 left-2 bg-white/95 backdrop-blur rounded-md shadow-lg p-3 pointer-events-none z-10 max-w-xs">
               <div className="font-semibold text-gray-900">{hoveredRegion.name_ko}</div>
               <div className="text-sm text-gray-600">쇼핑몰: {getMallCount(hoveredRegion.id)}개</div>
+              {productCounts[hoveredRegion.id] > 0 && (
+                <div className="text-sm text-gray-600">상품: {productCounts[hoveredRegion.id].toLocaleString()}개</div>
+              )}
               {hoveredRegion.highlight_text && (
                 <div className="text-xs text-gray-500 mt-1">{hoveredRegion.highlight_text}</div>
               )}
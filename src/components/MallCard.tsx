@@ -32,14 +32,19 @@ export default function MallCard({ mall, region, onVisit }: MallCardProps) {
           <div className="flex items-start gap-2 flex-1 min-w-0">
             {mall.logo && (
               <div className="w-8 h-8 flex-shrink-0">
-                <img 
-                  src={mall.logo} 
-                  alt={`${mall.name} 로고`}
-                  className="w-full h-full object-contain rounded-md bg-gray-50 p-1"
-                  onError={(e) => {
-                    e.currentTarget.style.display = 'none';
-                  }}
-                />
+                <picture>
+                  {mall.logoSrcSet?.avif && <source type="image/avif" srcSet={mall.logoSrcSet.avif} sizes="32px" />}
+                  {mall.logoSrcSet?.webp && <source type="image/webp" srcSet={mall.logoSrcSet.webp} sizes="32px" />}
+                  <img 
+                    src={mall.logo} 
+                    alt={`${mall.name} 로고`}
+                    loading="lazy"
+                    className="w-full h-full object-contain rounded-md bg-gray-50 p-1"
+                    onError={(e) => {
+                      e.currentTarget.style.display = 'none';
+                    }}
+                  />
+                </picture>
               </div>
             )}
             <div className="flex-1 min-w-0">